@@ -0,0 +1,241 @@
+import os
+import math
+import time
+import asyncio
+import contextlib
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+import anyio
+from mcp import types
+from mcp.server.lowlevel import Server
+from mcp.shared.exceptions import McpError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from mcp_metrics import Counter
+
+# JSON-RPC error code of a tool call refused because the server is overloaded.
+OVERLOADED = -32001
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class AdmissionSettings:
+    """Limits of the work an MCP server accepts."""
+    max_concurrent: int = 16
+    max_per_session: int = 4
+    max_queue: int = 64
+    queue_timeout: float = 30.0
+    max_connections: int = 256
+
+    @classmethod
+    def from_env(cls) -> "AdmissionSettings":
+        """Read the settings from MCP_* environment variables, falling back to the defaults."""
+        defaults = cls()
+        return cls(
+            max_concurrent=_env_int("MCP_MAX_CONCURRENT", defaults.max_concurrent),
+            max_per_session=_env_int("MCP_MAX_PER_SESSION", defaults.max_per_session),
+            max_queue=_env_int("MCP_MAX_QUEUE", defaults.max_queue),
+            queue_timeout=_env_float("MCP_QUEUE_TIMEOUT", defaults.queue_timeout),
+            max_connections=_env_int("MCP_MAX_CONNECTIONS", defaults.max_connections),
+        )
+
+
+class Overloaded(Exception):
+    """The server refused work; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        """Constructor."""
+        super().__init__(f"{reason}, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the tool calls a process runs, so a burst of clients queues instead of
+    sending every model request at once and timing out together on 429s.
+
+    A call first takes one of the ``max_per_session`` slots of its session, then one of
+    the ``max_concurrent`` slots of the process. At most ``max_queue`` calls wait, each for
+    ``queue_timeout`` seconds; beyond that calls are refused at once with a retry delay
+    estimated from the recent call durations, which spreads the retries of the clients.
+    ``rejected`` counts the refused tool calls and connections.
+
+    :param settings: The limits.
+    """
+
+    def __init__(self, settings: AdmissionSettings | None = None) -> None:
+        """Constructor."""
+        self.settings = settings or AdmissionSettings()
+        self._slots = asyncio.Semaphore(self.settings.max_concurrent)
+        self._sessions: dict[Any, list] = {}
+        self.active = 0
+        self.waiting = 0
+        self.rejected = Counter(
+            "mcp_tool_calls_rejected_total", "Tool calls and connections refused as overloaded.", ("kind",))
+        self._mean_duration = 1.0
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a new call would be refused."""
+        return self.waiting >= self.settings.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the calls waiting now have likely started."""
+        backlog = (self.waiting + 1) / self.settings.max_concurrent
+        return max(1, math.ceil(backlog * self._mean_duration))
+
+    def _reject(self, reason: str) -> Overloaded:
+        self.rejected.inc("call")
+        return Overloaded(reason, self.retry_after())
+
+    @contextlib.asynccontextmanager
+    async def admit(self, session: Any = None) -> AsyncIterator[None]:
+        """
+        Run a call within the limits.
+
+        :param session: The session making the call, None for no session limit.
+        :raise Overloaded: The queue is full, or the call waited ``queue_timeout`` seconds.
+        """
+        if self.saturated:
+            raise self._reject("Too many queued calls")
+        entry = self._sessions.get(session)
+        if entry is None:
+            entry = self._sessions[session] = [asyncio.Semaphore(self.settings.max_per_session), 0]
+        entry[1] += 1
+        self.waiting += 1
+        acquired: list[asyncio.Semaphore] = []
+        try:
+            try:
+                async with asyncio.timeout(self.settings.queue_timeout):
+                    if session is not None:
+                        await entry[0].acquire()
+                        acquired.append(entry[0])
+                    await self._slots.acquire()
+                    acquired.append(self._slots)
+            except TimeoutError:
+                raise self._reject(f"Queued for {self.settings.queue_timeout:g} s")
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.active -= 1
+                self._mean_duration = 0.8 * self._mean_duration + 0.2 * (time.perf_counter() - started)
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._sessions[session]
+
+    def limit(self, server: Server) -> Server:
+        """Run the tool calls of an MCP server within the limits; refused calls get an OVERLOADED error."""
+        handler = server.request_handlers.get(types.CallToolRequest)
+        if handler is None or getattr(server, "_admission", None) is self:
+            return server
+
+        async def call_tool(request: types.CallToolRequest) -> types.ServerResult:
+            try:
+                async with self.admit(server.request_context.session):
+                    return await handler(request)
+            except Overloaded as e:
+                raise McpError(types.ErrorData(code=OVERLOADED, message=str(e), data={"retry_after": e.retry_after}))
+
+        server.request_handlers[types.CallToolRequest] = call_tool
+        server._admission = self
+        return server
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware refusing new MCP connections with 503 and Retry-After when overloaded.
+
+    Open SSE streams and streamable HTTP requests count as connections; posted SSE messages
+    do not, their tool calls are limited by the controller.
+
+    :param app: The app.
+    :param controller: The controller of the tool calls.
+    :param paths: The paths of the connections.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, paths: tuple[str, ...] = ("/sse", "/mcp")) -> None:
+        """Constructor."""
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+        self.connections = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        if self.connections >= self.controller.settings.max_connections or self.controller.saturated:
+            retry_after = self.controller.retry_after()
+            self.controller.rejected.inc("connection")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"retry-after", str(retry_after).encode()), (b"content-type", b"text/plain")],
+            })
+            await send({"type": "http.response.body", "body": b"Server overloaded"})
+            return
+        self.connections += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.connections -= 1
+
+
+class _CancelOnClose:
+    """The read stream of a session, cancelling a scope once the client has gone."""
+
+    def __init__(self, stream: Any, scope: anyio.CancelScope) -> None:
+        self._stream = stream
+        self._scope = scope
+
+    async def receive(self) -> Any:
+        try:
+            return await self._stream.receive()
+        except (anyio.EndOfStream, anyio.ClosedResourceError):
+            self._scope.cancel()
+            raise
+
+    def __aiter__(self) -> "_CancelOnClose":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return await self.receive()
+        except anyio.EndOfStream:
+            raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+    async def __aenter__(self) -> "_CancelOnClose":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+async def run_until_disconnect(server: Server, read_stream: Any, write_stream: Any) -> None:
+    """
+    Run an MCP server on a connection, cancelling the pending calls once the client disconnects.
+
+    Server.run waits for the pending requests after the connection closed, so the model
+    calls of a client that went away would still run to the end, unseen.
+    """
+    with anyio.CancelScope() as scope:
+        await server.run(_CancelOnClose(read_stream, scope), write_stream, server.create_initialization_options())
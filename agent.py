@@ -1,24 +1,16 @@
-import os
 import asyncio
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    instructions="You are good at telling jokes.",
-    name="Joker"    
-)
+
+def create_agent():
+    return get_chat_client().create_agent(
+        instructions="You are good at telling jokes.",
+        name="Joker"    
+    )
 
 async def main():
+    agent = create_agent()
     result = await agent.run("Tell me a joke about the Los Angeles Dodgers.")
     print(result.text)
 
@@ -1,16 +1,9 @@
-import os
 import anyio
 from typing import Annotated
 from pydantic import Field
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
-from mcp.server.stdio import stdio_server
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
+from workflow_mcp import agent_as_mcp_server
 
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
@@ -18,25 +11,29 @@ def get_weather(
     """Get the weather for a given location."""
     return f"The weather in {location} is cloudy with a high of 15°C."
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    name="weather_agent",
-    instructions="You are a helpful assistant that gives weather based on input using the get_weather_tool",
-    tools=get_weather
-)
-
-server = agent.as_mcp_server()
+def create_server():
+    agent = get_chat_client().create_agent(
+        name="weather_agent",
+        instructions="You are a helpful assistant that gives weather based on input using the get_weather_tool",
+        tools=get_weather
+    )
+    # Clients sending a progress token receive the response as it is generated.
+    return agent_as_mcp_server(agent)
 
 async def run():
-    async def handle_stdin():
-        async with stdio_server() as (read_stream, write_stream):
-            await server.run(read_stream, write_stream, server.create_initialization_options())
-
-    await handle_stdin()
-
+    from dataclasses import replace
+    from mcp.server.stdio import stdio_server
+    from admission import AdmissionController, AdmissionSettings, run_until_disconnect
+
+    # The host multiplexes its tool calls over one pipe: the requests run concurrently, at
+    # most MCP_MAX_CONCURRENT at once, each answered when it finishes. A cancelled request
+    # aborts its agent run; the pending runs are cancelled when the host closes the pipe.
+    settings = AdmissionSettings.from_env()
+    controller = AdmissionController(replace(settings, max_per_session=settings.max_concurrent))
+    server = controller.limit(create_server())
+
+    async with stdio_server() as (read_stream, write_stream):
+        await run_until_disconnect(server, read_stream, write_stream)
 
 
 if __name__ == "__main__":
@@ -1,18 +1,9 @@
-import os
+import functools
 from typing import Annotated
 from pydantic import Field
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
-from mcp.server.sse import SseServerTransport
-from starlette.applications import Starlette
-from starlette.routing import Route
-import uvicorn
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
+from workflow_mcp import agent_as_mcp_server
 
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
@@ -20,35 +11,21 @@ def get_weather(
     """Get the weather for a given location."""
     return f"The weather in {location} is snowy with a high of 0°C."
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    name="weather_agent",
-    instructions="You are a helpful assistant that gives weather based on input using the get_weather_tool",
-    tools=get_weather
-)
-
-server = agent.as_mcp_server()
-sse = SseServerTransport("/messages")
-
-async def handle_sse(request):
-    async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
-        await server.run(streams[0], streams[1], server.create_initialization_options())
-
-async def handle_messages(request):
-    await sse.handle_post_message(request.scope, request.receive, request._send)
-
-
-app = Starlette(
-    routes=[
-        Route("/sse", endpoint=handle_sse),
-        Route("/messages", endpoint=handle_messages, methods=["POST"]),
-    ]
-)
-
-
+@functools.cache
+def get_server():
+    agent = get_chat_client().create_agent(
+        name="weather_agent",
+        instructions="You are a helpful assistant that gives weather based on input using the get_weather_tool",
+        tools=get_weather
+    )
+    # Clients sending a progress token receive the response as it is generated.
+    return agent_as_mcp_server(agent)
+
+def create_app():
+    # Starlette and the MCP transports are only imported when the app is served.
+    from mcp_serving import create_app as create_mcp_app
+    return create_mcp_app(get_server)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from mcp_serving import serve
+    serve("agent_mcp_sse:create_app", port=8000)
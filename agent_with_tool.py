@@ -1,15 +1,8 @@
-import os
 import asyncio
 from typing import Annotated
 from pydantic import Field
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
 
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
@@ -17,15 +10,14 @@ def get_weather(
     """Get the weather for a given location."""
     return f"The weather in {location} is cloudy with a high of 15°C."
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    instructions="You are a helpful assistant",
-    tools=get_weather
-)
+def create_agent():
+    return get_chat_client().create_agent(
+        instructions="You are a helpful assistant",
+        tools=get_weather
+    )
+
 async def main():
+    agent = create_agent()
     result = await agent.run("Tell me the weather is in Los Angeles.")
     print(result.text)
 
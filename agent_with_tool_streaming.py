@@ -1,16 +1,9 @@
-import os
 import asyncio
 from typing import Annotated
 from pydantic import Field
-from agent_framework.azure import AzureOpenAIChatClient
-from agent_framework import TextContent, DataContent, FunctionCallContent, FunctionResultContent
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
+from stream_sink import StreamSink, VERBOSE_FORMATTERS
 
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
@@ -18,15 +11,15 @@ def get_weather(
     """Get the weather for a given location."""
     return f"The weather in {location} is cloudy with a high of 15°C."
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    instructions="You are a helpful assistant",
-    tools=get_weather
-)
+def create_agent():
+    return get_chat_client().create_agent(
+        instructions="You are a helpful assistant",
+        tools=get_weather
+    )
+
 async def main():
+    agent = create_agent()
+
     #result = await agent.run("Tell me the weather in Los Angeles.")
     #print(f"Result type: {type(result)}")
     #print(result.text)
@@ -37,17 +30,12 @@ async def main():
     #    if update.text:
     #        print(update.text)
 
+    # Function calls and results are rendered through the sink's formatter table;
+    # text tokens are coalesced into larger writes.
+    sink = StreamSink.to_stdout(formatters=VERBOSE_FORMATTERS)
     async for update in agent.run_stream("What is the weather like in Toronto?"):
-        for content in update.contents:
-            print(f"Content type: {type(content)}")
-            if isinstance(content, TextContent):
-                print(f"📝 Text: {content.text}")
-            elif isinstance(content, FunctionCallContent):
-                print(f"🔧 Function Call: {content.name}")
-                print(f"   Call ID: {content.call_id}")
-                print(f"   Arguments: {content.arguments}")
-            elif isinstance(content, FunctionResultContent):
-                print(f"🔧 Function Result: {content.result}")
+        await sink.handle_update(update)
+    await sink.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,79 +1,71 @@
-import os
 import asyncio
-from typing import Any, Annotated
+from typing import Annotated
 from pydantic import BaseModel, Field
-from agent_framework import AgentRunUpdateEvent, WorkflowBuilder, AgentExecutor, WorkflowOutputEvent, WorkflowStatusEvent, WorkflowViz
-from agent_framework.azure import AzureOpenAIChatClient
-from dotenv import load_dotenv
+from agent_framework import WorkflowBuilder, AgentExecutor, Workflow
+
+from settings import get_chat_client
+from workflow_viz import render_in_background
+from stream_sink import StreamSink
+from gazetteer import Gazetteer, GazetteerResolver, add_pre_resolver, load_gazetteer, resolved
 
 class CityInfo(BaseModel):
     """Information about a city."""
     name: str | None = None
     weather: str | None = None
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
 ) -> str:
     """Get the weather for a given location."""
     return f"The weather in {location} is sunny with a high of 20°C."
 
-async def main() -> None:
-    chat_client = AzureOpenAIChatClient(
-        endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        deployment_name=AZURE_OPENAI_DEPLOYMENT,
-    )
+def build_workflow(chat_client, gazetteer: Gazetteer | None = None) -> Workflow:
+    city_info_agent = AgentExecutor(
+        chat_client.create_agent(
+            name="City Info",
+            instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
+            tools=get_weather,
+            response_format=CityInfo,
+        )
+    ) 
+
+    tourist_recommendations_agent = AgentExecutor(
+        chat_client.create_agent(
+            name="Tourist Recommendations",
+            instructions=(
+                "You are an assistant who provides tourist recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
+                "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
+                "Do not recommend the place you are already at."
+                "Return JSON with a single field response."
+            ),
+        )
+    ) 
+
+    resolver = None
+    if gazetteer is not None:
+        resolver = GazetteerResolver(gazetteer, lambda place: CityInfo(name=place.city, weather=get_weather(place.city)))
+
+    builder = WorkflowBuilder()
+    for source in add_pre_resolver(builder, city_info_agent, resolver):
+        builder.add_edge(source, tourist_recommendations_agent, condition=resolved)
+    return builder.build()
 
+
+async def main() -> None:
     try:
-        city_info_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="City Info",
-                instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
-                tools=get_weather,
-                response_format=CityInfo,
-            )
-        ) 
-
-        tourist_recommendations_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="Tourist Recommendations",
-                instructions=(
-                    "You are an assistant who provides tourist recommendations based on a city. "
-                    "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
-                    "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
-                    "Do not recommend the place you are already at."
-                    "Return JSON with a single field response."
-                ),
-            )
-        ) 
-
-        workflow = WorkflowBuilder().set_start_executor(city_info_agent).add_edge(city_info_agent, tourist_recommendations_agent).build()  
-
-        viz = WorkflowViz(workflow)
-        doc_diagram = viz.save_svg("docs/workflow_architecture.svg")
-
-        events = workflow.run_stream("You are at the CN Tower.")
-
-        last_executor_id: str | None = None
-
-        async for event in events:
-            if isinstance(event, AgentRunUpdateEvent):
-                # Handle streaming updates from agents
-                eid = event.executor_id
-                if eid != last_executor_id:
-                    if last_executor_id is not None:
-                        print()
-                    print(f"{eid}:", end=" ", flush=True)
-                    last_executor_id = eid
-                print(event.data, end="", flush=True)
-            elif isinstance(event, WorkflowStatusEvent):
-                print("\n=== Status ===")
-                print(event)
+        # Common places are resolved from the gazetteer, skipping the City Info model call
+        gazetteer = load_gazetteer()
+        workflow = build_workflow(get_chat_client(), gazetteer)
+
+        # Rendered off the event loop, and only when the topology changed
+        render_in_background(workflow, "docs/workflow_architecture.svg")
+
+        # Coalesce streamed tokens per executor instead of printing each one
+        sink = StreamSink.to_stdout(show_status=True)
+        await sink.consume(workflow.run_stream("You are at the CN Tower."))
+        await sink.aclose()
+        print(f"Gazetteer hit rate: {gazetteer.stats.hit_rate:.0%}")
 
 
     finally:
@@ -1,14 +1,14 @@
-import os
 import asyncio
-from typing import Any, Annotated
+from typing import Annotated
 from pydantic import BaseModel, Field
-from azure.core.credentials import AzureKeyCredential
-from openai import AsyncAzureOpenAI
-from agent_framework import AgentRunUpdateEvent, WorkflowBuilder, AgentExecutor, WorkflowOutputEvent, WorkflowStatusEvent, WorkflowViz, AgentExecutorResponse
-from agent_framework.azure import AzureOpenAIChatClient
-from dotenv import load_dotenv
+from agent_framework import WorkflowBuilder, AgentExecutor, Workflow
 
-from search_index_manager import SearchIndexManager
+from settings import get_chat_client, get_settings, get_search_index_manager, close_clients
+from workflow_viz import render_in_background
+from stream_sink import StreamSink
+from structured_routing import when
+from gazetteer import Gazetteer, GazetteerResolver, add_pre_resolver, load_gazetteer
+from memo_executor import MemoizingAgentExecutor, ResponseCache
 
 
 class CityInfo(BaseModel):
@@ -16,36 +16,6 @@ class CityInfo(BaseModel):
     name: str | None = None
     weather: str | None = None
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_EMBED_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT")
-
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_API_KEY = os.getenv("AZURE_SEARCH_API_KEY")
-AZURE_SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX")
-
-embeddings_client = AsyncAzureOpenAI(
-      azure_endpoint=AZURE_OPENAI_ENDPOINT,
-      api_key=AZURE_OPENAI_API_KEY,
-      api_version="2024-02-01"
-)
-
-azure_search_credential = AzureKeyCredential(AZURE_SEARCH_API_KEY)
-
-embed_dimensions = int(os.getenv('AZURE_AI_EMBED_DIMENSIONS'))
-
-search_index_manager = SearchIndexManager(
-    endpoint = AZURE_SEARCH_ENDPOINT,
-    credential = azure_search_credential,
-    index_name = AZURE_SEARCH_INDEX,
-    dimensions = embed_dimensions,
-    model = AZURE_OPENAI_EMBED_DEPLOYMENT,
-    embeddings_client=embeddings_client
-)
-
-
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
 ) -> str:
@@ -57,7 +27,7 @@ async def get_restaurants(
 ) -> str:
     """Get restaurants from the RAG."""
     try:
-        context = await search_index_manager.search(query)
+        context = await get_search_index_manager().search(query)
         if context:
             return context
         else:
@@ -66,110 +36,96 @@ async def get_restaurants(
         print(f"Error searching for restaurants: {str(e)}")
         return f"Error retrieving restaurant information: {str(e)}"
 
-def get_condition(expected_result: bool):
-    """Create a condition callable that routes based on CityInfo.weather."""
-
-    # The returned function will be used as an edge predicate.
-    # It receives whatever the upstream executor produced.
-    def condition(message: Any) -> bool:
-        # Defensive guard. If a non AgentExecutorResponse appears, let the edge pass to avoid dead ends.
-        if not isinstance(message, AgentExecutorResponse):
-            return True
-
-        try:
-            # Prefer parsing a structured CityInfo from the agent JSON text.
-            # Using model_validate_json ensures type safety and raises if the shape is wrong.
-            city_info = CityInfo.model_validate_json(message.agent_run_response.text)
-            # Route only when the weather matches the expected path.
-            return ("sunny" in city_info.weather.lower()) == expected_result
-        except Exception:
-            # Fail closed on parse errors so we do not accidentally route to the wrong path.
-            # Returning False prevents this edge from activating.
-            print('invalid object')
-            return False
-
-    return condition    
-
-async def main() -> None:
-    chat_client = AzureOpenAIChatClient(
-        endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        deployment_name=AZURE_OPENAI_DEPLOYMENT,
+def is_sunny(expected_result: bool):
+    """Create a condition that routes based on CityInfo.weather."""
+    # The CityInfo is validated once per message and shared by both edges; responses
+    # that do not validate are reported once and take neither edge.
+    return when(CityInfo, lambda city_info: ("sunny" in (city_info.weather or "").lower()) == expected_result)
+
+def build_workflow(
+        chat_client,
+        gazetteer: Gazetteer | None = None,
+        response_cache: ResponseCache | None = None,
+    ) -> Workflow:
+    city_info_agent = AgentExecutor(
+        chat_client.create_agent(
+            name="City Info",
+            instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
+            tools=get_weather,
+            response_format=CityInfo,
+        )
+    ) 
+
+    tourist_recommendations_agent = AgentExecutor(
+        chat_client.create_agent(
+            name="Tourist Recommendations",
+            instructions=(
+                "You are an assistant who provides tourist recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
+                "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
+                "Do not recommend the place you are already at."
+                "Return JSON with a single field response."
+            ),
+        )
+    ) 
+
+    restaurant_agent = chat_client.create_agent(
+        name="Restaurant Recommendations",
+        instructions=(
+            "You are an assistant who provides restaurant recommendations based on a city. "
+            "Your input might be a JSON object that includes 'city'."
+            "Give a restaurant recommendation for the city you are currently in."
+            "Only provide restaurants from the RAG.  If you can't find any, so 'no recommendations'"
+            "Return JSON with a single field response."
+        ),
+        tools=get_restaurants
+    )
+    # The recommendation only depends on the CityInfo, so landmarks in the same city share
+    # one answer: key on the last message rather than on the whole conversation.
+    restaurant_recommendations_agent = (
+        MemoizingAgentExecutor(restaurant_agent, response_cache, key_scope="last")
+        if response_cache is not None else AgentExecutor(restaurant_agent)
     )
 
-    try:
-        await search_index_manager.ensure_index_created(
-            vector_index_dimensions=embed_dimensions if embed_dimensions else 100)
+    resolver = None
+    if gazetteer is not None:
+        resolver = GazetteerResolver(gazetteer, lambda place: CityInfo(name=place.city, weather=get_weather(place.city)))
 
-        city_info_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="City Info",
-                instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
-                tools=get_weather,
-                response_format=CityInfo,
-            )
-        ) 
-
-        tourist_recommendations_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="Tourist Recommendations",
-                instructions=(
-                    "You are an assistant who provides tourist recommendations based on a city. "
-                    "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
-                    "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
-                    "Do not recommend the place you are already at."
-                    "Return JSON with a single field response."
-                ),
-            )
-        ) 
-
-        restaurant_recommendations_agent = AgentExecutor(
-                chat_client.create_agent(
-                name="Restaurant Recommendations",
-                instructions=(
-                    "You are an assistant who provides restaurant recommendations based on a city. "
-                    "Your input might be a JSON object that includes 'city'."
-                    "Give a restaurant recommendation for the city you are currently in."
-                    "Only provide restaurants from the RAG.  If you can't find any, so 'no recommendations'"
-                    "Return JSON with a single field response."
-                ),
-                tools=get_restaurants
-            )
-        )
+    builder = WorkflowBuilder()
+    for source in add_pre_resolver(builder, city_info_agent, resolver):
+        builder.add_edge(source, tourist_recommendations_agent, condition=is_sunny(True))
+        builder.add_edge(source, restaurant_recommendations_agent, condition=is_sunny(False))
+    return builder.build()
 
-        workflow = (
-            WorkflowBuilder()
-            .set_start_executor(city_info_agent)
-            .add_edge(city_info_agent, tourist_recommendations_agent, condition=get_condition(True))
-            .add_edge(city_info_agent, restaurant_recommendations_agent, condition=get_condition(False))
-            .build()  
-        )
+response_cache = ResponseCache(max_entries=256, ttl=600.0)
 
-        viz = WorkflowViz(workflow)
-        doc_diagram = viz.save_svg("docs/workflow_architecture 2.svg")
+async def main() -> None:
+    try:
+        embed_dimensions = get_settings().embed_dimensions
+        await get_search_index_manager().ensure_index_created(
+            vector_index_dimensions=embed_dimensions if embed_dimensions else 100)
 
-        events = workflow.run_stream("You are at Empire State Building.")
+        # Common places are resolved from the gazetteer, skipping the City Info model call
+        gazetteer = load_gazetteer()
+        workflow = build_workflow(get_chat_client(), gazetteer, response_cache)
 
-        last_executor_id: str | None = None
+        # Rendered off the event loop, and only when the topology changed
+        render_in_background(workflow, "docs/workflow_architecture 2.svg")
 
-        async for event in events:
-            if isinstance(event, AgentRunUpdateEvent):
-                # Handle streaming updates from agents
-                eid = event.executor_id
-                if eid != last_executor_id:
-                    if last_executor_id is not None:
-                        print()
-                    print(f"{eid}:", end=" ", flush=True)
-                    last_executor_id = eid
-                print(event.data, end="", flush=True)
-            #elif isinstance(event, WorkflowStatusEvent):
-            #    print("\n=== Status ===")
-            #    print(event)
+        # Coalesce streamed tokens per executor instead of printing each one
+        sink = StreamSink.to_stdout()
+        for i, question in enumerate(["You are at Empire State Building.", "You are at the Statue of Liberty."]):
+            # Both landmarks are in New York, the second run replays the cached restaurant answer
+            if i:
+                workflow = build_workflow(get_chat_client(), gazetteer, response_cache)
+            await sink.consume(workflow.run_stream(question))
+        await sink.aclose()
+        print(f"Gazetteer hit rate: {gazetteer.stats.hit_rate:.0%}")
+        print(f"Response cache hit rate: {response_cache.hit_rate:.0%}")
 
 
     finally:
-        await search_index_manager.close()
-        await embeddings_client.close()
+        await close_clients()
 
 
 
@@ -0,0 +1,153 @@
+import asyncio
+from typing import Annotated
+from pydantic import BaseModel, Field
+from agent_framework import WorkflowBuilder, AgentExecutor, WorkflowOutputEvent, Workflow
+
+from settings import get_chat_client, get_settings, get_search_index_manager, close_clients
+from stream_sink import StreamSink
+from fan_out import AggregatorExecutor, BranchExecutor
+from gazetteer import Gazetteer, GazetteerResolver, add_pre_resolver, load_gazetteer, resolved
+
+
+class CityInfo(BaseModel):
+    """Information about a city."""
+    name: str | None = None
+    weather: str | None = None
+    country: str | None = None
+
+class Recommendation(BaseModel):
+    """A recommendation from one of the branches."""
+    response: str
+
+def get_weather(
+    location: Annotated[str, Field(description="The location to get the weather for.")],
+) -> str:
+    """Get the weather for a given location."""
+    return f"The weather in {location} is snowy with a high of 34°F."
+
+async def get_restaurants(
+    query: Annotated[str, Field(description="City name.")],
+) -> str:
+    """Get restaurants from the RAG."""
+    try:
+        context = await get_search_index_manager().search(query)
+        if context:
+            return context
+        else:
+            return "No information found."
+    except Exception as e:
+        print(f"Error searching for restaurants: {str(e)}")
+        return f"Error retrieving restaurant information: {str(e)}"
+
+# Seconds each recommendation agent is given before the aggregator goes on without it.
+BRANCH_TIMEOUT = 30.0
+
+def build_workflow(chat_client, gazetteer: Gazetteer | None = None) -> Workflow:
+    city_info_agent = AgentExecutor(
+        chat_client.create_agent(
+            name="City Info",
+            instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
+            tools=get_weather,
+            response_format=CityInfo,
+        )
+    ) 
+
+    tourist_recommendations_agent = BranchExecutor(
+        chat_client.create_agent(
+            name="Tourist Recommendations",
+            instructions=(
+                "You are an assistant who provides tourist recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
+                "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
+                "Do not recommend the place you are already at."
+                "Return JSON with a single field response."
+            ),
+            response_format=Recommendation,
+        ),
+        timeout=BRANCH_TIMEOUT,
+    ) 
+
+    restaurant_recommendations_agent = BranchExecutor(
+            chat_client.create_agent(
+            name="Restaurant Recommendations",
+            instructions=(
+                "You are an assistant who provides restaurant recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'."
+                "Give a restaurant recommendation for the city you are currently in."
+                "Only provide restaurants from the RAG.  If you can't find any, so 'no recommendations'"
+                "Return JSON with a single field response."
+            ),
+            tools=get_restaurants,
+            response_format=Recommendation,
+        ),
+        timeout=BRANCH_TIMEOUT,
+    )
+
+    hockey_agent = BranchExecutor(
+        chat_client.create_agent(
+            name="Hockey Recommendations",
+            instructions=(
+                "You are an assistant who provides professional hockey information based on a city. "
+                "Your input might be a JSON object that includes 'city'."
+                "Give the user information about the hockey team and where they play."
+                "Return JSON with a single field response."
+            ),
+            response_format=Recommendation,
+        ),
+        timeout=BRANCH_TIMEOUT,
+    ) 
+
+    resolver = None
+    if gazetteer is not None:
+        resolver = GazetteerResolver(
+            gazetteer,
+            lambda place: CityInfo(name=place.city, weather=get_weather(place.city), country=place.country))
+
+    # Every branch gets the CityInfo at the same time; the aggregator runs once all of them
+    # answered or timed out, so the latency is the slowest branch rather than the sum.
+    branches = [tourist_recommendations_agent, restaurant_recommendations_agent, hockey_agent]
+    aggregator = AggregatorExecutor(min_results=1)
+
+    builder = WorkflowBuilder()
+    for source in add_pre_resolver(builder, city_info_agent, resolver):
+        # A fan-out takes no condition; the selection sends the resolver's forwarded inputs nowhere.
+        builder.add_multi_selection_edge_group(
+            source, branches, lambda message, targets: targets if resolved(message) else [])
+    return builder.add_fan_in_edges(branches, aggregator).build()
+
+async def main() -> None:
+    try:
+        embed_dimensions = get_settings().embed_dimensions
+        await get_search_index_manager().ensure_index_created(
+            vector_index_dimensions=embed_dimensions if embed_dimensions else 100)
+
+        workflow = build_workflow(get_chat_client(), load_gazetteer())
+
+        # The branches stream at the same time; the sink keeps each one's tokens together
+        sink = StreamSink.to_stdout()
+        result = None
+        async for event in workflow.run_stream("You are at the CN Tower."):
+            await sink.handle(event)
+            if isinstance(event, WorkflowOutputEvent):
+                result = event.data
+        await sink.aclose()
+
+        print("\n" + "-"*50)
+        # No output when the City Info response was not routed to the branches
+        if result is None:
+            print("No recommendation was produced.")
+            return
+        for branch, recommendation in result.results.items():
+            print(f"{branch}: {getattr(recommendation, 'response', recommendation)}")
+        for branch, error in result.missing.items():
+            print(f"{branch}: no answer ({error})")
+        print(f"Slowest branch: {result.elapsed:.1f}s")
+
+
+    finally:
+        await close_clients()
+
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
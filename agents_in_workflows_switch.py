@@ -1,14 +1,16 @@
-import os
 import asyncio
-from typing import Any, Annotated
+from typing import Annotated
 from pydantic import BaseModel, Field
-from azure.core.credentials import AzureKeyCredential
-from openai import AsyncAzureOpenAI
-from agent_framework import AgentRunUpdateEvent, WorkflowBuilder, AgentExecutor, WorkflowOutputEvent, WorkflowStatusEvent, WorkflowViz, AgentExecutorResponse, Case, Default
-from agent_framework.azure import AzureOpenAIChatClient
-from dotenv import load_dotenv
+from agent_framework import WorkflowBuilder, AgentExecutor, Workflow, CheckpointStorage
 
-from search_index_manager import SearchIndexManager
+from settings import get_chat_client, get_settings, get_search_index_manager, get_prompt_cache_stats, close_clients
+from workflow_viz import render_in_background
+from stream_sink import StreamSink
+from structured_routing import add_field_switch
+from gazetteer import Gazetteer, GazetteerResolver, add_pre_resolver, load_gazetteer
+from checkpoint_store import SQLiteCheckpointStorage, run_stream_resumable
+from prompt_layout import PromptLayout
+from workflow_profiler import WorkflowProfiler
 
 
 class CityInfo(BaseModel):
@@ -17,36 +19,6 @@ class CityInfo(BaseModel):
     weather: str | None = None
     country: str | None = None
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-AZURE_OPENAI_EMBED_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT")
-
-AZURE_SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-AZURE_SEARCH_API_KEY = os.getenv("AZURE_SEARCH_API_KEY")
-AZURE_SEARCH_INDEX = os.getenv("AZURE_SEARCH_INDEX")
-
-embeddings_client = AsyncAzureOpenAI(
-      azure_endpoint=AZURE_OPENAI_ENDPOINT,
-      api_key=AZURE_OPENAI_API_KEY,
-      api_version="2024-02-01"
-)
-
-azure_search_credential = AzureKeyCredential(AZURE_SEARCH_API_KEY)
-
-embed_dimensions = int(os.getenv('AZURE_AI_EMBED_DIMENSIONS'))
-
-search_index_manager = SearchIndexManager(
-    endpoint = AZURE_SEARCH_ENDPOINT,
-    credential = azure_search_credential,
-    index_name = AZURE_SEARCH_INDEX,
-    dimensions = embed_dimensions,
-    model = AZURE_OPENAI_EMBED_DEPLOYMENT,
-    embeddings_client=embeddings_client
-)
-
-
 def get_weather(
     location: Annotated[str, Field(description="The location to get the weather for.")],
 ) -> str:
@@ -58,7 +30,7 @@ async def get_restaurants(
 ) -> str:
     """Get restaurants from the RAG."""
     try:
-        context = await search_index_manager.search(query)
+        context = await get_search_index_manager().search(query)
         if context:
             return context
         else:
@@ -67,120 +39,128 @@ async def get_restaurants(
         print(f"Error searching for restaurants: {str(e)}")
         return f"Error retrieving restaurant information: {str(e)}"
 
-def get_country(expected_country: str):
-    """Factory that returns a predicate matching a specific country."""
-
-    def condition(message: Any) -> bool:
-        if not isinstance(message, AgentExecutorResponse):
-            return False
-
-        try:
-            parsed = CityInfo.model_validate_json(message.agent_run_response.text)
-            return parsed.country == expected_country
-        except Exception:
-            print('invalid object')
-            return False
-
-    return condition
+PREAMBLE = (
+    "You are one of the agents of a travel assistant. "
+    "The first agent figures out the city the user is in, with its weather and country. "
+    "The next agent receives them as a JSON object and gives the user recommendations for that city."
+)
 
-async def main() -> None:
-    chat_client = AzureOpenAIChatClient(
-        endpoint=AZURE_OPENAI_ENDPOINT,
-        api_key=AZURE_OPENAI_API_KEY,
-        deployment_name=AZURE_OPENAI_DEPLOYMENT,
+def build_workflow(
+        chat_client,
+        gazetteer: Gazetteer | None = None,
+        checkpoint_storage: CheckpointStorage | None = None,
+    ) -> Workflow:
+    # Every agent shares the start of its instructions, and gets only its own tools, in
+    # the order of the layout, so each agent keeps a stable prompt prefix the provider caches.
+    layout = PromptLayout(chat_client, PREAMBLE, tools=[get_weather, get_restaurants])
+
+    city_info_agent = AgentExecutor(
+        layout.create_agent(
+            name="City Info",
+            instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
+            tools=get_weather,
+            response_format=CityInfo,
+        )
+    ) 
+
+    tourist_recommendations_agent = AgentExecutor(
+        layout.create_agent(
+            name="Tourist Recommendations",
+            instructions=(
+                "You are an assistant who provides tourist recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
+                "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
+                "Do not recommend the place you are already at."
+                "Return JSON with a single field response."
+            ),
+        )
+    ) 
+
+    restaurant_recommendations_agent = AgentExecutor(
+            layout.create_agent(
+            name="Restaurant Recommendations",
+            instructions=(
+                "You are an assistant who provides restaurant recommendations based on a city. "
+                "Your input might be a JSON object that includes 'city'."
+                "Give a restaurant recommendation for the city you are currently in."
+                "Only provide restaurants from the RAG.  If you can't find any, so 'no recommendations'"
+                "Return JSON with a single field response."
+            ),
+            tools=get_restaurants
+        )
     )
 
-    try:
-        await search_index_manager.ensure_index_created(
-            vector_index_dimensions=embed_dimensions if embed_dimensions else 100)
-
-        city_info_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="City Info",
-                instructions="You are a helpful assistant that figures out the city from the information provided and also returns the weather",
-                tools=get_weather,
-                response_format=CityInfo,
-            )
-        ) 
-
-        tourist_recommendations_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="Tourist Recommendations",
-                instructions=(
-                    "You are an assistant who provides tourist recommendations based on a city. "
-                    "Your input might be a JSON object that includes 'city'.  Your input might also be a JSON object that includes 'weather'."
-                    "Base your response on 'city' and 'weather'.  If the weather is sunny and warm, recommend an outdoor place.  Else recommend an indoor place."
-                    "Do not recommend the place you are already at."
-                    "Return JSON with a single field response."
-                ),
-            )
-        ) 
-
-        restaurant_recommendations_agent = AgentExecutor(
-                chat_client.create_agent(
-                name="Restaurant Recommendations",
-                instructions=(
-                    "You are an assistant who provides restaurant recommendations based on a city. "
-                    "Your input might be a JSON object that includes 'city'."
-                    "Give a restaurant recommendation for the city you are currently in."
-                    "Only provide restaurants from the RAG.  If you can't find any, so 'no recommendations'"
-                    "Return JSON with a single field response."
-                ),
-                tools=get_restaurants
-            )
+    hockey_agent = AgentExecutor(
+        layout.create_agent(
+            name="Hockey Recommendations",
+            instructions=(
+                "You are an assistant who provides professional hockey information based on a city. "
+                "Your input might be a JSON object that includes 'city'."
+                "Give the user information about the hockey team and where they play."
+                "Return JSON with a single field response."
+            ),
         )
-
-        hockey_agent = AgentExecutor(
-            chat_client.create_agent(
-                name="Hockey Recommendations",
-                instructions=(
-                    "You are an assistant who provides professional hockey information based on a city. "
-                    "Your input might be a JSON object that includes 'city'."
-                    "Give the user information about the hockey team and where they play."
-                    "Return JSON with a single field response."
-                ),
-            )
-        ) 
-
-        workflow = (
-            WorkflowBuilder()
-            .set_start_executor(city_info_agent)
-            .add_switch_case_edge_group(
-               city_info_agent,
-                [
-                    Case(condition=get_country("Canada"), target=hockey_agent),
-                    Case(condition=get_country("United States"), target=restaurant_recommendations_agent),
-                    Default(target=tourist_recommendations_agent),
-                ]
-            )
-            .build()
+    ) 
+
+    resolver = None
+    if gazetteer is not None:
+        resolver = GazetteerResolver(
+            gazetteer,
+            lambda place: CityInfo(name=place.city, weather=get_weather(place.city), country=place.country))
+
+    # One validation of the CityInfo and one dict lookup per message, instead of a
+    # predicate per case each parsing the JSON again.
+    builder = WorkflowBuilder()
+    for source in add_pre_resolver(builder, city_info_agent, resolver):
+        add_field_switch(
+            builder,
+            source,
+            CityInfo,
+            "country",
+            {
+                "Canada": hockey_agent,
+                "United States": restaurant_recommendations_agent,
+            },
+            default=tourist_recommendations_agent,
         )
+    if checkpoint_storage is not None:
+        builder.with_checkpointing(checkpoint_storage)
+    return builder.build()
 
-        viz = WorkflowViz(workflow)
-        doc_diagram = viz.save_svg("docs/workflow_architecture 3.svg")
-
-        events = workflow.run_stream("You are at the Eiffel Tower.")
+checkpoint_storage = SQLiteCheckpointStorage("checkpoints.db")
 
-        last_executor_id: str | None = None
+async def main() -> None:
+    try:
+        embed_dimensions = get_settings().embed_dimensions
+        await get_search_index_manager().ensure_index_created(
+            vector_index_dimensions=embed_dimensions if embed_dimensions else 100)
 
-        async for event in events:
-            if isinstance(event, AgentRunUpdateEvent):
-                # Handle streaming updates from agents
-                eid = event.executor_id
-                if eid != last_executor_id:
-                    if last_executor_id is not None:
-                        print()
-                    print(f"{eid}:", end=" ", flush=True)
-                    last_executor_id = eid
-                print(event.data, end="", flush=True)
-            #elif isinstance(event, WorkflowStatusEvent):
-            #    print("\n=== Status ===")
-            #    print(event)
+        # Common places are resolved from the gazetteer, skipping the City Info model call
+        gazetteer = load_gazetteer()
+        workflow = build_workflow(get_chat_client(), gazetteer, checkpoint_storage)
+
+        # Rendered off the event loop, and only when the topology changed
+        render_in_background(workflow, "docs/workflow_architecture 3.svg")
+
+        # Coalesce streamed tokens per executor instead of printing each one
+        sink = StreamSink.to_stdout()
+        # If the last run was interrupted it is resumed after the last finished step,
+        # without calling the agents that already answered
+        # Set WORKFLOW_PROFILE=1 to record a timeline of the run
+        profiler = WorkflowProfiler()
+        await sink.consume(profiler.watch(
+            workflow, run_stream_resumable(workflow, "You are at the Eiffel Tower.", checkpoint_storage)))
+        await sink.aclose()
+        if profiler.enabled:
+            print(profiler.summary())
+            profiler.write_chrome_trace("workflow_trace.json")
+        print(f"Gazetteer hit rate: {gazetteer.stats.hit_rate:.0%}")
+        print(get_prompt_cache_stats().summary())
 
 
     finally:
-        await search_index_manager.close()
-        await embeddings_client.close()
+        await checkpoint_storage.close()
+        await close_clients()
 
 
 
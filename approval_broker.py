@@ -0,0 +1,368 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Any
+
+from agent_framework import (
+    AgentProtocol,
+    AgentRunResponse,
+    AgentThread,
+    ChatMessage,
+    FunctionApprovalRequestContent,
+    Role,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The lease of a claimed run expired and the run was claimed again, by this or another worker."""
+
+
+@dataclass
+class PendingApproval:
+    """A function call waiting for a human decision."""
+    request_id: str
+    run_id: str
+    function_name: str
+    arguments: Any
+    created_at: float
+
+
+class ApprovalBroker:
+    """
+    Durable queue of agent runs paused on function approval requests.
+
+    A paused run is stored as the agent's thread state plus the pending
+    ``FunctionApprovalRequestContent`` items, so nothing has to stay in memory while
+    a human decides. Decisions are submitted with ``submit`` from any process; workers
+    call ``resume_ready`` to claim fully decided runs and resume them concurrently.
+    A resumed run only sends the approval responses to the agent, the steps that
+    already finished are never executed again. A worker checks that it still holds the
+    lease of a run before resuming it and when storing the outcome; a resume that fails
+    marks the run as failed rather than handing it out again, as the approved calls may
+    already have run.
+
+    Threads run with ``store=True`` on a Responses client are persisted as the
+    service-side conversation id; other threads are persisted with their local
+    message history.
+
+    :param path: The SQLite database file.
+    :param max_concurrent_resumes: The number of runs a worker resumes at the same time.
+    :param lease_seconds: How long a claimed run belongs to a worker. Runs claimed by a worker
+                          that died are handed out again once the lease expires.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_concurrent_resumes: int = 16,
+            lease_seconds: float = 600.0,
+        ) -> None:
+        """Constructor."""
+        self._path = path
+        self._max_concurrent_resumes = max_concurrent_resumes
+        self._lease_seconds = lease_seconds
+        self._worker_id = uuid.uuid4().hex
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = asyncio.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Open the database and create the tables if it is absent."""
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    agent_name TEXT,
+                    status TEXT NOT NULL,
+                    thread_state TEXT NOT NULL,
+                    result TEXT,
+                    worker_id TEXT,
+                    claimed_at REAL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS runs_status ON runs(status, claimed_at);
+                CREATE TABLE IF NOT EXISTS approvals (
+                    run_id TEXT NOT NULL REFERENCES runs(run_id),
+                    request_id TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    approved INTEGER,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (run_id, request_id)
+                );
+                CREATE INDEX IF NOT EXISTS approvals_open ON approvals(approved, created_at);
+                """)
+            self._conn = conn
+        return self._conn
+
+    async def _execute(self, fn, *args: Any) -> Any:
+        """Run a blocking database function off the event loop."""
+        async with self._db_lock:
+            return await asyncio.to_thread(fn, self._get_connection(), *args)
+
+    async def start(
+            self,
+            agent: AgentProtocol,
+            messages: str | ChatMessage | list[str] | list[ChatMessage],
+            run_id: str | None = None,
+            **kwargs: Any,
+        ) -> str:
+        """
+        Run the agent until it completes or pauses on approval requests.
+
+        :param agent: The agent to run. Its name is stored with the run.
+        :param messages: The input messages.
+        :param run_id: Optional identifier for the run, a random one is generated otherwise.
+        :param kwargs: Extra arguments for ``agent.run``, e.g. ``store=True``.
+        :return: The run identifier.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        thread = agent.get_new_thread()
+        response = await agent.run(messages, thread=thread, **kwargs)
+        await self._save_outcome(run_id, agent, thread, response)
+        return run_id
+
+    async def _save_outcome(
+            self,
+            run_id: str,
+            agent: AgentProtocol,
+            thread: AgentThread,
+            response: AgentRunResponse,
+            lease: tuple[str, float] | None = None,
+        ) -> None:
+        """
+        Persist a run either as paused on its approval requests or as completed.
+
+        :param lease: The worker id and claim time of the resumed run, the lease must still be held.
+        :raises: LeaseLost if the run was claimed again.
+        """
+        thread_state = json.dumps(await thread.serialize())
+        requests = [
+            (request.id, json.dumps(request.to_dict()))
+            for request in response.user_input_requests
+            if isinstance(request, FunctionApprovalRequestContent)
+        ]
+        status = "pending" if requests else "completed"
+        result = None if requests else response.text
+        saved = await self._execute(
+            ApprovalBroker._write_outcome, run_id, agent.name, status, thread_state, result, requests, lease)
+        if not saved:
+            raise LeaseLost(f"Run {run_id!r} was claimed again before its outcome was saved")
+
+    @staticmethod
+    def _write_outcome(
+            conn: sqlite3.Connection,
+            run_id: str,
+            agent_name: str | None,
+            status: str,
+            thread_state: str,
+            result: str | None,
+            requests: list[tuple[str, str]],
+            lease: tuple[str, float] | None = None,
+        ) -> bool:
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if lease is not None and not ApprovalBroker._holds_lease(conn, run_id, lease):
+                return False
+            conn.execute(
+                "INSERT INTO runs (run_id, agent_name, status, thread_state, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status=excluded.status, thread_state=excluded.thread_state, "
+                "result=excluded.result, worker_id=NULL, claimed_at=NULL, updated_at=excluded.updated_at",
+                (run_id, agent_name, status, thread_state, result, now))
+            conn.execute("DELETE FROM approvals WHERE run_id = ?", (run_id,))
+            conn.executemany(
+                "INSERT INTO approvals (request_id, run_id, request, created_at) VALUES (?, ?, ?, ?)",
+                [(request_id, run_id, request, now) for request_id, request in requests])
+        return True
+
+    @staticmethod
+    def _holds_lease(
+            conn: sqlite3.Connection,
+            run_id: str,
+            lease: tuple[str, float],
+            lease_seconds: float | None = None,
+        ) -> bool:
+        """Whether a claim is still the current one, and with lease_seconds, not yet expired."""
+        worker_id, claimed_at = lease
+        if lease_seconds is not None and claimed_at < time.time() - lease_seconds:
+            return False
+        return conn.execute(
+            "SELECT 1 FROM runs WHERE run_id = ? AND status = 'running' AND worker_id = ? AND claimed_at = ?",
+            (run_id, worker_id, claimed_at)).fetchone() is not None
+
+    async def pending(self, limit: int = 100) -> list[PendingApproval]:
+        """
+        List approval requests that have no decision yet, oldest first.
+
+        :param limit: The maximum number of requests returned.
+        :return: The open approval requests.
+        """
+        rows = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT request_id, run_id, request, created_at FROM approvals "
+                "WHERE approved IS NULL ORDER BY created_at LIMIT ?", (limit,)).fetchall())
+        approvals = []
+        for request_id, run_id, request, created_at in rows:
+            function_call = json.loads(request)["function_call"]
+            approvals.append(PendingApproval(
+                request_id=request_id,
+                run_id=run_id,
+                function_name=function_call.get("name"),
+                arguments=function_call.get("arguments"),
+                created_at=created_at))
+        return approvals
+
+    async def submit(self, run_id: str, request_id: str, approved: bool) -> None:
+        """
+        Record the decision for an approval request.
+
+        The run becomes ready to resume once every one of its requests has a decision.
+
+        :param run_id: The run the request belongs to.
+        :param request_id: The identifier of the approval request.
+        :param approved: Whether the function call is approved.
+        :raises: KeyError if the request is unknown or was already decided.
+        """
+        updated = await self._execute(ApprovalBroker._write_decision, run_id, request_id, approved)
+        if not updated:
+            raise KeyError(f"No open approval request {request_id!r} in run {run_id!r}")
+
+    @staticmethod
+    def _write_decision(conn: sqlite3.Connection, run_id: str, request_id: str, approved: bool) -> bool:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE approvals SET approved = ? WHERE run_id = ? AND request_id = ? AND approved IS NULL",
+                (int(approved), run_id, request_id)).rowcount
+            if not updated:
+                return False
+            conn.execute(
+                "UPDATE runs SET status = 'decided', updated_at = ? WHERE run_id = ? AND status = 'pending' "
+                "AND NOT EXISTS (SELECT 1 FROM approvals WHERE run_id = ? AND approved IS NULL)",
+                (time.time(), run_id, run_id))
+        return True
+
+    async def resume_ready(self, agent: AgentProtocol, limit: int = 100, **kwargs: Any) -> dict[str, str | None]:
+        """
+        Claim decided runs of an agent and resume them concurrently.
+
+        :param agent: The agent the runs were started with.
+        :param limit: The maximum number of runs claimed in this call.
+        :param kwargs: Extra arguments for ``agent.run``, e.g. ``store=True``.
+        :return: Mapping of run identifier to the final text, or None for runs that paused again.
+                 Runs that failed are left out; they are logged and stored as failed with the error.
+        """
+        claimed = await self._execute(ApprovalBroker._claim, agent.name, self._worker_id, limit, self._lease_seconds)
+        semaphore = asyncio.Semaphore(self._max_concurrent_resumes)
+
+        async def resume(
+                run_id: str, thread_state: str, approvals: list[tuple[str, int]], claimed_at: float) -> str | None:
+            lease = (self._worker_id, claimed_at)
+            async with semaphore:
+                try:
+                    return await self._resume(agent, run_id, thread_state, approvals, lease, **kwargs)
+                except LeaseLost:
+                    logger.warning("Run %s was claimed again while being resumed, its outcome is discarded", run_id)
+                    raise
+                except Exception as e:
+                    logger.exception("Resuming run %s failed", run_id)
+                    await self._execute(ApprovalBroker._fail, run_id, lease, f"{type(e).__name__}: {e}")
+                    raise
+
+        results = await asyncio.gather(
+            *(resume(*run) for run in claimed),
+            return_exceptions=True)
+        return {
+            run_id: result
+            for (run_id, _, _, _), result in zip(claimed, results)
+            if not isinstance(result, BaseException)
+        }
+
+    @staticmethod
+    def _claim(
+            conn: sqlite3.Connection,
+            agent_name: str | None,
+            worker_id: str,
+            limit: int,
+            lease_seconds: float,
+        ) -> list[tuple[str, str, list[tuple[str, int]], float]]:
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT run_id, thread_state FROM runs WHERE agent_name IS ? AND "
+                "(status = 'decided' OR (status = 'running' AND claimed_at < ?)) "
+                "ORDER BY updated_at LIMIT ?",
+                (agent_name, now - lease_seconds, limit)).fetchall()
+            claimed = []
+            for run_id, thread_state in rows:
+                conn.execute(
+                    "UPDATE runs SET status = 'running', worker_id = ?, claimed_at = ? WHERE run_id = ?",
+                    (worker_id, now, run_id))
+                approvals = conn.execute(
+                    "SELECT request, approved FROM approvals WHERE run_id = ? ORDER BY created_at, request_id",
+                    (run_id,)).fetchall()
+                claimed.append((run_id, thread_state, approvals, now))
+        return claimed
+
+    @staticmethod
+    def _fail(conn: sqlite3.Connection, run_id: str, lease: tuple[str, float], error: str) -> None:
+        """Store the error of a run that failed while its lease was held."""
+        worker_id, claimed_at = lease
+        conn.execute(
+            "UPDATE runs SET status = 'failed', result = ?, worker_id = NULL, claimed_at = NULL, updated_at = ? "
+            "WHERE run_id = ? AND status = 'running' AND worker_id = ? AND claimed_at = ?",
+            (error, time.time(), run_id, worker_id, claimed_at))
+
+    async def _resume(
+            self,
+            agent: AgentProtocol,
+            run_id: str,
+            thread_state: str,
+            approvals: list[tuple[str, int]],
+            lease: tuple[str, float],
+            **kwargs: Any,
+        ) -> str | None:
+        """Send the recorded decisions on the restored thread and store the outcome."""
+        held = await self._execute(ApprovalBroker._holds_lease, run_id, lease, self._lease_seconds)
+        if not held:
+            raise LeaseLost(f"Run {run_id!r} was claimed again before it was resumed")
+        thread = await agent.deserialize_thread(json.loads(thread_state))
+        responses = [
+            FunctionApprovalRequestContent.from_dict(json.loads(request)).create_response(bool(approved))
+            for request, approved in approvals
+        ]
+        response = await agent.run(ChatMessage(role=Role.USER, contents=responses), thread=thread, **kwargs)
+        await self._save_outcome(run_id, agent, thread, response, lease)
+        return None if response.user_input_requests else response.text
+
+    async def result(self, run_id: str) -> tuple[str, str | None]:
+        """
+        Return the status and the final text of a run.
+
+        :param run_id: The run identifier.
+        :return: The status (pending, decided, running, completed or failed) and the final text if
+                 completed, the error if failed.
+        :raises: KeyError if the run is unknown.
+        """
+        row = await self._execute(
+            lambda conn: conn.execute("SELECT status, result FROM runs WHERE run_id = ?", (run_id,)).fetchone())
+        if row is None:
+            raise KeyError(f"Unknown run {run_id!r}")
+        return row[0], row[1]
+
+    async def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,93 @@
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from agent_framework import (
+    AgentExecutorResponse,
+    AgentRunResponse,
+    ChatMessage,
+    Executor,
+    FileCheckpointStorage,
+    InMemoryCheckpointStorage,
+    Role,
+    WorkflowBuilder,
+    WorkflowContext,
+    handler,
+)
+
+from checkpoint_store import SQLiteCheckpointStorage
+
+
+class Step(Executor):
+    """Stands in for an agent: forwards a response of a realistic size, without a model call."""
+
+    def __init__(self, id: str, text: str) -> None:
+        super().__init__(id)
+        self._text = text
+
+    @handler
+    async def start(self, text: str, ctx: WorkflowContext[AgentExecutorResponse]) -> None:
+        await self._reply([ChatMessage(role=Role.USER, text=text)], ctx)
+
+    @handler
+    async def step(self, prior: AgentExecutorResponse, ctx: WorkflowContext[AgentExecutorResponse]) -> None:
+        await self._reply(prior.full_conversation, ctx)
+
+    async def _reply(self, conversation: list[ChatMessage], ctx: WorkflowContext[AgentExecutorResponse]) -> None:
+        reply = ChatMessage(role=Role.ASSISTANT, text=self._text)
+        await ctx.send_message(AgentExecutorResponse(
+            self.id, AgentRunResponse(messages=[reply]), full_conversation=[*conversation, reply]))
+
+
+def build(steps: int, text: str, storage=None):
+    executors = [Step(f"step-{i}", text) for i in range(steps)]
+    builder = WorkflowBuilder().set_start_executor(executors[0])
+    for source, target in zip(executors, executors[1:]):
+        builder.add_edge(source, target)
+    if storage is not None:
+        builder.with_checkpointing(storage)
+    return builder.build()
+
+
+async def time_runs(steps: int, runs: int, text: str, storage=None) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        # A new workflow per run, as a new request would get.
+        workflow = build(steps, text, storage)
+        start = time.perf_counter()
+        await workflow.run("You are at the CN Tower.")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the cost of checkpointing a workflow run.")
+    parser.add_argument("--steps", type=int, default=4, help="Executors in the chain, one superstep each.")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--response-size", type=int, default=2000, help="Characters in each executor's response.")
+    args = parser.parse_args()
+    text = "x" * args.response_size
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_storage = SQLiteCheckpointStorage(str(Path(tmp) / "checkpoints.db"))
+        storages = {
+            "none": None,
+            "in memory": InMemoryCheckpointStorage(),
+            "file": FileCheckpointStorage(Path(tmp) / "files"),
+            "sqlite": sqlite_storage,
+        }
+        baseline = None
+        print(f"{'storage':12} {'median ms/run':>14} {'overhead ms/superstep':>22}")
+        for name, storage in storages.items():
+            median = statistics.median(await time_runs(args.steps, args.runs, text, storage))
+            baseline = median if baseline is None else baseline
+            # One checkpoint per superstep plus the one after the initial message.
+            overhead = (median - baseline) / (args.steps + 1)
+            print(f"{name:12} {median * 1000:14.2f} {overhead * 1000:22.2f}")
+        await sqlite_storage.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+import importlib
+
+from agent_framework import ExecutorCompletedEvent, WorkflowFailedEvent
+
+from simulated_chat_client import SimulatedChatClient
+
+# Landmarks, with the fields of the CityInfo models of both workflows, covering every route.
+PLACES = [
+    ("You are at the Eiffel Tower.", {"name": "Paris", "country": "France", "weather": "sunny"}),
+    ("You are at the CN Tower.", {"name": "Toronto", "country": "Canada", "weather": "snowy"}),
+    ("You are at the Space Needle.", {"name": "Seattle", "country": "United States", "weather": "rainy"}),
+    ("You are at the Colosseum.", {"name": "Rome", "country": "Italy", "weather": "sunny"}),
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return the q-th percentile of the values, nearest rank."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of the process, in MB (ru_maxrss is in KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def monitor_loop_lag(samples: list[float], interval: float = 0.01) -> None:
+    """Measure how late the event loop wakes up a sleeping task, until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def run_once(module, chat_client, rng: random.Random) -> tuple[float, bool]:
+    """Run a new workflow to completion, as one request would; City Info and one recommendation agent must complete."""
+    prompt, _ = rng.choice(PLACES)
+    workflow = module.build_workflow(chat_client)
+    start = time.perf_counter()
+    completed, failed = 0, False
+    async for event in workflow.run_stream(prompt):
+        if isinstance(event, ExecutorCompletedEvent):
+            completed += 1
+        elif isinstance(event, WorkflowFailedEvent):
+            failed = True
+    return time.perf_counter() - start, completed >= 2 and not failed
+
+
+async def run_level(module, chat_client, concurrency: int, duration: float, seed: int) -> dict:
+    """Keep ``concurrency`` runs in flight for ``duration`` seconds."""
+    latencies: list[float] = []
+    errors = 0
+    lag: list[float] = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(rng: random.Random) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            try:
+                latency, ok = await run_once(module, chat_client, rng)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(latency)
+            errors += not ok
+
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed + i)) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    monitor.cancel()
+    return {
+        "concurrency": concurrency,
+        "runs": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "lag_p99": percentile(lag, 99),
+        "lag_max": max(lag, default=0.0),
+        "rss": peak_rss_mb(),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Ramp the number of concurrent workflow runs against a simulated chat model, offline.")
+    parser.add_argument("workflow", nargs="?", default="agents_in_workflows_switch",
+                        choices=["agents_in_workflows_conditionals", "agents_in_workflows_switch"])
+    parser.add_argument("--levels", default="1,8,32,128,512", help="Comma separated concurrency levels.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level.")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Simulated seconds to the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--reply-tokens", type=int, default=80)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The framework warns about every agent created; thousands of runs would drown the report.
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+    module = importlib.import_module(args.workflow)
+    places = random.Random(args.seed)
+    chat_client = SimulatedChatClient(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        jitter=args.jitter,
+        # The answer does not depend on the prompt, any route is as likely as in production.
+        structured=lambda model: places.choice(PLACES)[1],
+        tool_names={"get_weather"},
+        seed=args.seed,
+    )
+
+    print(f"{args.workflow}: ttft {args.ttft:g}s, {args.tokens_per_second:g} tokens/s, "
+          f"{args.reply_tokens} tokens per reply, {args.duration:g}s per level")
+    print(f"{'concurrency':>11} {'runs':>6} {'errors':>6} {'runs/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'lag p99 ms':>10} {'lag max ms':>10} {'peak RSS MB':>11}")
+    for level in (int(level) for level in args.levels.split(",")):
+        r = await run_level(module, chat_client, level, args.duration, args.seed)
+        print(f"{r['concurrency']:11} {r['runs']:6} {r['errors']:6} {r['throughput']:8.1f} "
+              f"{r['p50']:7.2f} {r['p95']:7.2f} {r['p99']:7.2f} "
+              f"{r['lag_p99'] * 1000:10.1f} {r['lag_max'] * 1000:10.1f} {r['rss']:11.1f}")
+    print(f"Model requests: {chat_client.requests}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+MODULES = [
+    "settings",
+    "search_index_manager",
+    "agent",
+    "agent_with_tool",
+    "agent_with_rag_tool",
+    "agents_in_workflows",
+    "agents_in_workflows_conditionals",
+    "agents_in_workflows_switch",
+    "agent_mcp",
+    "agent_mcp_sse",
+    "agents_mcp_workflows",
+]
+
+
+def time_import(module: str, repeat: int, env: dict[str, str]) -> list[float]:
+    """Measure the wall time of a fresh interpreter importing the module."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True, env=env)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def slowest_imports(module: str, env: dict[str, str], top: int) -> list[tuple[int, str]]:
+    """Return the direct imports of the module with the largest cumulative time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True, env=env, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1 and name.strip() != module:
+            entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the import time of the demo modules.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="Show the slowest imports of each module.")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    # Importing must work without credentials: clients are created on first use.
+    env = {key: value for key, value in os.environ.items() if not key.startswith(("AZURE_", "OPENAI_"))}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    baseline = statistics.median(time_import("sys", args.repeat, env))
+
+    print(f"{'module':40} {'median ms':>10} {'over interpreter ms':>20}")
+    for module in args.modules:
+        median = statistics.median(time_import(module, args.repeat, env))
+        print(f"{module:40} {median * 1000:10.0f} {(median - baseline) * 1000:20.0f}")
+        if args.top:
+            for cumulative, name in slowest_imports(module, env, args.top):
+                print(f"    {name:36} {cumulative / 1000:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
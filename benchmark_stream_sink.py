@@ -0,0 +1,75 @@
+import os
+import time
+import asyncio
+import argparse
+from agent_framework import AgentRunUpdateEvent, AgentRunResponseUpdate, TextContent, FunctionCallContent, FunctionResultContent
+
+from stream_sink import StreamSink, VERBOSE_FORMATTERS
+
+
+def make_events(count: int, executors: int) -> list[AgentRunUpdateEvent]:
+    """Build a stream of single-token updates interleaved across executors."""
+    return [
+        AgentRunUpdateEvent(
+            f"executor-{i % executors}",
+            AgentRunResponseUpdate(contents=[TextContent(text=f"tok{i} ")]),
+        )
+        for i in range(count)
+    ]
+
+
+def print_per_token(events: list[AgentRunUpdateEvent], stream) -> None:
+    """The rendering loop used by the workflow scripts before StreamSink."""
+    last_executor_id = None
+    for event in events:
+        if isinstance(event, AgentRunUpdateEvent):
+            eid = event.executor_id
+            if eid != last_executor_id:
+                if last_executor_id is not None:
+                    print(file=stream)
+                print(f"{eid}:", end=" ", flush=True, file=stream)
+                last_executor_id = eid
+            for content in event.data.contents:
+                if isinstance(content, TextContent):
+                    print(content.text, end="", flush=True, file=stream)
+                elif isinstance(content, FunctionCallContent):
+                    print(content.name, end="", flush=True, file=stream)
+                elif isinstance(content, FunctionResultContent):
+                    print(content.result, end="", flush=True, file=stream)
+
+
+async def sink_stream(events: list[AgentRunUpdateEvent], stream) -> int:
+    sink = StreamSink.to_text_io(stream, formatters=VERBOSE_FORMATTERS)
+    for event in events:
+        await sink.handle(event)
+    await sink.aclose()
+    return sink.writes
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-token printing with StreamSink.")
+    parser.add_argument("--updates", type=int, default=200_000)
+    parser.add_argument("--executors", type=int, default=3)
+    parser.add_argument("--output", default=os.devnull, help="File to render into (default: the null device).")
+    args = parser.parse_args()
+
+    events = make_events(args.updates, args.executors)
+
+    with open(args.output, "w", encoding="utf-8") as stream:
+        start = time.perf_counter()
+        print_per_token(events, stream)
+        naive = time.perf_counter() - start
+
+    with open(args.output, "w", encoding="utf-8") as stream:
+        start = time.perf_counter()
+        writes = await sink_stream(events, stream)
+        coalesced = time.perf_counter() - start
+
+    print(f"updates:           {args.updates}")
+    print(f"print per token:   {args.updates / naive:,.0f} updates/s")
+    print(f"StreamSink:        {args.updates / coalesced:,.0f} updates/s ({writes} writes)")
+    print(f"speedup:           {naive / coalesced:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
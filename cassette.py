@@ -0,0 +1,251 @@
+import os
+import gzip
+import json
+import time
+import base64
+import asyncio
+import hashlib
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+from agent_framework import FunctionInvocationContext, FunctionMiddleware
+
+
+def _request_key(request: httpx.Request) -> str:
+    """Hash the method, path, query and body of a request; the host and the headers are left out."""
+    body = request.content
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.url.raw_path, body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _tool_key(context: FunctionInvocationContext) -> str:
+    arguments = context.arguments
+    if hasattr(arguments, "model_dump"):
+        arguments = arguments.model_dump()
+    payload = json.dumps([context.function.name, arguments], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _encode_chunk(chunk: bytes) -> str | dict[str, str]:
+    try:
+        return chunk.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(chunk).decode("ascii")}
+
+
+def _decode_chunk(chunk: str | dict[str, str]) -> bytes:
+    return base64.b64decode(chunk["b64"]) if isinstance(chunk, dict) else chunk.encode("utf-8")
+
+
+class Cassette:
+    """
+    Recording of the model, embeddings and tool traffic of a run, replayed offline.
+
+    In record mode every HTTP exchange of the openai clients (chat completions, Responses,
+    embeddings), with the timing of each streamed chunk, and every tool result are kept and
+    written to a gzipped JSON lines file by ``save``. In replay mode they are served from the
+    file: requests are matched on their method, path and body, tools on their name and
+    arguments; identical requests are answered in the recorded order. A request that was not
+    recorded gets a 404 response naming it, which the openai clients raise as NotFoundError
+    at once, without retrying.
+
+    :param path: The cassette file.
+    :param mode: "record" or "replay".
+    :param speed: Replay speed relative to the recording, e.g. 10 for ten times faster, 0 for no delays.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0) -> None:
+        """Constructor."""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.hits = 0
+        self.misses = 0
+        self.entries: list[dict[str, Any]] = []
+        self._queues: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._queues[entry["key"]].append(entry)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _next(self, key: str) -> dict[str, Any] | None:
+        """Return the next recorded entry for the key; the last one is reused once all were served."""
+        queue = self._queues.get(key)
+        if not queue:
+            return None
+        self.hits += 1
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    async def _sleep(self, seconds: float) -> None:
+        if self.speed > 0 and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    def save(self) -> None:
+        """Write the recorded entries, replacing the file."""
+        if not self.recording:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+        os.replace(tmp, self.path)
+
+    def wrap_transport(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """Return an httpx transport recording or replaying the exchanges of ``transport``."""
+        return CassetteTransport(self, transport)
+
+    def middleware(self) -> "CassetteFunctionMiddleware":
+        """Return the function middleware recording or replaying tool results."""
+        return CassetteFunctionMiddleware(self)
+
+    def install(self, chat_client: Any) -> None:
+        """Record or replay the tool results of every agent created by ``chat_client.create_agent``."""
+        # Function middleware set on a chat client is not applied by the framework, only
+        # middleware given to the agent is; the middleware is added to each new agent.
+        create_agent = chat_client.create_agent
+        middleware = self.middleware()
+
+        def create_agent_with_cassette(*args: Any, **kwargs: Any) -> Any:
+            own = kwargs.get("middleware") or []
+            kwargs["middleware"] = [*(own if isinstance(own, list) else [own]), middleware]
+            return create_agent(*args, **kwargs)
+
+        chat_client.create_agent = create_agent_with_cassette
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """Passes the response body through, noting each chunk and the delay before it."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, entry: dict[str, Any], started: float) -> None:
+        self._stream = stream
+        self._entry = entry
+        self._last = started
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            now = time.perf_counter()
+            self._entry["chunks"].append([round(now - self._last, 4), _encode_chunk(chunk)])
+            self._last = now
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, chunks: list) -> None:
+        self._cassette = cassette
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for delay, chunk in self._chunks:
+            await self._cassette._sleep(delay)
+            yield _decode_chunk(chunk)
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport recording the exchanges of another transport, or replaying them.
+
+    :param cassette: The cassette.
+    :param transport: The transport doing the requests when recording.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport) -> None:
+        """Constructor."""
+        self._cassette = cassette
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = _request_key(request)
+        if not self._cassette.recording:
+            entry = self._cassette._next(key)
+            if entry is None:
+                # An exception raised here would be retried and reported as a connection error by
+                # the openai clients, hiding which request was missing.
+                self._cassette.misses += 1
+                message = f"No recorded response in cassette {self._cassette.path} for {request.method} {request.url.path}"
+                return httpx.Response(
+                    404, headers={"x-should-retry": "false"},
+                    json={"error": {"code": "cassette_miss", "message": message}}, request=request)
+            return httpx.Response(
+                entry["status"], headers=entry["headers"], stream=_ReplayStream(self._cassette, entry["chunks"]),
+                request=request)
+
+        started = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        entry = {
+            "kind": "http",
+            "key": key,
+            "request": f"{request.method} {request.url.path}",
+            "status": response.status_code,
+            "headers": response.headers.multi_items(),
+            "chunks": [],
+        }
+        self._cassette.entries.append(entry)
+        response.stream = _RecordingStream(response.stream, entry, started)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class CassetteFunctionMiddleware(FunctionMiddleware):
+    """
+    Function middleware recording tool results, or answering tool calls from the cassette.
+
+    :param cassette: The cassette.
+    """
+
+    def __init__(self, cassette: Cassette) -> None:
+        """Constructor."""
+        self._cassette = cassette
+
+    async def process(
+            self,
+            context: FunctionInvocationContext,
+            next: Callable[[FunctionInvocationContext], Awaitable[None]],
+        ) -> None:
+        key = _tool_key(context)
+        if not self._cassette.recording:
+            entry = self._cassette._next(key)
+            if entry is None:
+                # Not recorded: the tool runs, like it would without the cassette.
+                await next(context)
+                return
+            await self._cassette._sleep(entry["elapsed"])
+            context.result = entry["result"]
+            return
+
+        started = time.perf_counter()
+        await next(context)
+        result = context.result
+        try:
+            json.dumps(result)
+        except TypeError:
+            result = str(result)
+        self._cassette.entries.append({
+            "kind": "tool",
+            "key": key,
+            "tool": context.function.name,
+            "elapsed": round(time.perf_counter() - started, 4),
+            "result": result,
+        })
@@ -0,0 +1,310 @@
+import json
+import asyncio
+import hashlib
+import logging
+import sqlite3
+from typing import Any, AsyncIterable
+
+from agent_framework import CheckpointStorage, Workflow, WorkflowCheckpoint, WorkflowEvent
+
+logger = logging.getLogger(__name__)
+
+
+def run_key(message: Any) -> str:
+    """Hash the input of a workflow run, the key its checkpoints are resumed by."""
+    payload = json.dumps(message, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCheckpointStorage:
+    """
+    Workflow checkpoint storage in a SQLite database.
+
+    Implements the agent_framework ``CheckpointStorage`` protocol, so it is passed to
+    ``WorkflowBuilder.with_checkpointing`` like the framework's ``FileCheckpointStorage``.
+    The runner saves a checkpoint after every superstep, with the messages the finished
+    executors sent (their outputs) that are still to be delivered; resuming delivers those
+    messages instead of running the finished executors again.
+
+    A checkpoint is one row written in a single transaction. Only the newest ``keep_last``
+    checkpoints of a workflow graph are kept, whatever workflow built from it wrote them,
+    and the checkpoints of a run tracked with begin_run are deleted once it finishes, so
+    the database stays small however often the workflow is rebuilt and run.
+
+    Checkpoints written by a tracked run record its run key, in the ``run_key`` metadata,
+    and the database counts the attempts of the run, see run_stream_resumable.
+
+    :param path: The SQLite database file.
+    :param keep_last: The number of checkpoints kept per workflow graph, None to keep all of them.
+    """
+
+    def __init__(self, path: str, keep_last: int | None = 20) -> None:
+        """Constructor."""
+        self._path = path
+        self._keep_last = keep_last
+        self._conn: sqlite3.Connection | None = None
+        self._db_lock = asyncio.Lock()
+        # The run key of the workflow ids of the tracked runs.
+        self._run_keys: dict[str, str] = {}
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Open the database and create the table if it is absent."""
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    checkpoint_id TEXT PRIMARY KEY,
+                    workflow_id TEXT NOT NULL,
+                    graph_signature TEXT,
+                    timestamp TEXT NOT NULL,
+                    pending INTEGER NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS runs (
+                    graph_signature TEXT NOT NULL,
+                    run_key TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    PRIMARY KEY (graph_signature, run_key)
+                );
+                """)
+            # Databases written before runs were tracked lack the run_key column.
+            if "run_key" not in {column[1] for column in conn.execute("PRAGMA table_info(checkpoints)")}:
+                conn.execute("ALTER TABLE checkpoints ADD COLUMN run_key TEXT")
+            conn.executescript(
+                """
+                CREATE INDEX IF NOT EXISTS checkpoints_workflow ON checkpoints(workflow_id, timestamp);
+                CREATE INDEX IF NOT EXISTS checkpoints_graph ON checkpoints(graph_signature, timestamp);
+                CREATE INDEX IF NOT EXISTS checkpoints_run ON checkpoints(graph_signature, run_key, timestamp);
+                """)
+            self._conn = conn
+        return self._conn
+
+    async def _execute(self, fn, *args: Any) -> Any:
+        """Run a blocking database function off the event loop."""
+        async with self._db_lock:
+            return await asyncio.to_thread(fn, self._get_connection(), *args)
+
+    async def save_checkpoint(self, checkpoint: WorkflowCheckpoint) -> str:
+        """Save a checkpoint and return its ID."""
+        key = self._run_keys.get(checkpoint.workflow_id)
+        if key is not None:
+            checkpoint.metadata = {**(checkpoint.metadata or {}), "run_key": key}
+        row = (
+            checkpoint.checkpoint_id,
+            checkpoint.workflow_id,
+            (checkpoint.metadata or {}).get("graph_signature"),
+            checkpoint.timestamp,
+            int(any(checkpoint.messages.values())),
+            json.dumps(checkpoint.to_dict(), ensure_ascii=False, separators=(",", ":")),
+            key,
+        )
+        await self._execute(SQLiteCheckpointStorage._write, row, self._keep_last)
+        return checkpoint.checkpoint_id
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, row: tuple, keep_last: int | None) -> None:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(checkpoint_id, workflow_id, graph_signature, timestamp, pending, data, run_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            if keep_last is not None:
+                conn.execute(
+                    "DELETE FROM checkpoints WHERE graph_signature IS ? AND checkpoint_id NOT IN ("
+                    "SELECT checkpoint_id FROM checkpoints WHERE graph_signature IS ? ORDER BY timestamp DESC LIMIT ?)",
+                    (row[2], row[2], keep_last))
+                # A run whose checkpoints were all pruned can no longer be resumed.
+                conn.execute(
+                    "DELETE FROM runs WHERE graph_signature IS ? AND run_key IS NOT ? AND run_key NOT IN ("
+                    "SELECT run_key FROM checkpoints WHERE graph_signature IS ? AND run_key IS NOT NULL)",
+                    (row[2], row[6], row[2]))
+
+    async def load_checkpoint(self, checkpoint_id: str) -> WorkflowCheckpoint | None:
+        """Load a checkpoint by ID."""
+        row = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT data FROM checkpoints WHERE checkpoint_id = ?", (checkpoint_id,)).fetchone())
+        return WorkflowCheckpoint.from_dict(json.loads(row[0])) if row else None
+
+    async def list_checkpoint_ids(self, workflow_id: str | None = None) -> list[str]:
+        """List checkpoint IDs, oldest first. If workflow_id is provided, filter by that workflow."""
+        rows = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE ? IS NULL OR workflow_id = ? ORDER BY timestamp",
+                (workflow_id, workflow_id)).fetchall())
+        return [row[0] for row in rows]
+
+    async def list_checkpoints(self, workflow_id: str | None = None) -> list[WorkflowCheckpoint]:
+        """List checkpoint objects, oldest first. If workflow_id is provided, filter by that workflow."""
+        rows = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT data FROM checkpoints WHERE ? IS NULL OR workflow_id = ? ORDER BY timestamp",
+                (workflow_id, workflow_id)).fetchall())
+        return [WorkflowCheckpoint.from_dict(json.loads(row[0])) for row in rows]
+
+    async def delete_checkpoint(self, checkpoint_id: str) -> bool:
+        """Delete a checkpoint by ID."""
+        deleted = await self._execute(
+            lambda conn: conn.execute(
+                "DELETE FROM checkpoints WHERE checkpoint_id = ?", (checkpoint_id,)).rowcount)
+        return bool(deleted)
+
+    async def latest_unfinished(self, graph_signature: str, run_key: str) -> str | None:
+        """
+        Return the newest checkpoint of a run of a workflow graph if the run did not finish.
+
+        :param graph_signature: The ``graph_signature_hash`` of the workflow.
+        :param run_key: The key of the run, see run_key.
+        :return: The checkpoint id, or None if the newest checkpoint has nothing left to deliver.
+        """
+        row = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT checkpoint_id, pending FROM checkpoints WHERE graph_signature = ? AND run_key = ? "
+                "ORDER BY timestamp DESC LIMIT 1", (graph_signature, run_key)).fetchone())
+        return row[0] if row and row[1] else None
+
+    async def begin_run(self, workflow_id: str, graph_signature: str, run_key: str, resumed: bool) -> int:
+        """
+        Track a run: its checkpoints record its key and its attempts are counted.
+
+        :param workflow_id: The id its checkpoints are written under, the interrupted run's one on resume.
+        :param graph_signature: The ``graph_signature_hash`` of the workflow.
+        :param run_key: The key of the run, see run_key.
+        :param resumed: Whether the run resumes an interrupted one, otherwise its count restarts.
+        :return: The number of attempts of the run, this one included.
+        """
+        self._run_keys[workflow_id] = run_key
+
+        def begin(conn: sqlite3.Connection) -> int:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT INTO runs VALUES (?, ?, 1) ON CONFLICT (graph_signature, run_key) "
+                    "DO UPDATE SET attempts = CASE WHEN ? THEN attempts + 1 ELSE 1 END",
+                    (graph_signature, run_key, resumed))
+                return conn.execute(
+                    "SELECT attempts FROM runs WHERE graph_signature = ? AND run_key = ?",
+                    (graph_signature, run_key)).fetchone()[0]
+
+        return await self._execute(begin)
+
+    async def attempts(self, graph_signature: str, run_key: str) -> int:
+        """Return the number of attempts of a run, 0 if it is not tracked."""
+        row = await self._execute(
+            lambda conn: conn.execute(
+                "SELECT attempts FROM runs WHERE graph_signature = ? AND run_key = ?",
+                (graph_signature, run_key)).fetchone())
+        return row[0] if row else 0
+
+    async def end_run(self, workflow_id: str, graph_signature: str, run_key: str, finished: bool) -> None:
+        """
+        Stop tracking a run; a finished or abandoned run also loses its checkpoints.
+
+        :param workflow_id: The id its checkpoints were written under.
+        :param graph_signature: The ``graph_signature_hash`` of the workflow.
+        :param run_key: The key of the run.
+        :param finished: Whether to delete the run, otherwise it is kept to be resumed.
+        """
+        self._run_keys.pop(workflow_id, None)
+        if not finished:
+            return
+
+        def delete(conn: sqlite3.Connection) -> None:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "DELETE FROM checkpoints WHERE graph_signature = ? AND run_key = ?", (graph_signature, run_key))
+                conn.execute("DELETE FROM runs WHERE graph_signature = ? AND run_key = ?", (graph_signature, run_key))
+
+        await self._execute(delete)
+
+    async def close(self) -> None:
+        """Close the database connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+async def latest_unfinished_checkpoint(storage: CheckpointStorage, workflow: Workflow, key: str) -> str | None:
+    """
+    Find the checkpoint to resume a run of a workflow from after a failure or a restart.
+
+    Checkpoints are matched on the graph signature, since a rebuilt workflow gets a new id,
+    and on the run key, so only a run of the same input is resumed.
+
+    :param storage: The checkpoint storage.
+    :param workflow: The workflow, built the same way as the one that was interrupted.
+    :param key: The key of the run, see run_key.
+    :return: The newest checkpoint id if that run still had messages to deliver, None otherwise.
+    """
+    if isinstance(storage, SQLiteCheckpointStorage):
+        return await storage.latest_unfinished(workflow.graph_signature_hash, key)
+    checkpoints = [
+        checkpoint for checkpoint in await storage.list_checkpoints()
+        if (checkpoint.metadata or {}).get("graph_signature") == workflow.graph_signature_hash
+        and (checkpoint.metadata or {}).get("run_key") == key
+    ]
+    if not checkpoints:
+        return None
+    latest = max(checkpoints, key=lambda checkpoint: checkpoint.timestamp)
+    return latest.checkpoint_id if any(latest.messages.values()) else None
+
+
+async def run_stream_resumable(
+        workflow: Workflow,
+        message: Any,
+        storage: CheckpointStorage,
+        key: str | None = None,
+        max_attempts: int = 3,
+    ) -> AsyncIterable[WorkflowEvent]:
+    """
+    Resume the interrupted run of a workflow for the same input, or start a new run.
+
+    On resume, the outputs stored in the checkpoint are delivered to the next executors, so
+    the agents that already finished are not called again. A run that failed
+    ``max_attempts`` times is abandoned, its checkpoints deleted, and started anew; a run
+    that finishes deletes its checkpoints.
+
+    The attempts are counted, and the checkpoints tagged with their run, by a
+    SQLiteCheckpointStorage; other storages only resume checkpoints whose ``run_key``
+    metadata they recorded, and never abandon a run.
+
+    :param workflow: The workflow, built with ``with_checkpointing(storage)``.
+    :param message: The input of the run.
+    :param storage: The checkpoint storage.
+    :param key: The key of the run, by default a hash of the message, see run_key.
+    :param max_attempts: The number of times a run is attempted before it is abandoned.
+    :return: The workflow events.
+    """
+    key = key or run_key(message)
+    graph_signature = workflow.graph_signature_hash
+    checkpoint_id = await latest_unfinished_checkpoint(storage, workflow, key)
+    tracked = isinstance(storage, SQLiteCheckpointStorage)
+    if checkpoint_id is not None and tracked and await storage.attempts(graph_signature, key) >= max_attempts:
+        logger.warning("Abandoning the run %s after %d failed attempts", key[:12], max_attempts)
+        await storage.end_run(workflow.id, graph_signature, key, finished=True)
+        checkpoint_id = None
+
+    workflow_id = workflow.id
+    if checkpoint_id is not None:
+        checkpoint = await storage.load_checkpoint(checkpoint_id)
+        workflow_id = checkpoint.workflow_id if checkpoint else workflow_id
+    if tracked:
+        await storage.begin_run(workflow_id, graph_signature, key, resumed=checkpoint_id is not None)
+
+    finished = False
+    try:
+        if checkpoint_id is None:
+            events = workflow.run_stream(message)
+        else:
+            events = workflow.run_stream_from_checkpoint(checkpoint_id, storage)
+        async for event in events:
+            yield event
+        finished = True
+    finally:
+        if tracked:
+            await storage.end_run(workflow_id, graph_signature, key, finished)
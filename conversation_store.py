@@ -0,0 +1,90 @@
+import os
+import json
+import tempfile
+
+from agent_framework import AgentProtocol, AgentThread
+
+
+class ConversationStore:
+    """
+    File-backed map from a conversation key to the service-side conversation id.
+
+    With the Responses API and ``store=True`` the service keeps the transcript and every
+    response gets an id that can be continued with ``previous_response_id``. Persisting
+    that id is enough to resume a conversation later, in this or another process, while
+    sending only the new messages over the wire.
+
+    :param path: The JSON file used to persist the conversation ids.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Constructor."""
+        self._path = path
+        self._conversations: dict[str, str] | None = None
+
+    def _load(self) -> dict[str, str]:
+        """Load the conversations from disk if they are absent."""
+        if self._conversations is None:
+            try:
+                with open(self._path, encoding="utf-8") as fp:
+                    self._conversations = json.load(fp)
+            except FileNotFoundError:
+                self._conversations = {}
+        return self._conversations
+
+    def _dump(self) -> None:
+        """Atomically write the conversations to disk."""
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            json.dump(self._conversations, fp)
+        os.replace(tmp_path, self._path)
+
+    def get(self, key: str) -> str | None:
+        """
+        Return the stored conversation id.
+
+        :param key: The conversation key.
+        :return: The conversation or response id, or None if the key is unknown.
+        """
+        return self._load().get(key)
+
+    def save(self, key: str, thread: AgentThread) -> str:
+        """
+        Store the service-side id of a thread.
+
+        :param key: The conversation key.
+        :param thread: A thread that was run with ``store=True``.
+        :return: The stored conversation id.
+        :raises: ValueError if the thread is not service managed.
+        """
+        if thread.service_thread_id is None:
+            raise ValueError(
+                "The thread has no service-side conversation id. "
+                "Run the agent with store=True on a client that supports stored responses.")
+        self._load()[key] = thread.service_thread_id
+        self._dump()
+        return thread.service_thread_id
+
+    def resume(self, agent: AgentProtocol, key: str) -> AgentThread:
+        """
+        Build a thread continuing the stored conversation.
+
+        :param agent: The agent that created the conversation.
+        :param key: The conversation key.
+        :return: A service-managed thread; runs on it only send the new messages.
+        :raises: KeyError if the key is unknown.
+        """
+        conversation_id = self.get(key)
+        if conversation_id is None:
+            raise KeyError(f"No stored conversation for {key!r}")
+        return agent.get_new_thread(service_thread_id=conversation_id)
+
+    def delete(self, key: str) -> None:
+        """
+        Forget a conversation.
+
+        :param key: The conversation key.
+        """
+        if self._load().pop(key, None) is not None:
+            self._dump()
@@ -0,0 +1,127 @@
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Never
+
+from agent_framework import (
+    AgentExecutorResponse,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    ChatAgent,
+    Executor,
+    WorkflowContext,
+    handler,
+)
+
+
+@dataclass
+class BranchResult:
+    """The outcome of one branch of a fan-out."""
+    branch: str
+    value: Any = None
+    text: str | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class FanInResult:
+    """The merged outputs of the branches that finished, and why the others did not."""
+    results: dict[str, Any] = field(default_factory=dict)
+    missing: dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class BranchExecutor(Executor):
+    """
+    Runs an agent as one branch of a fan-out, within a time limit.
+
+    The branch always sends a BranchResult, also when the agent fails or runs out of
+    time, so the fan-in that waits for every branch is never left hanging. Streamed
+    updates are emitted under the branch id as they arrive; updates of branches running
+    at the same time interleave in the event stream and consumers group them by
+    ``executor_id``, as StreamSink does.
+
+    :param agent: The agent answering for this branch.
+    :param timeout: Seconds the agent is given, None for no limit.
+    :param id: The executor id, the agent name by default.
+    """
+
+    def __init__(self, agent: ChatAgent, timeout: float | None = None, id: str | None = None) -> None:
+        """Constructor."""
+        super().__init__(id or agent.name)
+        self._agent = agent
+        self._timeout = timeout
+
+    @handler
+    async def run(self, prior: AgentExecutorResponse, ctx: WorkflowContext[BranchResult]) -> None:
+        messages = prior.full_conversation or prior.agent_run_response.messages
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self._timeout):
+                response = await self._run_agent(messages, ctx)
+        except TimeoutError:
+            result = BranchResult(self.id, error=f"timed out after {self._timeout:g}s")
+        except Exception as e:
+            result = BranchResult(self.id, error=f"{type(e).__name__}: {e}")
+        else:
+            result = BranchResult(self.id, value=response.value, text=response.text)
+        result.elapsed = time.perf_counter() - start
+        await ctx.send_message(result)
+
+    async def _run_agent(self, messages: list, ctx: WorkflowContext[BranchResult]) -> AgentRunResponse:
+        response_format = self._agent.chat_options.response_format
+        # Every run gets its own thread, a branch must not see the previous request.
+        thread = self._agent.get_new_thread()
+        if not ctx.is_streaming():
+            response = await self._agent.run(messages, thread=thread)
+        else:
+            updates: list[AgentRunResponseUpdate] = []
+            async for update in self._agent.run_stream(messages, thread=thread):
+                updates.append(update)
+                await ctx.add_event(AgentRunUpdateEvent(self.id, update))
+            response = AgentRunResponse.from_agent_run_response_updates(updates)
+        if response_format is not None:
+            response.try_parse_value(response_format)
+        return response
+
+
+class AggregatorExecutor(Executor):
+    """
+    Fan-in merging the branch results into one FanInResult workflow output.
+
+    Partial results are accepted as long as at least ``min_results`` branches succeeded;
+    the missing branches are listed with the reason. Below that the workflow fails.
+
+    :param min_results: The number of branches that must succeed, None for all of them.
+    :param id: The executor id.
+    """
+
+    def __init__(self, min_results: int | None = 1, id: str = "Aggregator") -> None:
+        """Constructor."""
+        super().__init__(id)
+        self._min_results = min_results
+
+    @handler
+    async def merge(self, results: list[BranchResult], ctx: WorkflowContext[Never, FanInResult]) -> None:
+        merged = FanInResult(elapsed=max((result.elapsed for result in results), default=0.0))
+        for result in results:
+            if result.ok:
+                merged.results[result.branch] = result.value if result.value is not None else result.text
+            else:
+                merged.missing[result.branch] = result.error
+        required = len(results) if self._min_results is None else self._min_results
+        if len(merged.results) < required:
+            raise RuntimeError(
+                f"Only {len(merged.results)} of {len(results)} branches succeeded, {required} required: "
+                + "; ".join(f"{branch}: {error}" for branch, error in merged.missing.items()))
+        await ctx.yield_output(merged)
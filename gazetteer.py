@@ -0,0 +1,313 @@
+import re
+import json
+import functools
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic import BaseModel
+from agent_framework import (
+    AgentExecutorResponse,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    ChatMessage,
+    Executor,
+    Role,
+    WorkflowBuilder,
+    WorkflowContext,
+    handler,
+)
+
+DEFAULT_PATH = Path(__file__).with_name("gazetteer.json")
+
+# Confidence lost for each token matched with a typo.
+FUZZY_PENALTY = 0.1
+# Shorter tokens are only matched exactly, a single edit turns too many words into names.
+MIN_FUZZY_LENGTH = 6
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> list[str]:
+    """Split text into lower case ASCII tokens, dropping accents and punctuation."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower().replace("'", "")).split()
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Check whether the strings differ by at most one insertion, deletion or substitution."""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+@dataclass(frozen=True)
+class Place:
+    """A city and its country, with the landmark it was recognised from if any."""
+    city: str
+    country: str
+    landmark: str | None = None
+
+
+@dataclass(frozen=True)
+class GazetteerMatch:
+    """A resolved place."""
+    place: Place
+    confidence: float
+    names: tuple[str, ...]
+
+
+@dataclass
+class GazetteerStats:
+    """Counters of the lookups done by a gazetteer."""
+    lookups: int = 0
+    hits: int = 0
+    fuzzy_hits: int = 0
+    ambiguous: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups answered without the model."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+@dataclass
+class _Entry:
+    kind: str
+    name: str
+    places: frozenset[Place] = frozenset()
+    country: str | None = None
+
+
+@dataclass
+class _Node:
+    children: dict[str, "_Node"] = field(default_factory=dict)
+    entries: list[_Entry] = field(default_factory=list)
+
+
+class Gazetteer:
+    """
+    In-memory index of landmarks, cities and countries.
+
+    Names are stored in a trie of normalized tokens, so a lookup is one pass over the
+    input tokens. Tokens of six or more characters also match a name with one typo,
+    at a lower confidence. A lookup resolves only when the names found agree on exactly
+    one city: a landmark decides the city, a city name shared by several countries needs
+    the country to be mentioned too.
+
+    :param data: The gazetteer data, see gazetteer.json for the format.
+    """
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        """Constructor."""
+        self._root = _Node()
+        self._vocabulary: set[str] = set()
+        self.stats = GazetteerStats()
+
+        for country, aliases in data.get("countries", {}).items():
+            for name in [country, *aliases]:
+                self._add(name, _Entry("country", country, country=country))
+
+        cities: dict[str, set[Place]] = {}
+        for city, country, *aliases in data.get("cities", []):
+            place = Place(city, country)
+            for name in [city, *aliases]:
+                cities.setdefault(" ".join(normalize(name)), set()).add(place)
+        for key, places in cities.items():
+            self._add(key, _Entry("city", min(place.city for place in places), places=frozenset(places)))
+
+        for landmark, city, country, *aliases in data.get("landmarks", []):
+            place = Place(city, country, landmark)
+            for name in [landmark, *aliases]:
+                self._add(name, _Entry("landmark", landmark, places=frozenset([place])))
+
+    @classmethod
+    def load(cls, path: str | Path = DEFAULT_PATH) -> "Gazetteer":
+        """
+        Load a gazetteer from a JSON data file.
+
+        :param path: The data file, the bundled gazetteer.json by default.
+        :return: The gazetteer.
+        """
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _add(self, name: str, entry: _Entry) -> None:
+        node = self._root
+        for token in normalize(name):
+            self._vocabulary.add(token)
+            node = node.children.setdefault(token, _Node())
+        if all(existing.kind != entry.kind or existing.name != entry.name for existing in node.entries):
+            node.entries.append(entry)
+
+    def _child(self, node: _Node, token: str) -> tuple[_Node | None, bool]:
+        """Return the child for the token and whether it was matched with a typo."""
+        child = node.children.get(token)
+        if child is not None:
+            return child, False
+        if len(token) < MIN_FUZZY_LENGTH or token in self._vocabulary:
+            return None, False
+        for key, candidate in node.children.items():
+            if key[0] == token[0] and _within_one_edit(key, token):
+                return candidate, True
+        return None, False
+
+    def _scan(self, tokens: list[str]) -> list[tuple[list[_Entry], int]]:
+        """Find the longest name starting at each position, left to right without overlaps."""
+        found = []
+        i = 0
+        while i < len(tokens):
+            node, fuzzy, best = self._root, 0, None
+            for j in range(i, len(tokens)):
+                node, typo = self._child(node, tokens[j])
+                if node is None:
+                    break
+                fuzzy += typo
+                if node.entries:
+                    best = (node.entries, fuzzy, j + 1)
+            if best is None:
+                i += 1
+                continue
+            entries, fuzzy, i = best
+            found.append((entries, fuzzy))
+        return found
+
+    def resolve(self, text: str, min_confidence: float = 0.9) -> GazetteerMatch | None:
+        """
+        Resolve the city mentioned in a text.
+
+        :param text: The user input, e.g. "You are at the CN Tower."
+        :param min_confidence: Matches below this confidence are reported as misses.
+        :return: The match, or None if the text does not name exactly one city confidently.
+        """
+        self.stats.lookups += 1
+        landmarks: set[Place] = set()
+        city_mentions: list[set[Place]] = []
+        countries: set[str] = set()
+        names: list[str] = []
+        fuzzy = 0
+        for entries, typos in self._scan(normalize(text)):
+            fuzzy += typos
+            for entry in entries:
+                names.append(entry.name)
+                if entry.kind == "landmark":
+                    landmarks |= entry.places
+                elif entry.kind == "city":
+                    city_mentions.append(set(entry.places))
+                else:
+                    countries.add(entry.country)
+
+        candidates = set(landmarks) or set().union(*city_mentions)
+        if countries:
+            candidates = {place for place in candidates if place.country in countries}
+        for mention in city_mentions:
+            # A city named next to a landmark must be the landmark's city.
+            candidates = {place for place in candidates if any(place.city == other.city for other in mention)}
+
+        if len(candidates) != 1:
+            if len(candidates) > 1 or landmarks or city_mentions:
+                self.stats.ambiguous += 1
+            self.stats.misses += 1
+            return None
+        confidence = max(0.0, 1.0 - FUZZY_PENALTY * fuzzy)
+        if confidence < min_confidence:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        if fuzzy:
+            self.stats.fuzzy_hits += 1
+        return GazetteerMatch(candidates.pop(), confidence, tuple(names))
+
+
+@functools.cache
+def load_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer loaded from the bundled data file."""
+    return Gazetteer.load()
+
+
+def resolved(message: Any) -> bool:
+    """Edge condition for responses, from the resolver or the agent."""
+    return isinstance(message, AgentExecutorResponse)
+
+
+def unresolved(message: Any) -> bool:
+    """Edge condition for inputs the resolver hands to the agent."""
+    return not isinstance(message, AgentExecutorResponse)
+
+
+class GazetteerResolver(Executor):
+    """
+    Deterministic fast path in front of the agent that extracts the city.
+
+    On a confident match the resolver answers with an AgentExecutorResponse carrying
+    the structured value, shaped like the agent's own response, so the edges after the
+    agent route it unchanged. Other inputs are forwarded as they are to the agent.
+
+    :param gazetteer: The index of places.
+    :param to_value: Builds the structured output from the place, e.g. a CityInfo.
+    :param min_confidence: The confidence needed to skip the agent.
+    :param id: The executor id.
+    """
+
+    def __init__(
+            self,
+            gazetteer: Gazetteer,
+            to_value: Callable[[Place], BaseModel],
+            min_confidence: float = 0.9,
+            id: str = "City Resolver",
+        ) -> None:
+        """Constructor."""
+        super().__init__(id)
+        self._gazetteer = gazetteer
+        self._to_value = to_value
+        self._min_confidence = min_confidence
+
+    @property
+    def stats(self) -> GazetteerStats:
+        """The lookup counters of the gazetteer."""
+        return self._gazetteer.stats
+
+    @handler
+    async def resolve(self, text: str, ctx: WorkflowContext[AgentExecutorResponse | str]) -> None:
+        match = self._gazetteer.resolve(text, self._min_confidence)
+        if match is None:
+            await ctx.send_message(text)
+            return
+        value = self._to_value(match.place)
+        reply = ChatMessage(role=Role.ASSISTANT, text=value.model_dump_json(), author_name=self.id)
+        if ctx.is_streaming():
+            await ctx.add_event(AgentRunUpdateEvent(
+                self.id, AgentRunResponseUpdate(contents=reply.contents, role=Role.ASSISTANT, author_name=self.id)))
+        response = AgentRunResponse(messages=[reply], value=value)
+        await ctx.send_message(AgentExecutorResponse(
+            self.id, response, full_conversation=[ChatMessage(role=Role.USER, text=text), reply]))
+
+
+def add_pre_resolver(
+        builder: WorkflowBuilder,
+        agent_executor: Executor,
+        resolver: GazetteerResolver | None,
+    ) -> list[Executor]:
+    """
+    Start the workflow with the resolver if there is one, falling back to the agent.
+
+    :param builder: The workflow builder.
+    :param agent_executor: The agent executor extracting the city.
+    :param resolver: The resolver, or None to start with the agent.
+    :return: The executors whose responses must be routed: the agent, and the resolver if any.
+             Edges from the resolver also see the inputs it forwards, so they need a condition
+             rejecting them, e.g. ``resolved`` or one built with ``structured_routing.when``.
+    """
+    if resolver is None:
+        builder.set_start_executor(agent_executor)
+        return [agent_executor]
+    builder.set_start_executor(resolver).add_edge(resolver, agent_executor, condition=unresolved)
+    return [agent_executor, resolver]
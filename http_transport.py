@@ -0,0 +1,272 @@
+import os
+import time
+import asyncio
+import socket
+import importlib.util
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+import httpx
+import httpcore
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class TransportSettings:
+    """Connection pool settings for the shared HTTP transport."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 50
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+    connect_timeout: float = 5.0
+    read_timeout: float = 600.0
+    dns_ttl: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "TransportSettings":
+        """Read the settings from HTTP_* environment variables, falling back to the defaults."""
+        defaults = cls()
+        return cls(
+            max_connections=_env_int("HTTP_MAX_CONNECTIONS", defaults.max_connections),
+            max_keepalive_connections=_env_int("HTTP_MAX_KEEPALIVE_CONNECTIONS", defaults.max_keepalive_connections),
+            keepalive_expiry=_env_float("HTTP_KEEPALIVE_EXPIRY", defaults.keepalive_expiry),
+            http2=os.getenv("HTTP_HTTP2", "1").lower() not in ("0", "false", "no"),
+            connect_timeout=_env_float("HTTP_CONNECT_TIMEOUT", defaults.connect_timeout),
+            read_timeout=_env_float("HTTP_READ_TIMEOUT", defaults.read_timeout),
+            dns_ttl=_env_float("HTTP_DNS_TTL", defaults.dns_ttl),
+        )
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """Snapshot of the connection pool."""
+    max_connections: int
+    connections: int
+    active: int
+    idle: int
+    http2: int
+    queued_requests: int
+    dns_hits: int
+    dns_misses: int
+
+    @property
+    def utilization(self) -> float:
+        """The share of the pool limit held by connections serving requests."""
+        return self.active / self.max_connections if self.max_connections else 0.0
+
+
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that caches name resolution.
+
+    Connections are opened to the resolved address while TLS still verifies the
+    original host name, so a cached entry only saves the lookup.
+
+    :param ttl: How long in seconds a resolved address is reused.
+    :param backend: The backend opening the sockets, the anyio backend by default.
+    """
+
+    def __init__(self, ttl: float, backend: httpcore.AsyncNetworkBackend | None = None) -> None:
+        """Constructor."""
+        self._ttl = ttl
+        self._backend = backend or httpcore.AnyIOBackend()
+        self._cache: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lookups: dict[tuple[str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _resolve(self, host: str, port: int) -> list[str]:
+        key = (host, port)
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            self.hits += 1
+            return cached[1]
+        # Connections opened at the same time share one lookup.
+        lookup = self._lookups.get(key)
+        if lookup is None:
+            self.misses += 1
+            lookup = asyncio.ensure_future(self._lookup(host, port))
+            self._lookups[key] = lookup
+            lookup.add_done_callback(lambda _: self._lookups.pop(key, None))
+        else:
+            self.hits += 1
+        return await asyncio.shield(lookup)
+
+    async def _lookup(self, host: str, port: int) -> list[str]:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[(host, port)] = (time.monotonic() + self._ttl, addresses)
+        return addresses
+
+    async def connect_tcp(
+            self,
+            host: str,
+            port: int,
+            timeout: float | None = None,
+            local_address: str | None = None,
+            socket_options: Iterable[Any] | None = None,
+        ) -> httpcore.AsyncNetworkStream:
+        """Open a connection to the first reachable address of the host."""
+        try:
+            addresses = await self._resolve(host, port)
+        except OSError:
+            addresses = [host]
+        error: Exception | None = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout=timeout, local_address=local_address, socket_options=socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        # Every cached address failed, the entry is probably stale.
+        self._cache.pop((host, port), None)
+        raise error
+
+    async def connect_unix_socket(self, path: str, timeout: float | None = None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class SharedAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport with a tuned connection pool, HTTP/2 when the h2 package is
+    installed, and cached name resolution.
+
+    :param settings: The pool settings.
+    """
+
+    def __init__(self, settings: TransportSettings) -> None:
+        """Constructor."""
+        self._settings = settings
+        self._http2 = settings.http2 and importlib.util.find_spec("h2") is not None
+        limits = httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        )
+        super().__init__(http2=self._http2, limits=limits)
+        # Rebuild the pool with the caching backend; httpx does not expose the backend.
+        self._dns = CachingDNSBackend(settings.dns_ttl)
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=self._pool._ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=self._http2,
+            network_backend=self._dns,
+        )
+
+    def pool_stats(self) -> PoolStats:
+        """Return a snapshot of the connection pool."""
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        http2 = sum(1 for connection in connections if "HTTP/2" in repr(connection))
+        return PoolStats(
+            max_connections=self._settings.max_connections,
+            connections=len(connections),
+            active=len(connections) - idle,
+            idle=idle,
+            http2=http2,
+            queued_requests=sum(1 for request in self._pool._requests if request.connection is None),
+            dns_hits=self._dns.hits,
+            dns_misses=self._dns.misses,
+        )
+
+
+def shared_transport(client: httpx.AsyncClient) -> SharedAsyncTransport | None:
+    """Return the shared transport of a client, under the transports wrapping it, e.g. a cassette."""
+    transport = client._transport
+    while not isinstance(transport, SharedAsyncTransport):
+        transport = getattr(transport, "_transport", None)
+        if transport is None:
+            return None
+    return transport
+
+
+def create_http_client(
+        settings: TransportSettings,
+        wrap: Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport] | None = None,
+    ) -> httpx.AsyncClient:
+    """
+    Create an httpx client on a shared transport, for the openai clients.
+
+    :param settings: The pool settings.
+    :param wrap: Optional function wrapping the transport, e.g. to record the traffic.
+    :return: The client; its transport is available as ``client._transport``.
+    """
+    timeout = httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout)
+    transport = SharedAsyncTransport(settings)
+    return httpx.AsyncClient(transport=wrap(transport) if wrap else transport, timeout=timeout)
+
+
+def create_search_transport(settings: TransportSettings) -> Any:
+    """
+    Create an azure-core async transport with the same pool settings, for the search clients.
+
+    The aiohttp session is created on first use, inside the event loop, and shared by every
+    search client; closing a client does not close it. Call ``aclose`` on the transport when
+    the process is done with search.
+
+    :param settings: The pool settings.
+    :return: The transport, or None if aiohttp is not installed.
+    """
+    if importlib.util.find_spec("aiohttp") is None:
+        return None
+    import aiohttp
+    from azure.core.pipeline.transport import AioHttpTransport
+
+    class SharedAioHttpTransport(AioHttpTransport):
+        async def open(self):
+            if self.session is None:
+                connector = aiohttp.TCPConnector(
+                    limit=settings.max_connections,
+                    ttl_dns_cache=int(settings.dns_ttl),
+                    keepalive_timeout=settings.keepalive_expiry,
+                )
+                self.session = aiohttp.ClientSession(
+                    connector=connector,
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                    auto_decompress=False,
+                    trust_env=True,
+                )
+            await super().open()
+
+        async def close(self):
+            # Shared by all search clients, see aclose.
+            pass
+
+        async def aclose(self):
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
+            self._has_been_opened = False
+
+    return SharedAioHttpTransport()
+
+
+async def warm_up(client: httpx.AsyncClient, urls: Iterable[str], connections: int = 1) -> None:
+    """
+    Open connections ahead of the first request.
+
+    Any response, including 401 or 404, means the TCP and TLS handshakes are done
+    and the connection is back in the pool.
+
+    :param client: The client to warm up.
+    :param urls: The endpoints that will be used, e.g. the Azure OpenAI endpoint.
+    :param connections: The number of connections opened to each endpoint.
+    :raises: httpx.TransportError if an endpoint cannot be reached.
+    """
+    await asyncio.gather(*(client.head(url) for url in urls if url for _ in range(connections)))
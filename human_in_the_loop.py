@@ -1,16 +1,10 @@
-import os
 import asyncio
 from typing import Annotated
 from pydantic import Field
-from agent_framework.azure import AzureOpenAIChatClient
 from agent_framework import ai_function, ChatMessage, Role, TextContent, DataContent, FunctionCallContent, FunctionResultContent, FunctionApprovalRequestContent
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from conversation_store import ConversationStore
+from settings import get_responses_client
 
 @ai_function(approval_mode="always_require")
 def get_weather(
@@ -19,16 +13,21 @@ def get_weather(
     """Get the weather for a given location."""
     return f"The weather in {location} is cloudy with a high of 15°C."
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    instructions="You are a helpful assistant",
-    tools=get_weather
-)
+# The Responses client keeps the conversation on the service side (store=True),
+# so resuming after the approval only sends the approval message.
+def create_agent():
+    return get_responses_client().create_agent(
+        instructions="You are a helpful assistant",
+        tools=get_weather
+    )
+
+conversation_store = ConversationStore(".conversations.json")
+
 async def main():
-    async for update in agent.run_stream("What is the weather like in Toronto?"):
+    agent = create_agent()
+    thread = agent.get_new_thread()
+
+    async for update in agent.run_stream("What is the weather like in Toronto?", thread=thread, store=True):
         for content in update.contents:
             print(f"Content type: {type(content)}")
             if isinstance(content, TextContent):
@@ -51,23 +50,22 @@ async def main():
 
     user_approval = True
 
+    # Remember where the conversation paused. Any process can pick it up from here.
+    conversation_store.save("toronto-weather", thread)
+
     approval_message = ChatMessage(role=Role.USER, contents=[user_input_needed.create_response(user_approval)])        
 
     #Uncomment if you don't want final to stream the end result
-    #final_result = await agent.run([
-    #    "What is the weather like in Toronto?",
-    #    ChatMessage(role=Role.ASSISTANT, contents=[user_input_needed]),
-    #    approval_message
-    #])
+    #final_result = await agent.run(approval_message, thread=conversation_store.resume(agent, "toronto-weather"), store=True)
 
     #print(final_result)
 
     print("-"*50)
 
-    async for update in agent.run_stream(["What is the weather like in Toronto?",
-        ChatMessage(role=Role.ASSISTANT, contents=[user_input_needed]),
-        approval_message
-    ]):
+    # Only the approval delta goes over the wire; the service already has the
+    # question and the pending function call under the stored response id.
+    resumed_thread = conversation_store.resume(agent, "toronto-weather")
+    async for update in agent.run_stream(approval_message, thread=resumed_thread, store=True):
         for content in update.contents:
             print(f"Content type: {type(content)}")
             if isinstance(content, TextContent):
@@ -80,5 +78,8 @@ async def main():
                 print(f"🔧 Function Result: {content.result}")
 
 
+    conversation_store.save("toronto-weather", resumed_thread)
+
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Annotated
+from pydantic import Field
+from agent_framework import ai_function
+
+from approval_broker import ApprovalBroker
+from settings import get_responses_client
+
+@ai_function(approval_mode="always_require")
+def get_weather(
+    location: Annotated[str, Field(description="The location to get the weather for.")],
+) -> str:
+    """Get the weather for a given location."""
+    return f"The weather in {location} is cloudy with a high of 15°C."
+
+def create_agent():
+    return get_responses_client().create_agent(
+        name="weather_agent",
+        instructions="You are a helpful assistant",
+        tools=get_weather
+    )
+
+broker = ApprovalBroker("approvals.db")
+
+async def main():
+    agent = create_agent()
+    try:
+        # Start the runs. Each one pauses on its approval request and is written to the
+        # database; no coroutine stays alive while it waits for a decision.
+        for city in ["Toronto", "Montreal", "Vancouver"]:
+            run_id = await broker.start(agent, f"What is the weather like in {city}?", store=True)
+            print(f"Started run {run_id}")
+
+        # Decisions can be submitted from any process, e.g. an approval API.
+        for approval in await broker.pending():
+            print(f"Approving {approval.function_name}({approval.arguments}) for run {approval.run_id}")
+            await broker.submit(approval.run_id, approval.request_id, approved=True)
+
+        print("-"*50)
+
+        # Any worker can pick up the decided runs and resume them concurrently.
+        results = await broker.resume_ready(agent, store=True)
+        for run_id, text in results.items():
+            print(f"{run_id}: {text}")
+    finally:
+        await broker.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
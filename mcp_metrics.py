@@ -0,0 +1,274 @@
+import time
+import bisect
+import contextvars
+from typing import Any, AsyncIterable, Awaitable, Callable
+
+from agent_framework import ChatContext, ChatMiddleware, ChatResponseUpdate, UsageContent, UsageDetails
+from mcp import types
+from mcp.server.lowlevel import Server
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from prompt_layout import cached_tokens
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Seconds spent in model calls by the tool call running in the current task.
+_llm_seconds: contextvars.ContextVar[list[float] | None] = contextvars.ContextVar("_llm_seconds", default=None)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Prometheus counter, one value per combination of label values.
+
+    :param name: The metric name.
+    :param help: The metric description.
+    :param labels: The label names.
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        """Constructor."""
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, key)} {value:g}" for key, value in self.values.items()]
+        return lines
+
+
+class Gauge:
+    """
+    Prometheus gauge, read when the metrics are rendered.
+
+    :param name: The metric name.
+    :param help: The metric description.
+    :param read: Returns the current value.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        """Constructor."""
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read():g}"]
+
+
+class Histogram:
+    """
+    Prometheus histogram with fixed buckets; an observation is a bisection and two additions.
+
+    :param name: The metric name.
+    :param help: The metric description.
+    :param labels: The label names.
+    :param buckets: The upper bounds of the buckets, increasing.
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Constructor."""
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label values: the count of each bucket, the +Inf one last, then the sum.
+        self.series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative:g}")
+        return lines
+
+
+class Metrics:
+    """
+    The metrics of an MCP server process, rendered in the Prometheus text format.
+
+    Collection only adds to plain counters in the request path; everything else, gauges
+    included, is computed when ``/metrics`` is scraped. The time of a tool call is split
+    into the model calls it made (``LlmMetrics``) and the rest, the framework and tool time.
+    """
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self.http_seconds = Histogram(
+            "mcp_http_request_seconds", "Duration of the HTTP requests, SSE streams included.", ("path", "status"))
+        self.tool_seconds = Histogram("mcp_tool_call_seconds", "Duration of the tool calls.", ("tool",))
+        self.tool_framework_seconds = Histogram(
+            "mcp_tool_framework_seconds", "Duration of the tool calls outside model calls.", ("tool",))
+        self.tool_errors = Counter("mcp_tool_call_errors_total", "Tool calls that failed.", ("tool",))
+        self.llm_seconds = Histogram("llm_request_seconds", "Duration of the model calls, until the last token.")
+        self.llm_errors = Counter("llm_request_errors_total", "Model calls that failed.")
+        self.llm_tokens = Counter("llm_tokens_total", "Tokens of the model calls.", ("kind",))
+        self.connections = 0
+        self.metrics: list[Any] = [
+            self.http_seconds, self.tool_seconds, self.tool_framework_seconds, self.tool_errors,
+            self.llm_seconds, self.llm_errors, self.llm_tokens,
+            Gauge("mcp_connections_in_flight", "Open SSE streams and streamable HTTP requests.", lambda: self.connections),
+        ]
+
+    def add(self, metric: Any) -> None:
+        """
+        Add a metric, e.g. a Gauge reading another component.
+
+        A metric of the same name is replaced, so an app created again on the same metrics
+        reports its own components once instead of repeating the family.
+        """
+        self.metrics = [m for m in self.metrics if m.name != metric.name]
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+    def record_usage(self, usage: UsageDetails | None) -> None:
+        if usage is None:
+            return
+        self.llm_tokens.inc("input", amount=usage.input_token_count or 0)
+        self.llm_tokens.inc("output", amount=usage.output_token_count or 0)
+        self.llm_tokens.inc("cached", amount=cached_tokens(usage))
+
+    def record_llm(self, seconds: float) -> None:
+        self.llm_seconds.observe(seconds)
+        spent = _llm_seconds.get()
+        if spent is not None:
+            spent[0] += seconds
+
+    def instrument(self, server: Server) -> Server:
+        """Time the tool calls of an MCP server."""
+        handler = server.request_handlers.get(types.CallToolRequest)
+        if handler is None or getattr(server, "_metrics", None) is self:
+            return server
+
+        async def call_tool(request: types.CallToolRequest) -> types.ServerResult:
+            tool = request.params.name
+            spent = [0.0]
+            token = _llm_seconds.set(spent)
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = await handler(request)
+                failed = bool(getattr(result.root, "isError", False))
+                return result
+            finally:
+                _llm_seconds.reset(token)
+                elapsed = time.perf_counter() - started
+                self.tool_seconds.observe(elapsed, tool)
+                self.tool_framework_seconds.observe(max(elapsed - spent[0], 0.0), tool)
+                if failed:
+                    self.tool_errors.inc(tool)
+
+        server.request_handlers[types.CallToolRequest] = call_tool
+        server._metrics = self
+        return server
+
+
+class LlmMetrics(ChatMiddleware):
+    """
+    Chat middleware timing the model calls and counting their tokens.
+
+    Install it with ``chat_client.middleware = [..., metrics]``.
+
+    :param metrics: The metrics to record to.
+    """
+
+    def __init__(self, metrics: Metrics) -> None:
+        """Constructor."""
+        self._metrics = metrics
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        try:
+            await next(context)
+        except Exception:
+            self._metrics.llm_errors.inc()
+            self._metrics.record_llm(time.perf_counter() - started)
+            raise
+        if not context.is_streaming:
+            self._metrics.record_llm(time.perf_counter() - started)
+            self._metrics.record_usage(context.result.usage_details if context.result else None)
+        elif context.result is not None:
+            context.result = self._observe(context.result, started)
+
+    async def _observe(self, updates: AsyncIterable[ChatResponseUpdate], started: float) -> AsyncIterable[ChatResponseUpdate]:
+        try:
+            async for update in updates:
+                for content in update.contents:
+                    if isinstance(content, UsageContent):
+                        self._metrics.record_usage(content.details)
+                yield update
+        except Exception:
+            self._metrics.llm_errors.inc()
+            raise
+        finally:
+            self._metrics.record_llm(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing the HTTP requests and counting the open connections.
+
+    :param app: The app.
+    :param metrics: The metrics to record to.
+    :param paths: The paths labelled by name, other paths are labelled "other".
+    :param connection_paths: The paths of the SSE streams and streamable HTTP requests.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            metrics: Metrics,
+            paths: tuple[str, ...] = ("/sse", "/messages", "/mcp", "/healthz", "/readyz", "/metrics"),
+            connection_paths: tuple[str, ...] = ("/sse", "/mcp"),
+        ) -> None:
+        """Constructor."""
+        self.app = app
+        self.metrics = metrics
+        self.paths = paths
+        self.connection_paths = connection_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        connection = scope["path"] in self.connection_paths
+        self.metrics.connections += connection
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.connections -= connection
+            self.metrics.http_seconds.observe(time.perf_counter() - started, path, str(status))
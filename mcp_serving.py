@@ -0,0 +1,466 @@
+import asyncio
+import logging
+import itertools
+import contextlib
+import contextvars
+from uuid import UUID
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Sequence
+
+from mcp import types
+from mcp.server.lowlevel import Server
+from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http import EventCallback, EventMessage, EventStore
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp.shared.message import SessionMessage
+from pydantic import ValidationError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+from starlette.types import Message, Receive, Scope, Send
+
+from admission import AdmissionController, AdmissionMiddleware, AdmissionSettings, run_until_disconnect
+from mcp_metrics import Gauge, Metrics, MetricsMiddleware
+from session_broker import REDIS_INSTALL_HINT, SessionBroker, Subscription
+from tool_call_cache import ToolCallCache
+
+logger = logging.getLogger(__name__)
+
+# The sessions created by the connect_sse call running in the current task.
+_new_sessions: contextvars.ContextVar[list[UUID] | None] = contextvars.ContextVar("_new_sessions", default=None)
+
+
+class _SessionWriters(dict):
+    """The session map of SseServerTransport, noting which sessions the current connection creates."""
+
+    def __setitem__(self, session_id: UUID, writer: Any) -> None:
+        super().__setitem__(session_id, writer)
+        created = _new_sessions.get()
+        if created is not None:
+            created.append(session_id)
+
+
+class BrokeredSseServerTransport(SseServerTransport):
+    """
+    SSE transport whose sessions can be reached from every worker.
+
+    The SSE stream of a session stays in the process that accepted it, but a client may
+    POST its messages to any worker behind the load balancer. Messages for a session of
+    this process are handled like by SseServerTransport; the others are validated, then
+    published to the broker, which hands them to the process holding the session. A message
+    no process subscribed to is answered with 404, as for an unknown session.
+
+    :param endpoint: The path the clients POST their messages to.
+    :param broker: The broker shared by the workers.
+    :param kwargs: Passed on to SseServerTransport, e.g. ``security_settings``.
+    """
+
+    def __init__(self, endpoint: str, broker: SessionBroker, **kwargs: Any) -> None:
+        """Constructor."""
+        super().__init__(endpoint, **kwargs)
+        self._broker = broker
+        self._read_stream_writers = _SessionWriters()
+
+    @contextlib.asynccontextmanager
+    async def connect_sse(self, scope: Scope, receive: Receive, send: Send):
+        created: list[UUID] = []
+        subscribed = asyncio.Event()
+
+        async def send_when_subscribed(message: Message) -> None:
+            # The first event tells the client where to POST; another worker can only pass
+            # those messages on once this one has subscribed to the session.
+            if message["type"] == "http.response.body":
+                await subscribed.wait()
+            await send(message)
+
+        token = _new_sessions.set(created)
+        try:
+            async with super().connect_sse(scope, receive, send_when_subscribed) as streams:
+                _new_sessions.reset(token)
+                token = None
+                session_id = created[0]
+                subscription = await self._broker.subscribe(session_id.hex)
+                subscribed.set()
+                relay = asyncio.create_task(self._relay(session_id, subscription))
+                try:
+                    yield streams
+                finally:
+                    relay.cancel()
+                    await subscription.aclose()
+                    # SseServerTransport never forgets a session; a closed one must not take messages.
+                    self._read_stream_writers.pop(session_id, None)
+        finally:
+            if token is not None:
+                _new_sessions.reset(token)
+
+    async def _relay(self, session_id: UUID, subscription: Subscription) -> None:
+        """Pass the messages other workers received for the session on to its server."""
+        async for body in subscription:
+            writer = self._read_stream_writers.get(session_id)
+            if writer is None:
+                return
+            try:
+                message = types.JSONRPCMessage.model_validate_json(body)
+            except ValidationError:
+                logger.warning("Dropped an invalid message relayed to session %s", session_id)
+                continue
+            await writer.send(SessionMessage(message))
+
+    async def handle_post_message(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        try:
+            session_id = UUID(hex=request.query_params.get("session_id", ""))
+        except ValueError:
+            session_id = None
+        if session_id is None or session_id in self._read_stream_writers:
+            # Local sessions and malformed requests are handled as without a broker.
+            return await super().handle_post_message(scope, receive, send)
+
+        error_response = await self._security.validate_request(request, is_post=True)
+        if error_response:
+            return await error_response(scope, receive, send)
+        body = await request.body()
+        try:
+            types.JSONRPCMessage.model_validate_json(body)
+        except ValidationError:
+            response = Response("Could not parse message", status_code=400)
+            return await response(scope, receive, send)
+        if not await self._broker.publish(session_id.hex, body):
+            response = Response("Could not find session", status_code=404)
+            return await response(scope, receive, send)
+        response = Response("Accepted", status_code=202)
+        await response(scope, receive, send)
+
+
+class _AsgiEndpoint:
+    """Route endpoint running an ASGI function, which sends the response itself."""
+
+    def __init__(self, handle: Callable[[Scope, Receive, Send], Any]) -> None:
+        """Constructor."""
+        self._handle = handle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self._handle(scope, receive, send)
+
+
+class Readiness:
+    """
+    Whether the process is ready for traffic: every check succeeded once.
+
+    The checks run in order when the app starts; a failing check is retried every
+    ``retry_delay`` seconds, its error is shown by ``/readyz`` meanwhile.
+
+    :param checks: Async functions raising when the process is not ready, e.g. warming a client.
+    :param retry_delay: Seconds between the attempts of a failing check.
+    """
+
+    def __init__(self, checks: Sequence[Callable[[], Awaitable[Any]]] = (), retry_delay: float = 5.0) -> None:
+        """Constructor."""
+        self.checks = list(checks)
+        self.retry_delay = retry_delay
+        self.ready = not self.checks
+        self.pending: dict[str, str] = {check.__name__: "not run" for check in self.checks}
+
+    async def run(self) -> None:
+        for check in self.checks:
+            while True:
+                try:
+                    await check()
+                    break
+                except Exception as e:
+                    logger.warning("Readiness check %s failed: %s", check.__name__, e)
+                    self.pending[check.__name__] = str(e) or type(e).__name__
+                    await asyncio.sleep(self.retry_delay)
+            del self.pending[check.__name__]
+        self.ready = True
+
+
+def _middleware(controller: AdmissionController | None, metrics: Metrics | None) -> list[Middleware]:
+    middleware = [Middleware(MetricsMiddleware, metrics=metrics)] if metrics else []
+    if controller:
+        middleware.append(Middleware(AdmissionMiddleware, controller=controller))
+    return middleware
+
+
+def _prepare(
+        server: Server,
+        controller: AdmissionController | None,
+        metrics: Metrics | None,
+        cache: ToolCallCache | None,
+    ) -> Server:
+    # Outermost first: cache hits and merged calls take no slot, and only runs are timed.
+    if metrics:
+        server = metrics.instrument(server)
+    if controller:
+        server = controller.limit(server)
+    return cache.wrap(server) if cache else server
+
+
+def _operations(metrics: Metrics | None, readiness: Readiness | None) -> tuple[list[Route], Callable]:
+    """Return the /healthz, /readyz and /metrics routes, and the lifespan running the readiness checks."""
+    readiness = readiness or Readiness()
+
+    async def healthz(request):
+        return PlainTextResponse("ok")
+
+    async def readyz(request):
+        if readiness.ready:
+            return PlainTextResponse("ready")
+        return JSONResponse({"pending": readiness.pending}, status_code=503)
+
+    async def render_metrics(request):
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    routes = [Route("/healthz", endpoint=healthz), Route("/readyz", endpoint=readyz)]
+    if metrics:
+        metrics.add(Gauge("mcp_ready", "1 once the readiness checks passed.", lambda: readiness.ready))
+        routes.append(Route("/metrics", endpoint=render_metrics))
+
+    @contextlib.asynccontextmanager
+    async def lifespan():
+        task = asyncio.create_task(readiness.run())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    return routes, lifespan
+
+
+def create_sse_app(
+        get_server: Callable[[], Server],
+        broker: SessionBroker,
+        controller: AdmissionController | None = None,
+        metrics: Metrics | None = None,
+        readiness: Readiness | None = None,
+        cache: ToolCallCache | None = None,
+    ) -> Starlette:
+    """
+    Create the Starlette app serving an MCP server over SSE, on ``/sse`` and ``/messages``,
+    with ``/healthz``, ``/readyz`` and, with metrics, ``/metrics``.
+
+    The pending calls of a session are cancelled when its client disconnects.
+
+    :param get_server: Returns the MCP server.
+    :param broker: Routes the posted messages to the worker holding the session.
+    :param controller: Limits the connections and tool calls, None for no limit.
+    :param metrics: The metrics to record and serve, None for none.
+    :param readiness: The checks to pass before ``/readyz`` reports ready, None for none.
+    :param cache: Shares the runs and results of identical tool calls, None for no sharing.
+    :return: The app.
+    """
+    sse = BrokeredSseServerTransport("/messages", broker)
+    routes, run_checks = _operations(metrics, readiness)
+
+    async def handle_sse(scope: Scope, receive: Receive, send: Send) -> None:
+        server = _prepare(get_server(), controller, metrics, cache)
+        async with sse.connect_sse(scope, receive, send) as streams:
+            await run_until_disconnect(server, streams[0], streams[1])
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with run_checks():
+            yield
+        await broker.aclose()
+
+    return Starlette(
+        routes=[
+            Route("/sse", endpoint=_AsgiEndpoint(handle_sse)),
+            Route("/messages", endpoint=_AsgiEndpoint(sse.handle_post_message), methods=["POST"]),
+            *routes,
+        ],
+        middleware=_middleware(controller, metrics),
+        lifespan=lifespan,
+    )
+
+
+class InMemoryEventStore(EventStore):
+    """
+    The last messages sent on the streams of this process, so a client can resume a stream.
+
+    A client reconnecting with the ``Last-Event-ID`` header receives the messages of that
+    stream it missed, as long as they are among the ``max_events`` last ones.
+
+    :param max_events: The number of messages kept, over all streams.
+    """
+
+    def __init__(self, max_events: int = 10_000) -> None:
+        """Constructor."""
+        self._max_events = max_events
+        self._ids = itertools.count(1)
+        self._events: OrderedDict[int, tuple[str, types.JSONRPCMessage]] = OrderedDict()
+
+    async def store_event(self, stream_id: str, message: types.JSONRPCMessage) -> str:
+        event_id = next(self._ids)
+        self._events[event_id] = (stream_id, message)
+        while len(self._events) > self._max_events:
+            self._events.popitem(last=False)
+        return str(event_id)
+
+    async def replay_events_after(self, last_event_id: str, send_callback: EventCallback) -> str | None:
+        try:
+            last = int(last_event_id)
+        except ValueError:
+            return None
+        if last not in self._events:
+            return None
+        stream_id = self._events[last][0]
+        # The callback sends to the client, the events may change meanwhile.
+        missed = [(event_id, message) for event_id, (stream, message) in self._events.items()
+                  if event_id > last and stream == stream_id]
+        for event_id, message in missed:
+            await send_callback(EventMessage(message, str(event_id)))
+        return stream_id
+
+
+def create_streamable_http_app(
+        get_server: Callable[[], Server],
+        *,
+        stateless: bool = False,
+        json_response: bool = False,
+        event_store: EventStore | None = None,
+        controller: AdmissionController | None = None,
+        metrics: Metrics | None = None,
+        readiness: Readiness | None = None,
+        cache: ToolCallCache | None = None,
+    ) -> Starlette:
+    """
+    Create the Starlette app serving an MCP server over streamable HTTP, on ``/mcp``,
+    with ``/healthz``, ``/readyz`` and, with metrics, ``/metrics``.
+
+    Every message is a plain POST answered on its own response, so the app runs behind any
+    HTTP load balancer and clients need no connection between calls.
+
+    :param get_server: Returns the MCP server.
+    :param stateless: Handle each request on its own, without a session: the cheapest mode for
+                      short calls, and any worker can answer any request.
+    :param json_response: Answer with one JSON response instead of an event stream; a long call
+                          then sends no progress until it finishes.
+    :param event_store: Keeps the messages sent on the streams of stateful sessions, so
+                        clients can resume an interrupted stream.
+    :param controller: Limits the connections and tool calls, None for no limit.
+    :param metrics: The metrics to record and serve, None for none.
+    :param readiness: The checks to pass before ``/readyz`` reports ready, None for none.
+    :param cache: Shares the runs and results of identical tool calls, None for no sharing.
+    :return: The app.
+    """
+    manager = StreamableHTTPSessionManager(
+        app=_prepare(get_server(), controller, metrics, cache), event_store=event_store, json_response=json_response,
+        stateless=stateless)
+    routes, run_checks = _operations(metrics, readiness)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with manager.run(), run_checks():
+            yield
+
+    return Starlette(
+        routes=[
+            Route("/mcp", endpoint=_AsgiEndpoint(manager.handle_request), methods=["GET", "POST", "DELETE"]),
+            *routes,
+        ],
+        middleware=_middleware(controller, metrics),
+        lifespan=lifespan,
+    )
+
+
+def _readiness_checks(get_server: Callable[[], Server]) -> list[Callable[[], Awaitable[Any]]]:
+    from settings import get_search_transport, get_settings, warm_up_clients
+    settings = get_settings()
+
+    async def build_server() -> None:
+        get_server()
+
+    async def warm_model_connection() -> None:
+        # Any answer leaves an open connection in the pool for the first tool call.
+        await warm_up_clients()
+
+    async def verify_search_index() -> None:
+        from azure.core.credentials import AzureKeyCredential
+        from search_index_manager import SearchIndexManager
+        # A sharded search answers from the shards it can reach, one of them is enough.
+        names = settings.azure_search_shards or (settings.azure_search_index,)
+        exists = await asyncio.gather(*(
+            SearchIndexManager.index_exists(
+                settings.azure_search_endpoint, AzureKeyCredential(settings.azure_search_api_key),
+                name, transport=get_search_transport())
+            for name in names))
+        if not any(exists):
+            raise LookupError(f"Search index {', '.join(names)} does not exist")
+
+    checks = [build_server]
+    if settings.azure_openai_endpoint:
+        checks.append(warm_model_connection)
+    if settings.azure_search_index or settings.azure_search_shards:
+        checks.append(verify_search_index)
+    return checks
+
+
+def create_app(get_server: Callable[[], Server]) -> Starlette:
+    """
+    Create the app serving an MCP server over the transport of MCP_TRANSPORT.
+
+    "sse" (the default) serves ``/sse`` and ``/messages``, "streamable-http" serves ``/mcp``,
+    stateless with MCP_STATELESS and with JSON responses with MCP_JSON_RESPONSE. The
+    connections and tool calls are limited by the MCP_MAX_* settings, see admission.
+    Identical tool calls share their run and, for MCP_CACHE_TTL seconds, its result.
+
+    ``/readyz`` reports ready once the server is built, a connection to the model endpoint
+    is open, and the search index, or one of the AZURE_SEARCH_SHARDS, exists when set.
+
+    :param get_server: Returns the MCP server.
+    :return: The app.
+    """
+    from settings import get_metrics, get_settings, get_session_broker
+    settings = get_settings()
+    controller = AdmissionController(AdmissionSettings.from_env())
+    metrics = get_metrics()
+    metrics.add(Gauge("mcp_tool_calls_active", "Tool calls running.", lambda: controller.active))
+    metrics.add(Gauge("mcp_tool_calls_queued", "Tool calls waiting for a slot.", lambda: controller.waiting))
+    metrics.add(controller.rejected)
+    cache = ToolCallCache(settings.mcp_cache_ttl, settings.mcp_cache_size)
+    metrics.add(cache.calls)
+    readiness = Readiness(_readiness_checks(get_server))
+    if settings.mcp_transport == "sse":
+        return create_sse_app(get_server, get_session_broker(), controller, metrics, readiness, cache)
+    if settings.mcp_transport == "streamable-http":
+        return create_streamable_http_app(
+            get_server,
+            stateless=settings.mcp_stateless,
+            json_response=settings.mcp_json_response,
+            event_store=None if settings.mcp_stateless else InMemoryEventStore(),
+            controller=controller,
+            metrics=metrics,
+            readiness=readiness,
+            cache=cache,
+        )
+    raise ValueError(f"MCP_TRANSPORT must be 'sse' or 'streamable-http', not {settings.mcp_transport!r}")
+
+
+def serve(app_factory: str, port: int) -> None:
+    """
+    Serve an app with uvicorn, in MCP_WORKERS worker processes.
+
+    Workers only share SSE sessions through a Redis broker and never share streamable HTTP
+    sessions, so more than one worker requires MCP_BROKER_URL, or MCP_STATELESS for
+    streamable HTTP.
+
+    :param app_factory: The import string of the function creating the app, e.g. "agent_mcp_sse:create_app".
+    :param port: The port.
+    :raises ImportError: If MCP_BROKER_URL is set without the redis package, the ``redis`` extra.
+    """
+    import importlib.util
+    import uvicorn
+    from settings import get_settings
+    settings = get_settings()
+    # Checked here, before the workers start, rather than in each worker's first connection.
+    if settings.mcp_transport == "sse" and settings.mcp_broker_url and importlib.util.find_spec("redis") is None:
+        raise ImportError(f"MCP_BROKER_URL requires the redis package: {REDIS_INSTALL_HINT}")
+    if settings.mcp_workers > 1:
+        if settings.mcp_transport == "sse" and not settings.mcp_broker_url:
+            raise ValueError("MCP_WORKERS > 1 requires MCP_BROKER_URL, the in-memory broker is local to a worker")
+        if settings.mcp_transport == "streamable-http" and not settings.mcp_stateless:
+            raise ValueError("MCP_WORKERS > 1 requires MCP_STATELESS for streamable HTTP, sessions are local to a worker")
+    uvicorn.run(app_factory, factory=True, host="0.0.0.0", port=port, workers=settings.mcp_workers)
@@ -0,0 +1,196 @@
+import copy
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from agent_framework import (
+    AgentExecutor,
+    AgentExecutorResponse,
+    AgentRunEvent,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    ChatAgent,
+    ChatMessage,
+    WorkflowContext,
+)
+
+# Fields that differ between two runs producing the same message.
+_VOLATILE_FIELDS = frozenset({
+    "call_id", "message_id", "response_id", "created_at", "raw_representation", "additional_properties",
+})
+
+
+def _canonical(value: Any) -> Any:
+    """Drop the volatile fields of a serialized message, recursively."""
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items() if key not in _VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def agent_fingerprint(agent: Any) -> dict[str, Any]:
+    """Describe the agent configuration that shapes its answers."""
+    options = getattr(agent, "chat_options", None)
+    if options is None:
+        return {"name": agent.name}
+    response_format = options.response_format
+    return {
+        "name": agent.name,
+        "instructions": options.instructions,
+        "model_id": options.model_id,
+        "temperature": options.temperature,
+        "top_p": options.top_p,
+        "max_tokens": options.max_tokens,
+        "seed": options.seed,
+        "response_format": response_format.model_json_schema() if response_format is not None else None,
+        "tools": sorted(getattr(tool, "name", str(tool)) for tool in options.tools or []),
+    }
+
+
+def memo_key(agent: Any, messages: list[ChatMessage]) -> str:
+    """Hash the agent configuration and the input messages into a cache key."""
+    payload = {
+        "agent": agent_fingerprint(agent),
+        "messages": [_canonical(message.to_dict()) for message in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class MemoEntry:
+    """A recorded agent run: the streamed updates and the final response."""
+    updates: list[AgentRunResponseUpdate]
+    response: AgentRunResponse
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Bounded cache of agent runs with a time to live, evicting the least recently used entry.
+
+    One cache can be shared by executors of many workflow instances, the key covers the
+    agent configuration.
+
+    :param max_entries: The number of runs kept.
+    :param ttl: Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0) -> None:
+        """Constructor."""
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: OrderedDict[str, MemoEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> MemoEntry | None:
+        """Return the live entry for the key, or None."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, updates: list[AgentRunResponseUpdate], response: AgentRunResponse) -> None:
+        """Record a run, evicting the least recently used entries beyond the limit."""
+        self._entries[key] = MemoEntry(updates, response, time.monotonic() + self._ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Forget every entry."""
+        self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class MemoizingAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that answers repeated inputs from a cache instead of calling the agent.
+
+    The key is a hash of the agent configuration and the input messages, ignoring ids that
+    change from run to run. On a hit the recorded updates are emitted again as
+    ``AgentRunUpdateEvent`` (or one ``AgentRunEvent`` when not streaming), and the same
+    ``AgentExecutorResponse`` is sent downstream, so consumers cannot tell the difference.
+
+    :param agent: The agent to be wrapped by this executor.
+    :param cache: The cache, share it between workflows to reuse runs across requests.
+    :param key_scope: "conversation" keys on every input message. "last" keys only on the last
+                      one, typically the structured output of the previous agent; use it when
+                      the answer does not depend on the earlier messages.
+    :param kwargs: Passed on to AgentExecutor, e.g. ``id`` or ``output_response``.
+    """
+
+    def __init__(
+            self,
+            agent: ChatAgent,
+            cache: ResponseCache,
+            key_scope: str = "conversation",
+            **kwargs: Any,
+        ) -> None:
+        """Constructor."""
+        if key_scope not in ("conversation", "last"):
+            raise ValueError(f"key_scope must be 'conversation' or 'last', not {key_scope!r}")
+        super().__init__(agent, **kwargs)
+        self._memo = cache
+        self._key_scope = key_scope
+
+    async def _run_agent_and_emit(self, ctx: WorkflowContext[AgentExecutorResponse, AgentRunResponse]) -> None:
+        key = memo_key(self._agent, self._cache[-1:] if self._key_scope == "last" else self._cache)
+        entry = self._memo.get(key)
+        if entry is None:
+            updates, response = await self._run_agent(ctx)
+            self._memo.put(key, copy.deepcopy(updates), copy.deepcopy(response))
+        else:
+            # Copies, downstream executors may attach values to the response.
+            updates, response = copy.deepcopy(entry.updates), copy.deepcopy(entry.response)
+            if ctx.is_streaming():
+                # A run recorded without streaming is replayed as one update per message.
+                updates = updates or [
+                    AgentRunResponseUpdate(contents=message.contents, role=message.role, author_name=message.author_name)
+                    for message in response.messages
+                ]
+                for update in updates:
+                    await ctx.add_event(AgentRunUpdateEvent(self.id, update))
+            else:
+                await ctx.add_event(AgentRunEvent(self.id, response))
+
+        if self._output_response:
+            await ctx.yield_output(response)
+        full_conversation = list(self._cache) + list(response.messages)
+        await ctx.send_message(AgentExecutorResponse(self.id, response, full_conversation=full_conversation))
+        self._cache.clear()
+
+    async def _run_agent(
+            self,
+            ctx: WorkflowContext[AgentExecutorResponse, AgentRunResponse],
+        ) -> tuple[list[AgentRunResponseUpdate], AgentRunResponse]:
+        """Run the agent like AgentExecutor does, keeping the updates for replay."""
+        if not ctx.is_streaming():
+            response = await self._agent.run(self._cache, thread=self._agent_thread)
+            await ctx.add_event(AgentRunEvent(self.id, response))
+            return [], response
+        updates: list[AgentRunResponseUpdate] = []
+        async for update in self._agent.run_stream(self._cache, thread=self._agent_thread):
+            updates.append(update)
+            await ctx.add_event(AgentRunUpdateEvent(self.id, update))
+        response_format = self._agent.chat_options.response_format if isinstance(self._agent, ChatAgent) else None
+        response = AgentRunResponse.from_agent_run_response_updates(updates, output_format_type=response_format)
+        return updates, response
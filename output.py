@@ -1,30 +1,21 @@
-import os
 import asyncio
 from pydantic import BaseModel
 from agent_framework import AgentRunResponse
-from agent_framework.azure import AzureOpenAIChatClient
-from azure.identity import AzureCliCredential
-from dotenv import load_dotenv
 
-load_dotenv()
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+from settings import get_chat_client
 
 class PersonInfo(BaseModel):
     name: str | None = None
     age: int | None = None
     occupation: str | None = None
 
-agent = AzureOpenAIChatClient(
-    endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    deployment_name=AZURE_OPENAI_DEPLOYMENT,
-).create_agent(
-    instructions="You are a helpful assistant that extracts person information from a given text."
-)
+def create_agent():
+    return get_chat_client().create_agent(
+        instructions="You are a helpful assistant that extracts person information from a given text."
+    )
 
 async def main():
+    agent = create_agent()
     query = "Please provide information about Bo Bichette who is a 26 year old baseball player."
     response = await agent.run(query,
         response_format=PersonInfo
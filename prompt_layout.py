@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Sequence
+
+from agent_framework import (
+    ChatAgent,
+    ChatContext,
+    ChatMiddleware,
+    ChatResponseUpdate,
+    UsageContent,
+    UsageDetails,
+)
+
+# Keys under which the openai chat and Responses clients report the cached input tokens.
+CACHED_TOKEN_KEYS = ("prompt/cached_tokens", "openai.cached_input_tokens")
+
+
+def cached_tokens(usage: UsageDetails | None) -> int:
+    """Return the input tokens served from the provider's prompt cache."""
+    if usage is None:
+        return 0
+    counts = usage.additional_counts
+    return next((counts[key] for key in CACHED_TOKEN_KEYS if counts.get(key)), 0)
+
+
+class PromptLayout:
+    """
+    Builds the agents of a chat client around one byte-identical prompt prefix.
+
+    Providers cache the longest prefix a request shares with recent requests (from 1024
+    tokens, for Azure OpenAI), tools first, then the system message. Every agent created
+    through the layout gets instructions starting with the same preamble, and its tools in
+    the order of the layout; only the text after the preamble is specific to the agent.
+
+    By default an agent only gets its own tools, so agents with the same tools share the
+    prefix and the others each keep a stable prefix of their own. With ``share_tools``
+    every agent gets every tool of the layout, so all of them share one prefix; the price
+    is that an agent may call tools meant for another, adding model and tool round trips,
+    unless its instructions hold it back.
+
+    :param chat_client: The chat client creating the agents.
+    :param preamble: The instructions shared by every agent, the stable part of the prompt.
+    :param tools: Every tool used by the agents, in a fixed order.
+    :param share_tools: Give every agent every tool, for one shared prefix.
+    """
+
+    def __init__(self, chat_client: Any, preamble: str, tools: Sequence[Any] = (), share_tools: bool = False) -> None:
+        """Constructor."""
+        self._chat_client = chat_client
+        self.preamble = preamble.strip()
+        self.tools = list(tools)
+        self.share_tools = share_tools
+
+    def instructions(self, instructions: str) -> str:
+        """Return the preamble followed by the instructions of one agent."""
+        return f"{self.preamble}\n\n{instructions.strip()}"
+
+    def create_agent(
+            self,
+            *,
+            name: str,
+            instructions: str,
+            tools: Any = None,
+            **kwargs: Any,
+        ) -> ChatAgent:
+        """
+        Create an agent whose prompt starts with the shared prefix.
+
+        :param name: The agent name.
+        :param instructions: The instructions of this agent, appended to the preamble.
+        :param tools: The tools this agent uses; they must be part of the layout.
+        :param kwargs: Passed on to ``create_agent``, e.g. ``response_format``.
+        :return: The agent.
+        """
+        own = tools if isinstance(tools, list) else [tools] if tools is not None else []
+        unknown = [tool for tool in own if tool not in self.tools]
+        if unknown:
+            raise ValueError(f"Tools {unknown} of agent {name!r} are not part of the prompt layout")
+        tools = self.tools if self.share_tools else [tool for tool in self.tools if tool in own]
+        return self._chat_client.create_agent(
+            name=name,
+            instructions=self.instructions(instructions),
+            tools=tools or None,
+            **kwargs,
+        )
+
+
+@dataclass
+class PromptCacheEntry:
+    """Token counts of the requests sharing a system prompt."""
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """The share of input tokens served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+class PromptCacheStats(ChatMiddleware):
+    """
+    Chat middleware collecting the cached and uncached input tokens of every model request.
+
+    Requests are grouped by their system prompt (the instructions of the agent), so the
+    report shows which agents benefit from the cache. Streamed usage is read as it passes.
+    Install it with ``chat_client.middleware = [stats]``.
+    """
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self.by_prompt: dict[str, PromptCacheEntry] = {}
+        self.total = PromptCacheEntry()
+
+    def record(self, instructions: str | None, usage: UsageDetails | None) -> None:
+        """Add the usage of one request."""
+        if usage is None or not usage.input_token_count:
+            return
+        text = (instructions or "").strip()
+        label = text.splitlines()[-1][:60] if text else "(no instructions)"
+        for entry in (self.by_prompt.setdefault(label, PromptCacheEntry()), self.total):
+            entry.requests += 1
+            entry.input_tokens += usage.input_token_count
+            entry.cached_tokens += cached_tokens(usage)
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        await next(context)
+        instructions = context.chat_options.instructions
+        if not context.is_streaming:
+            self.record(instructions, context.result.usage_details if context.result else None)
+        elif context.result is not None:
+            context.result = self._observe(instructions, context.result)
+
+    async def _observe(self, instructions: str | None, updates: AsyncIterable[ChatResponseUpdate]) -> AsyncIterable[ChatResponseUpdate]:
+        async for update in updates:
+            for content in update.contents:
+                if isinstance(content, UsageContent):
+                    self.record(instructions, content.details)
+            yield update
+
+    def summary(self) -> str:
+        """Return a table of the prompt cache hit ratio per system prompt."""
+        lines = [f"{'system prompt (last line)':60} {'requests':>8} {'input':>8} {'cached':>8} {'hit':>6}"]
+        for label, entry in [*self.by_prompt.items(), ("total", self.total)]:
+            lines.append(f"{label:60} {entry.requests:8} {entry.input_tokens:8} {entry.cached_tokens:8} "
+                         f"{entry.hit_ratio:6.0%}")
+        return "\n".join(lines)
@@ -0,0 +1,221 @@
+import os
+import csv
+import json
+import asyncio
+import argparse
+from typing import TYPE_CHECKING, Any
+
+# numpy is imported where it is used, like nltk for building the embeddings file.
+if TYPE_CHECKING:
+    import numpy as np
+
+QUANTIZATIONS = ("int8", "binary")
+
+# Rows scored at once; small enough for the temporary arrays of a scan to stay in cache.
+_CHUNK_ROWS = 1024
+
+
+def _normalize(vectors: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _popcount(codes: "np.ndarray") -> "np.ndarray":
+    """Count the set bits of each row of packed bits."""
+    import numpy as np
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(codes).sum(axis=1, dtype=np.int32)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[codes].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedIndex:
+    """
+    Local vector index keeping compact codes in memory and full vectors on disk.
+
+    A search scans the codes, 1 bit per dimension compared by Hamming distance for "binary",
+    or 1 byte per dimension scaled per vector for "int8", then rescores a shortlist of
+    ``k * oversample`` candidates against the float32 vectors. These are memory-mapped, so
+    only the pages of the shortlisted rows are read. Vectors are normalized, scores are
+    cosine similarities.
+
+    The index is a directory written by ``build``: ``codes.npy``, ``scales.npy`` (int8),
+    ``vectors.npy``, ``tokens.json`` and ``meta.json``.
+
+    :param directory: The index directory.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Constructor."""
+        import numpy as np
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "tokens.json"), encoding="utf-8") as f:
+            self.tokens: list[str] = json.load(f)
+        self.quantization: str = meta["quantization"]
+        self.dimensions: int = meta["dimensions"]
+        self.codes = np.load(os.path.join(directory, "codes.npy"))
+        self.scales = np.load(os.path.join(directory, "scales.npy")) if self.quantization == "int8" else None
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+
+    @staticmethod
+    def build(embeddings_file: str, directory: str, quantization: str = "binary") -> "QuantizedIndex":
+        """
+        Quantize the embeddings file written by SearchIndexManager.build_embeddings_file.
+
+        :param embeddings_file: The CSV file with the token and embedding columns.
+        :param directory: The index directory, created if needed.
+        :param quantization: "int8" or "binary".
+        :return: The index.
+        """
+        import numpy as np
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, not {quantization!r}")
+        tokens, rows = [], []
+        with open(embeddings_file, newline='') as fp:
+            for row in csv.DictReader(fp):
+                tokens.append(row['token'])
+                rows.append(np.asarray(json.loads(row['embedding']), dtype=np.float32))
+        vectors = _normalize(np.vstack(rows))
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), vectors)
+        if quantization == "binary":
+            np.save(os.path.join(directory, "codes.npy"), np.packbits(vectors > 0, axis=1))
+        else:
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            np.save(os.path.join(directory, "codes.npy"), codes)
+            np.save(os.path.join(directory, "scales.npy"), scales.astype(np.float32))
+        with open(os.path.join(directory, "tokens.json"), "w", encoding="utf-8") as f:
+            json.dump(tokens, f, ensure_ascii=False)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"quantization": quantization, "dimensions": int(vectors.shape[1]), "count": len(tokens)}, f)
+        return QuantizedIndex(directory)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def _approximate_scores(self, query: "np.ndarray") -> "np.ndarray":
+        """Score every row from its code, higher is closer."""
+        import numpy as np
+        scores = np.empty(len(self), dtype=np.float32)
+        if self.quantization == "binary":
+            bits = np.packbits(query > 0)
+            for start in range(0, len(self), _CHUNK_ROWS):
+                chunk = self.codes[start:start + _CHUNK_ROWS]
+                scores[start:start + len(chunk)] = -_popcount(chunk ^ bits)
+        else:
+            for start in range(0, len(self), _CHUNK_ROWS):
+                chunk = self.codes[start:start + _CHUNK_ROWS]
+                scores[start:start + len(chunk)] = (chunk.astype(np.float32) @ query) * self.scales[start:start + len(chunk)]
+        return scores
+
+    @staticmethod
+    def _top(scores: "np.ndarray", k: int) -> "np.ndarray":
+        import numpy as np
+        if k >= len(scores):
+            return np.argsort(-scores)
+        best = np.argpartition(-scores, k - 1)[:k]
+        return best[np.argsort(-scores[best])]
+
+    def search(self, query: Any, k: int = 5, oversample: int = 10) -> list[tuple[int, float]]:
+        """
+        Return the rows closest to a query embedding, with their cosine similarity.
+
+        :param query: The query embedding.
+        :param k: The number of rows returned.
+        :param oversample: The shortlist rescored with the full vectors is ``k * oversample`` rows.
+        :return: The row numbers and scores, best first.
+        """
+        import numpy as np
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        shortlist = np.sort(self._top(self._approximate_scores(query), k * oversample))
+        exact = np.asarray(self.vectors[shortlist]) @ query
+        best = self._top(exact, k)
+        return [(int(shortlist[i]), float(exact[i])) for i in best]
+
+    def exact_search(self, query: Any, k: int = 5) -> list[tuple[int, float]]:
+        """Return the rows closest to a query embedding by scanning every full vector."""
+        import numpy as np
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        scores = np.concatenate([
+            np.asarray(self.vectors[start:start + _CHUNK_ROWS]) @ query
+            for start in range(0, len(self), _CHUNK_ROWS)
+        ])
+        return [(int(i), float(scores[i])) for i in self._top(scores, k)]
+
+    async def search_text(self, embeddings_client: Any, model: str, message: str, k: int = 5) -> str:
+        """
+        Search a message like SearchIndexManager.search, in this index.
+
+        :param embeddings_client: The embeddings client, the one used to build the embeddings file.
+        :param model: The embedding model.
+        :param message: The customer question.
+        :return: The context for the question.
+        """
+        response = await embeddings_client.embeddings.create(input=message, model=model)
+        rows = self.search(response.data[0].embedding, k)
+        return "\n------\n".join(self.tokens[row] for row, _ in rows)
+
+    async def search_embedding(self, embedding: list[float], k: int = 5) -> list[tuple[float, str]]:
+        """
+        Search an embedding like SearchIndexManager.search_embedding, so the index can be a shard.
+
+        The scan runs in a thread, numpy releases the GIL, so shards are searched in parallel.
+        Scores are on the scale of Azure AI Search for the cosine metric, 1 / (2 - cosine similarity).
+        """
+        rows = await asyncio.to_thread(self.search, embedding, k)
+        return [(1 / (2 - score), self.tokens[row]) for row, score in rows]
+
+    def memory(self) -> dict[str, float]:
+        """Return the bytes held in memory for the search and the bytes of the full vectors."""
+        resident = self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+        full = len(self) * self.dimensions * 4
+        return {"resident_bytes": resident, "full_bytes": full, "reduction": full / resident if resident else 0.0}
+
+    def recall(self, queries: Any, k: int = 5, oversample: int = 10) -> float:
+        """Return the share of the exact top ``k`` rows that ``search`` finds, over the queries."""
+        found = 0
+        for query in queries:
+            exact = {row for row, _ in self.exact_search(query, k)}
+            found += len(exact & {row for row, _ in self.search(query, k, oversample)})
+        return found / (k * len(queries)) if len(queries) else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a quantized local index, or report its memory and recall.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Quantize an embeddings file.")
+    build.add_argument("embeddings_file")
+    build.add_argument("directory")
+    build.add_argument("--quantization", choices=QUANTIZATIONS, default="binary")
+    evaluate = commands.add_parser(
+        "evaluate", help="Compare with exact search, on queries made by perturbing indexed vectors.")
+    evaluate.add_argument("directory")
+    evaluate.add_argument("--queries", type=int, default=100)
+    evaluate.add_argument("-k", type=int, default=5)
+    evaluate.add_argument("--oversample", type=int, default=10)
+    evaluate.add_argument("--noise", type=float, default=0.5, help="Norm of the noise added to each vector.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = QuantizedIndex.build(args.embeddings_file, args.directory, args.quantization)
+    else:
+        import numpy as np
+        index = QuantizedIndex(args.directory)
+        rng = np.random.default_rng(0)
+        rows = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+        noise = rng.standard_normal((len(rows), index.dimensions)).astype(np.float32)
+        queries = np.asarray(index.vectors[np.sort(rows)]) + args.noise * _normalize(noise)
+        recall = index.recall(queries, args.k, args.oversample)
+        print(f"recall@{args.k} with {args.oversample}x oversampling: {recall:.3f}")
+    memory = index.memory()
+    print(f"{len(index)} vectors of {index.dimensions} dimensions, {index.quantization}: "
+          f"{memory['resident_bytes'] / 2**20:.1f} MiB in memory instead of {memory['full_bytes'] / 2**20:.1f} MiB "
+          f"({memory['reduction']:.0f}x less)")
+
+
+if __name__ == "__main__":
+    main()
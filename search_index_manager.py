@@ -1,23 +1,17 @@
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
+import os
 import glob
 import csv
 import json
 
-from azure.core.credentials_async import AsyncTokenCredential
-from azure.search.documents.aio import SearchClient
-from azure.search.documents.indexes.aio import SearchIndexClient
-from azure.search.documents.models import VectorizedQuery 
-from azure.search.documents.indexes.models import (
-    SearchField,
-    SearchFieldDataType,  
-    SimpleField,
-    SearchIndex,
-    VectorSearch,
-    VectorSearchProfile,
-    HnswAlgorithmConfiguration)
-from openai import AsyncAzureOpenAI
-from azure.core.exceptions import ResourceNotFoundError, HttpResponseError
+# The azure search and openai packages are imported where they are used so that
+# importing this module stays cheap for scripts that only need the class.
+if TYPE_CHECKING:
+    from azure.core.credentials_async import AsyncTokenCredential
+    from azure.core.pipeline.transport import AsyncHttpTransport
+    from azure.search.documents.indexes.models import SearchIndex
+    from openai import AsyncAzureOpenAI
 
 
 class SearchIndexManager:
@@ -32,6 +26,8 @@ class SearchIndexManager:
     :param model: The embedding model to be used,
                   must be the same as one use to build the file with embeddings.
     :param embeddings_client: The embedding client.
+    :param transport: Optional HTTP transport shared by the search clients,
+                      see http_transport.create_search_transport.
     """
     
     MIN_DIFF_CHARACTERS_IN_LINE = 5
@@ -40,11 +36,12 @@ class SearchIndexManager:
     def __init__(
             self,
             endpoint: str,
-            credential: AsyncTokenCredential,
+            credential: "AsyncTokenCredential",
             index_name: str,
             dimensions: Optional[int],
             model: str,
-            embeddings_client: AsyncAzureOpenAI,
+            embeddings_client: "AsyncAzureOpenAI",
+            transport: Optional["AsyncHttpTransport"] = None,
         ) -> None:
         """Constructor."""
         self._dimensions = dimensions
@@ -55,12 +52,15 @@ class SearchIndexManager:
         self._index = None
         self._model = model
         self._client = None
+        self._transport = transport
 
     def _get_client(self):
         """Get search client if it is absent."""
         if self._client is None:
+            from azure.search.documents.aio import SearchClient
             self._client = SearchClient(
-                endpoint=self._endpoint, index_name=self._index.name, credential=self._credential)
+                endpoint=self._endpoint, index_name=self._index.name, credential=self._credential,
+                transport=self._transport)
         return self._client
 
     async def search(self, message: str) -> str:
@@ -75,15 +75,26 @@ class SearchIndexManager:
             input=message,
             model=self._model
         )
-        embedded_question = response.data[0].embedding
-        vector_query = VectorizedQuery(vector=embedded_question, k_nearest_neighbors=5, fields="text_vector")
+        results = await self.search_embedding(response.data[0].embedding)
+
+        return "\n------\n".join(chunk for _, chunk in results)
+
+    async def search_embedding(self, embedding: list[float], k: int = 5) -> list[tuple[float, str]]:
+        """
+        Search an embedded question in the vector store.
+
+        :param embedding: The question embedding.
+        :param k: The number of chunks returned.
+        :return: The search scores and chunks, best first.
+        """
+        from azure.search.documents.models import VectorizedQuery
+        self._raise_if_no_index()
+        vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=k, fields="text_vector")
         response = await self._get_client().search(
             vector_queries=[vector_query],
             select=['chunk'],
         )
-        results = [result['chunk'] async for result in response]
-
-        return "\n------\n".join(results)
+        return [(result['@search.score'], result['chunk']) async for result in response]
     
     async def upload_documents(self, embeddings_file: str) -> None:
         """
@@ -133,8 +144,10 @@ class SearchIndexManager:
 
     async def delete_index(self):
         """Delete the index from vector store."""
+        from azure.search.documents.indexes.aio import SearchIndexClient
         self._raise_if_no_index()
-        async with SearchIndexClient(endpoint=self._endpoint, credential=self._credential) as ix_client:
+        async with SearchIndexClient(
+                endpoint=self._endpoint, credential=self._credential, transport=self._transport) as ix_client:
             await ix_client.delete_index(self._index.name)
         self._index = None
 
@@ -176,23 +189,28 @@ class SearchIndexManager:
                 self._endpoint,
                 self._credential,
                 self._index_name,
-                vector_index_dimensions)
+                vector_index_dimensions,
+                transport=self._transport)
 
     @staticmethod
     async def index_exists(
         endpoint: str,
-        credential: AsyncTokenCredential,
-        index_name: str) -> bool:
+        credential: "AsyncTokenCredential",
+        index_name: str,
+        transport: Optional["AsyncHttpTransport"] = None) -> bool:
         """
         Check if index exists.
 
         :param endpoint: The search end point to be used.
         :param credential: The credential to be used for the search.
         :param index_name: The name of an index to get or to create.
+        :param transport: Optional HTTP transport for the search client.
         :return: True if index already exists.
         """
+        from azure.core.exceptions import ResourceNotFoundError
+        from azure.search.documents.indexes.aio import SearchIndexClient
         exists = False
-        async with SearchIndexClient(endpoint=endpoint, credential=credential) as ix_client:
+        async with SearchIndexClient(endpoint=endpoint, credential=credential, transport=transport) as ix_client:
             try:
                 await ix_client.get_index(index_name)
                 exists = True
@@ -203,10 +221,11 @@ class SearchIndexManager:
     @staticmethod
     async def get_or_create_index(
             endpoint: str,
-            credential: AsyncTokenCredential,
+            credential: "AsyncTokenCredential",
             index_name: str,
             dimensions: int,
-        ) -> SearchIndex:
+            transport: Optional["AsyncHttpTransport"] = None,
+        ) -> "SearchIndex":
         """
         Get o create the search index.
 
@@ -215,10 +234,13 @@ class SearchIndexManager:
         :param credential: The credential to be used for the search.
         :param index_name: The name of an index to get or to create.
         :param dimensions: The number of dimensions in the embedding.
+        :param transport: Optional HTTP transport for the search clients.
         :return: the search index object.
         """
+        from azure.core.exceptions import ResourceNotFoundError
+        from azure.search.documents.indexes.aio import SearchIndexClient
         index = None
-        async with SearchIndexClient(endpoint=endpoint, credential=credential) as ix_client:
+        async with SearchIndexClient(endpoint=endpoint, credential=credential, transport=transport) as ix_client:
             try:
                 index = await ix_client.get_index(index_name)
             except ResourceNotFoundError:
@@ -228,13 +250,15 @@ class SearchIndexManager:
                 endpoint=endpoint,
                 credential=credential,
                 index_name=index_name,
-                dimensions=dimensions
+                dimensions=dimensions,
+                transport=transport
             )
         return index
 
     async def create_index(
         self,
-        vector_index_dimensions: Optional[int] = None) -> bool:
+        vector_index_dimensions: Optional[int] = None,
+        quantization: Optional[str] = None) -> bool:
         """
         Create index or return false if it already exists.
 
@@ -245,17 +269,22 @@ class SearchIndexManager:
                the length of the list obtained.
                Also please see the embedding model documentation
                https://platform.openai.com/docs/models#embeddings
+        :param quantization: "int8" or "binary" to store the vectors compressed, searching the
+               compressed vectors first and rescoring with the original ones, which are kept.
         :return: True if index was created, False otherwise.
         :raises: Value error if both dimensions of embedding model and vector_index_dimensions are not set
                  or both of them are set and they do not equal each other.
         """
+        from azure.core.exceptions import HttpResponseError
         vector_index_dimensions = self._check_dimensions(vector_index_dimensions)
         try:
             self._index = await SearchIndexManager._index_create(
                 endpoint=self._endpoint,
                 credential=self._credential,
                 index_name=self._index_name,
-                dimensions=vector_index_dimensions
+                dimensions=vector_index_dimensions,
+                transport=self._transport,
+                quantization=quantization
             )
             return True
         except HttpResponseError:
@@ -265,11 +294,26 @@ class SearchIndexManager:
     @staticmethod
     async def _index_create(
         endpoint: str,
-        credential: AsyncTokenCredential,
+        credential: "AsyncTokenCredential",
         index_name: str,
-        dimensions: int) -> SearchIndex:
+        dimensions: int,
+        transport: Optional["AsyncHttpTransport"] = None,
+        quantization: Optional[str] = None) -> "SearchIndex":
         """Create the index."""
-        async with SearchIndexClient(endpoint=endpoint, credential=credential) as ix_client:
+        from azure.search.documents.indexes.aio import SearchIndexClient
+        from azure.search.documents.indexes.models import (
+            SearchField,
+            SearchFieldDataType,
+            SimpleField,
+            SearchIndex,
+            VectorSearch,
+            VectorSearchProfile,
+            HnswAlgorithmConfiguration,
+            BinaryQuantizationCompression,
+            ScalarQuantizationCompression,
+            RescoringOptions,
+            VectorSearchCompressionRescoreStorageMethod)
+        async with SearchIndexClient(endpoint=endpoint, credential=credential, transport=transport) as ix_client:
             fields = [
                 SimpleField(name="embedId", type=SearchFieldDataType.String, key=True),
                 SearchField(
@@ -281,10 +325,23 @@ class SearchIndexManager:
                 ),
                 SimpleField(name="token", type=SearchFieldDataType.String, hidden=False),
             ]
+            compressions = []
+            if quantization is not None:
+                compression = {"int8": ScalarQuantizationCompression, "binary": BinaryQuantizationCompression}
+                if quantization not in compression:
+                    raise ValueError(f"quantization must be one of {tuple(compression)}, not {quantization!r}")
+                compressions.append(compression[quantization](
+                    compression_name="embed-compression-config",
+                    rescoring_options=RescoringOptions(
+                        enable_rescoring=True,
+                        default_oversampling=10,
+                        rescore_storage_method=VectorSearchCompressionRescoreStorageMethod.PRESERVE_ORIGINALS)))
             vector_search = VectorSearch(
                 profiles=[VectorSearchProfile(name="embedding_config",
-                                              algorithm_configuration_name="embed-algorithms-config")],
+                                              algorithm_configuration_name="embed-algorithms-config",
+                                              compression_name="embed-compression-config" if compressions else None)],
                 algorithms=[HnswAlgorithmConfiguration(name="embed-algorithms-config")],
+                compressions=compressions or None,
             )
             search_index = SearchIndex(name=index_name, fields=fields, vector_search=vector_search)
             new_index = await ix_client.create_index(search_index)
@@ -295,7 +352,8 @@ class SearchIndexManager:
             self,
             input_directory: str,
             output_file: str,
-            sentences_per_embedding: int=4
+            sentences_per_embedding: int=4,
+            quantization: Optional[str]=None
             ) -> None:
         """
         In this method we do lazy loading of nltk and download the needed data set to split
@@ -310,7 +368,11 @@ class SearchIndexManager:
         :param embeddings_client: The embedding client, used to create embeddings. 
                 Must be the same as the one used for SearchIndexManager creation.
         :param sentences_per_embedding: The number of sentences used to build embedding.
+               The source column of the output file is the file where each token starts,
+               see sharded_search for routing the tokens to shards by source.
         :param model: The embedding model to be used.
+        :param quantization: "int8" or "binary" to also write a QuantizedIndex of the embeddings
+               for local search, in the directory named after output_file with the quantization.
         """
         import nltk
         nltk.download('punkt')
@@ -318,6 +380,7 @@ class SearchIndexManager:
         from nltk.tokenize import sent_tokenize
         # Split the data to sentence tokens.
         sentence_tokens = []
+        sources = []
         globs = glob.glob(input_directory + '/*.md', recursive=True)
         index = 0
         for fle in globs:
@@ -330,6 +393,7 @@ class SearchIndexManager:
                     for sentence in sent_tokenize(line):
                         if index % sentences_per_embedding == 0:
                             sentence_tokens.append(sentence)
+                            sources.append(fle)
                         else:
                             sentence_tokens[-1] += ' '
                             sentence_tokens[-1] += sentence
@@ -339,15 +403,19 @@ class SearchIndexManager:
         # For each token build the embedding, which will be used in the search.
         batch_size = 2000
         with open(output_file, 'w') as fp:
-            writer = csv.DictWriter(fp, fieldnames=['token', 'embedding'])
+            writer = csv.DictWriter(fp, fieldnames=['token', 'embedding', 'source'])
             writer.writeheader()
             for i in range(0, len(sentence_tokens), batch_size):
                 response = await self._embeddings_client.embeddings.create(
                     input=sentence_tokens[i:i+min(batch_size, len(sentence_tokens))],
                     model=self._model
                 )
-                for token, embed_data in zip(sentence_tokens[i:i+min(batch_size, len(sentence_tokens))], response.data):
-                    writer.writerow({'token': token, 'embedding': json.dumps(embed_data.embedding)})
+                for token, source, embed_data in zip(
+                        sentence_tokens[i:i+min(batch_size, len(sentence_tokens))], sources[i:i+batch_size], response.data):
+                    writer.writerow({'token': token, 'embedding': json.dumps(embed_data.embedding), 'source': source})
+        if quantization is not None:
+            from quantized_index import QuantizedIndex
+            QuantizedIndex.build(output_file, f"{os.path.splitext(output_file)[0]}_{quantization}", quantization)
 
     async def close(self):
         """Close the closeable resources, associated with SearchIndexManager."""
@@ -0,0 +1,224 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncIterator, Protocol
+
+REDIS_INSTALL_HINT = "pip install 'agent-framework-demo[redis]'"
+
+
+class Subscription(Protocol):
+    """The messages posted to one session, in order."""
+
+    def __aiter__(self) -> AsyncIterator[bytes]: ...
+
+    async def aclose(self) -> None: ...
+
+
+class SessionBroker(Protocol):
+    """
+    Routes the messages a client posts to the process holding its session.
+
+    The process serving a session's event stream subscribes to it; any process receiving
+    a message for the session publishes it.
+    """
+
+    async def subscribe(self, session_id: str) -> Subscription:
+        """Start receiving the messages of a session."""
+        ...
+
+    async def publish(self, session_id: str, message: bytes) -> bool:
+        """Send a message to a session, return False if no process holds it."""
+        ...
+
+    async def aclose(self) -> None:
+        """Release the connections of the broker."""
+        ...
+
+
+class _QueueSubscription:
+    def __init__(self, queues: dict[str, asyncio.Queue], session_id: str) -> None:
+        self._queues = queues
+        self._session_id = session_id
+        self._queue: asyncio.Queue = asyncio.Queue()
+        queues[session_id] = self._queue
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        if self._queues.get(self._session_id) is self._queue:
+            del self._queues[self._session_id]
+
+
+class InMemorySessionBroker:
+    """Broker for a single process: one queue per session."""
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self._queues: dict[str, asyncio.Queue] = {}
+
+    async def subscribe(self, session_id: str) -> Subscription:
+        return _QueueSubscription(self._queues, session_id)
+
+    async def publish(self, session_id: str, message: bytes) -> bool:
+        queue = self._queues.get(session_id)
+        if queue is None:
+            return False
+        queue.put_nowait(message)
+        return True
+
+    async def aclose(self) -> None:
+        self._queues.clear()
+
+
+class _ChannelSubscription:
+    def __init__(self, broker: "RedisSessionBroker", channel: str, queue: asyncio.Queue) -> None:
+        self._broker = broker
+        self._channel = channel
+        self._queue = queue
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        await self._broker._unsubscribe(self._channel, self._queue)
+
+
+class RedisSessionBroker:
+    """
+    Broker shared by processes and hosts through Redis publish/subscribe.
+
+    Each session is a channel; ``PUBLISH`` returns the number of subscribers, so a message
+    for a session no process holds is reported as undelivered without extra bookkeeping.
+    A process subscribes to the channels of all its sessions on one pubsub connection, read
+    by one task that hands the messages to the sessions by channel.
+
+    :param redis: A ``redis.asyncio.Redis`` client, or a LocalRedis for tests.
+    :param prefix: The prefix of the channel names.
+    """
+
+    def __init__(self, redis: Any, prefix: str = "mcp:session:") -> None:
+        """Constructor."""
+        self._redis = redis
+        self._prefix = prefix
+        self._pubsub: Any = None
+        self._reader: asyncio.Task | None = None
+        self._queues: dict[str, asyncio.Queue] = {}
+        self._confirmations: dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisSessionBroker":
+        """
+        Create a broker on a new Redis client, e.g. ``redis://localhost:6379/0``.
+
+        :raises ImportError: If redis, the ``redis`` extra of the project, is not installed.
+        """
+        try:
+            import redis.asyncio
+        except ImportError as e:
+            raise ImportError(f"The Redis session broker needs the redis package: {REDIS_INSTALL_HINT}") from e
+        return cls(redis.asyncio.from_url(url), **kwargs)
+
+    async def subscribe(self, session_id: str) -> Subscription:
+        """Start receiving the messages of a session, once Redis confirmed the subscription."""
+        channel = self._prefix + session_id
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues[channel] = queue
+        confirmed = self._confirmations[channel] = asyncio.get_running_loop().create_future()
+        if self._pubsub is None:
+            self._pubsub = self._redis.pubsub()
+        try:
+            await self._pubsub.subscribe(channel)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+            await confirmed
+        except BaseException:
+            await self._unsubscribe(channel, queue)
+            raise
+        finally:
+            self._confirmations.pop(channel, None)
+        return _ChannelSubscription(self, channel, queue)
+
+    async def _unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        if self._queues.get(channel) is queue:
+            del self._queues[channel]
+            await self._pubsub.unsubscribe(channel)
+
+    async def _read(self) -> None:
+        """Hand the messages of the shared pubsub connection to the sessions of their channel."""
+        # listen ends once nothing is subscribed; a subscription made meanwhile restarts it.
+        while self._queues:
+            async for item in self._pubsub.listen():
+                channel = item["channel"]
+                channel = channel.decode("utf-8") if isinstance(channel, bytes) else channel
+                if item["type"] == "message":
+                    queue = self._queues.get(channel)
+                    if queue is not None:
+                        queue.put_nowait(item["data"])
+                elif item["type"] == "subscribe":
+                    confirmed = self._confirmations.get(channel)
+                    if confirmed is not None and not confirmed.done():
+                        confirmed.set_result(None)
+
+    async def publish(self, session_id: str, message: bytes) -> bool:
+        return await self._redis.publish(self._prefix + session_id, message) > 0
+
+    async def aclose(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        self._queues.clear()
+        await self._redis.aclose()
+
+
+class _LocalPubSub:
+    def __init__(self, server: "LocalRedis") -> None:
+        self._server = server
+        self._channels: set[str] = set()
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self._server._subscribers[channel].add(self._queue)
+            self._channels.add(channel)
+            self._queue.put_nowait({"type": "subscribe", "channel": channel, "data": len(self._channels)})
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in channels or tuple(self._channels):
+            self._server._subscribers[channel].discard(self._queue)
+            self._channels.discard(channel)
+
+    async def listen(self) -> AsyncIterator[dict[str, Any]]:
+        while True:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        await self.unsubscribe()
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the part of ``redis.asyncio.Redis`` used by RedisSessionBroker.
+
+    Brokers sharing one LocalRedis behave like workers sharing a Redis server, which lets
+    the routing between workers run in one process, without a server.
+    """
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self._subscribers: dict[str, set[asyncio.Queue]] = defaultdict(set)
+
+    def pubsub(self) -> _LocalPubSub:
+        return _LocalPubSub(self)
+
+    async def publish(self, channel: str, message: bytes | str) -> int:
+        data = message.encode("utf-8") if isinstance(message, str) else message
+        subscribers = self._subscribers.get(channel, ())
+        for queue in subscribers:
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(subscribers)
+
+    async def aclose(self) -> None:
+        pass
@@ -0,0 +1,308 @@
+"""
+Shared settings and lazily created clients.
+
+Importing this module is cheap: the environment is read on the first call to
+``get_settings`` and every client is created on first use, then reused by all
+agents in the process. Heavy packages (openai, azure search) are only imported
+by the factory that needs them.
+
+All openai clients send their requests through one pooled httpx client and the
+search clients through one pooled aiohttp session, see http_transport.
+
+With CASSETTE_PATH set, the model, embeddings and tool traffic is recorded
+(CASSETTE_MODE=record) or replayed offline (the default), see cassette.
+
+The MCP servers use the MCP_TRANSPORT transport, "sse" or "streamable-http", and
+run MCP_WORKERS uvicorn workers; with MCP_BROKER_URL set, the workers share
+their SSE sessions through Redis, see session_broker and mcp_serving.
+"""
+import os
+import functools
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+    from cassette import Cassette
+    from session_broker import SessionBroker
+    from prompt_layout import PromptCacheStats
+    from mcp_metrics import Metrics
+    from openai import AsyncAzureOpenAI
+    from http_transport import PoolStats, TransportSettings
+    from agent_framework.azure import AzureOpenAIChatClient, AzureOpenAIResponsesClient
+    from search_index_manager import SearchIndexManager
+    from sharded_search import ShardedSearch
+
+EMBEDDINGS_API_VERSION = "2024-02-01"
+
+
+def _optional_int(value: str | None) -> int | None:
+    """Parse an optional integer environment variable."""
+    if value is None or not value.strip():
+        return None
+    return int(value)
+
+
+def _flag(value: str | None) -> bool:
+    """Parse an optional boolean environment variable."""
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Connection settings shared by the demo scripts."""
+    azure_openai_endpoint: str | None = None
+    azure_openai_api_key: str | None = None
+    azure_openai_deployment: str | None = None
+    azure_openai_embed_deployment: str | None = None
+    azure_search_endpoint: str | None = None
+    azure_search_api_key: str | None = None
+    azure_search_index: str | None = None
+    azure_search_shards: tuple[str, ...] = ()
+    azure_search_shard_timeout: float = 2.0
+    embed_dimensions: int | None = None
+    cassette_path: str | None = None
+    cassette_mode: str = "replay"
+    cassette_speed: float = 1.0
+    mcp_broker_url: str | None = None
+    mcp_workers: int = 1
+    mcp_transport: str = "sse"
+    mcp_stateless: bool = False
+    mcp_json_response: bool = False
+    mcp_cache_ttl: float = 30.0
+    mcp_cache_size: int = 1024
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Read the settings from the environment and the .env file."""
+        from dotenv import load_dotenv
+        load_dotenv()
+        return cls(
+            azure_openai_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            azure_openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_openai_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            azure_openai_embed_deployment=os.getenv("AZURE_OPENAI_EMBED_DEPLOYMENT"),
+            azure_search_endpoint=os.getenv("AZURE_SEARCH_ENDPOINT"),
+            azure_search_api_key=os.getenv("AZURE_SEARCH_API_KEY"),
+            azure_search_index=os.getenv("AZURE_SEARCH_INDEX"),
+            azure_search_shards=tuple(
+                name.strip() for name in os.getenv("AZURE_SEARCH_SHARDS", "").split(",") if name.strip()),
+            azure_search_shard_timeout=float(os.getenv("AZURE_SEARCH_SHARD_TIMEOUT", "2.0")),
+            embed_dimensions=_optional_int(os.getenv("AZURE_AI_EMBED_DIMENSIONS")),
+            cassette_path=os.getenv("CASSETTE_PATH") or None,
+            cassette_mode=os.getenv("CASSETTE_MODE", "replay"),
+            cassette_speed=float(os.getenv("CASSETTE_SPEED", "1.0")),
+            mcp_broker_url=os.getenv("MCP_BROKER_URL") or None,
+            mcp_workers=_optional_int(os.getenv("MCP_WORKERS")) or 1,
+            mcp_transport=os.getenv("MCP_TRANSPORT", "sse"),
+            mcp_stateless=_flag(os.getenv("MCP_STATELESS")),
+            mcp_json_response=_flag(os.getenv("MCP_JSON_RESPONSE")),
+            mcp_cache_ttl=float(os.getenv("MCP_CACHE_TTL", "30")),
+            mcp_cache_size=_optional_int(os.getenv("MCP_CACHE_SIZE")) or 1024,
+        )
+
+
+@functools.cache
+def get_settings() -> Settings:
+    """Return the process-wide settings."""
+    return Settings.from_env()
+
+
+@functools.cache
+def get_transport_settings() -> "TransportSettings":
+    """Return the process-wide connection pool settings."""
+    from http_transport import TransportSettings
+    return TransportSettings.from_env()
+
+
+@functools.cache
+def get_cassette() -> "Cassette | None":
+    """Return the cassette recording or replaying the traffic when CASSETTE_PATH is set, otherwise None."""
+    settings = get_settings()
+    if not settings.cassette_path:
+        return None
+    from cassette import Cassette
+    return Cassette(settings.cassette_path, settings.cassette_mode, settings.cassette_speed)
+
+
+@functools.cache
+def get_session_broker() -> "SessionBroker":
+    """Return the broker of the MCP sessions: Redis when MCP_BROKER_URL is set, otherwise in memory."""
+    from session_broker import InMemorySessionBroker, RedisSessionBroker
+    settings = get_settings()
+    if settings.mcp_broker_url:
+        return RedisSessionBroker.from_url(settings.mcp_broker_url)
+    return InMemorySessionBroker()
+
+
+@functools.cache
+def get_prompt_cache_stats() -> "PromptCacheStats":
+    """Return the process-wide prompt cache statistics of the chat and Responses clients."""
+    from prompt_layout import PromptCacheStats
+    return PromptCacheStats()
+
+
+@functools.cache
+def get_metrics() -> "Metrics":
+    """Return the process-wide metrics, served by the MCP apps on /metrics, with the connection pool gauges."""
+    from mcp_metrics import Gauge, Metrics
+    metrics = Metrics()
+
+    def pool(field: str):
+        def read() -> float:
+            stats = get_pool_stats()
+            return getattr(stats, field) if stats else 0
+        return read
+
+    metrics.add(Gauge("http_pool_connections", "Connections open to the model endpoints.", pool("connections")))
+    metrics.add(Gauge("http_pool_active_connections", "Connections serving a request.", pool("active")))
+    metrics.add(Gauge("http_pool_queued_requests", "Requests waiting for a connection.", pool("queued_requests")))
+    metrics.add(Gauge("http_pool_utilization", "Share of the pool limit serving requests.", pool("utilization")))
+    return metrics
+
+
+def get_pool_stats() -> "PoolStats | None":
+    """Return a snapshot of the connection pool of the openai clients, None until it is created."""
+    from http_transport import shared_transport
+    if not get_http_client.cache_info().currsize:
+        return None
+    transport = shared_transport(get_http_client())
+    return transport.pool_stats() if transport is not None else None
+
+
+@functools.cache
+def get_http_client() -> "httpx.AsyncClient":
+    """Return the process-wide httpx client used by the openai clients."""
+    from http_transport import create_http_client
+    cassette = get_cassette()
+    return create_http_client(get_transport_settings(), wrap=cassette.wrap_transport if cassette else None)
+
+
+@functools.cache
+def get_search_transport():
+    """Return the process-wide transport used by the search clients."""
+    from http_transport import create_search_transport
+    return create_search_transport(get_transport_settings())
+
+
+def _llm_metrics():
+    from mcp_metrics import LlmMetrics
+    return LlmMetrics(get_metrics())
+
+
+@functools.cache
+def get_chat_client() -> "AzureOpenAIChatClient":
+    """Return the process-wide chat completion client."""
+    from agent_framework.azure import AzureOpenAIChatClient
+    settings = get_settings()
+    chat_client = AzureOpenAIChatClient(
+        endpoint=settings.azure_openai_endpoint,
+        api_key=settings.azure_openai_api_key,
+        deployment_name=settings.azure_openai_deployment,
+    )
+    # The framework builds its own openai client; copy it onto the shared connection pool.
+    chat_client.client = chat_client.client.with_options(http_client=get_http_client())
+    chat_client.middleware = [get_prompt_cache_stats(), _llm_metrics()]
+    if get_cassette() is not None:
+        get_cassette().install(chat_client)
+    return chat_client
+
+
+@functools.cache
+def get_responses_client() -> "AzureOpenAIResponsesClient":
+    """Return the process-wide Responses API client."""
+    from agent_framework.azure import AzureOpenAIResponsesClient
+    settings = get_settings()
+    responses_client = AzureOpenAIResponsesClient(
+        endpoint=settings.azure_openai_endpoint,
+        api_key=settings.azure_openai_api_key,
+        deployment_name=settings.azure_openai_deployment,
+    )
+    responses_client.client = responses_client.client.with_options(http_client=get_http_client())
+    responses_client.middleware = [get_prompt_cache_stats(), _llm_metrics()]
+    if get_cassette() is not None:
+        get_cassette().install(responses_client)
+    return responses_client
+
+
+@functools.cache
+def get_embeddings_client() -> "AsyncAzureOpenAI":
+    """Return the process-wide embeddings client."""
+    from openai import AsyncAzureOpenAI
+    settings = get_settings()
+    return AsyncAzureOpenAI(
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_key=settings.azure_openai_api_key,
+        api_version=EMBEDDINGS_API_VERSION,
+        http_client=get_http_client(),
+    )
+
+
+@functools.cache
+def get_search_index_manager() -> "SearchIndexManager | ShardedSearch":
+    """
+    Return the process-wide search index manager.
+
+    With AZURE_SEARCH_SHARDS set to a comma separated list of index names, the indexes are
+    searched together as shards, each within AZURE_SEARCH_SHARD_TIMEOUT seconds.
+    """
+    from azure.core.credentials import AzureKeyCredential
+    from search_index_manager import SearchIndexManager
+    settings = get_settings()
+
+    def manager(index_name: str) -> SearchIndexManager:
+        return SearchIndexManager(
+            endpoint=settings.azure_search_endpoint,
+            credential=AzureKeyCredential(settings.azure_search_api_key),
+            index_name=index_name,
+            dimensions=settings.embed_dimensions,
+            model=settings.azure_openai_embed_deployment,
+            embeddings_client=get_embeddings_client(),
+            transport=get_search_transport(),
+        )
+
+    if not settings.azure_search_shards:
+        return manager(settings.azure_search_index)
+    from sharded_search import ShardedSearch
+    return ShardedSearch(
+        {name: manager(name) for name in settings.azure_search_shards},
+        embeddings_client=get_embeddings_client(),
+        model=settings.azure_openai_embed_deployment,
+        timeout=settings.azure_search_shard_timeout,
+    )
+
+
+async def close_clients() -> None:
+    """Close the clients that were created and forget them."""
+    if get_search_index_manager.cache_info().currsize:
+        await get_search_index_manager().close()
+        get_search_index_manager.cache_clear()
+    # The openai clients do not own their connections, closing one would close the shared
+    # httpx client; they are only forgotten.
+    get_embeddings_client.cache_clear()
+    get_chat_client.cache_clear()
+    get_responses_client.cache_clear()
+    # The shared connections go last, after every client using them.
+    if get_search_transport.cache_info().currsize:
+        transport = get_search_transport()
+        if transport is not None:
+            await transport.aclose()
+        get_search_transport.cache_clear()
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+    if get_cassette.cache_info().currsize:
+        if get_cassette() is not None:
+            get_cassette().save()
+        get_cassette.cache_clear()
+
+
+async def warm_up_clients(connections: int = 1) -> None:
+    """
+    Open connections to the configured endpoints before the first request.
+
+    :param connections: The number of connections opened to each endpoint.
+    """
+    from http_transport import warm_up
+    settings = get_settings()
+    await warm_up(get_http_client(), [settings.azure_openai_endpoint], connections)
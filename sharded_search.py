@@ -0,0 +1,239 @@
+import os
+import csv
+import time
+import zlib
+import heapq
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Shard(Protocol):
+    """An index searched as one shard: a SearchIndexManager or a QuantizedIndex."""
+
+    async def search_embedding(self, embedding: list[float], k: int = 5) -> list[tuple[float, str]]: ...
+
+
+def source_key(row: dict[str, str]) -> str:
+    """
+    Route a row of an embeddings file by the name of the file it came from, or by its token in older files.
+
+    Only the file name counts, so a corpus routes alike wherever its directory lies.
+    """
+    source = row.get('source')
+    return os.path.basename(source) if source else row['token']
+
+
+def shard_for(key: str, shards: Sequence[str]) -> str:
+    """
+    Return the shard of a routing key.
+
+    A key naming a shard goes to that shard, e.g. a region; other keys are spread by a
+    hash that is the same in every process, so a source always goes to the same shard.
+
+    :param key: The routing key.
+    :param shards: The shard names.
+    :return: The shard name.
+    """
+    if key in shards:
+        return key
+    return shards[zlib.crc32(key.encode("utf-8")) % len(shards)]
+
+
+def split_embeddings_file(
+        embeddings_file: str,
+        shards: Sequence[str],
+        key: Callable[[dict[str, str]], str] = source_key,
+    ) -> dict[str, str]:
+    """
+    Split an embeddings file written by SearchIndexManager.build_embeddings_file into one file per shard.
+
+    :param embeddings_file: The embeddings file.
+    :param shards: The shard names.
+    :param key: Returns the routing key of a row, see shard_for.
+    :return: Mapping of shard name to its file, named after the embeddings file and the shard.
+    """
+    stem = os.path.splitext(embeddings_file)[0]
+    paths = {shard: f"{stem}_{shard}.csv" for shard in shards}
+    files = {shard: open(path, 'w', newline='') for shard, path in paths.items()}
+    try:
+        with open(embeddings_file, newline='') as fp:
+            reader = csv.DictReader(fp)
+            writers = {shard: csv.DictWriter(f, fieldnames=reader.fieldnames) for shard, f in files.items()}
+            for writer in writers.values():
+                writer.writeheader()
+            for row in reader:
+                writers[shard_for(key(row), shards)].writerow(row)
+    finally:
+        for f in files.values():
+            f.close()
+    return paths
+
+
+def build_local_shards(
+        embeddings_file: str,
+        directory: str,
+        shards: Sequence[str],
+        quantization: str = "binary",
+        key: Callable[[dict[str, str]], str] = source_key,
+    ) -> dict[str, Any]:
+    """
+    Split an embeddings file into shards and build a QuantizedIndex of each.
+
+    :param embeddings_file: The embeddings file.
+    :param directory: The directory of the shard indexes, one subdirectory per shard.
+    :param shards: The shard names.
+    :param quantization: "int8" or "binary".
+    :param key: Returns the routing key of a row, see shard_for.
+    :return: Mapping of shard name to its index.
+    """
+    from quantized_index import QuantizedIndex
+    return {
+        shard: QuantizedIndex.build(path, os.path.join(directory, shard), quantization)
+        for shard, path in split_embeddings_file(embeddings_file, shards, key).items()
+    }
+
+
+@dataclass
+class ShardedHits:
+    """The global top-k of a sharded search, and the shards left out with the reason."""
+    hits: list[tuple[float, str, str]] = field(default_factory=list)
+    missing: dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+class ShardedSearch:
+    """
+    Searches several indexes as one, scattering a query to every shard at once.
+
+    The question is embedded once and searched in all shards concurrently, each within
+    its own time limit. The hits are merged into a global top-k by score, so the shards
+    must score alike: Azure AI Search indexes with the same embedding model, or local
+    QuantizedIndex shards, which use the same scale. A shard that fails or runs out of
+    time is left out of the results rather than failing the query, as is a shard whose
+    index could not be created.
+
+    Ingestion routes every row of an embeddings file to one shard by ``key``, so each
+    shard holds and serves only its part of the corpus.
+
+    :param shards: Mapping of shard name to shard, SearchIndexManager or QuantizedIndex.
+    :param embeddings_client: The embedding client, the one used to build the embeddings file.
+    :param model: The embedding model.
+    :param k: The number of chunks returned by search.
+    :param timeout: Seconds a shard is given, None for no limit.
+    :param timeouts: Seconds given to particular shards, overriding timeout.
+    :param key: Returns the routing key of a row of an embeddings file, see shard_for.
+    """
+
+    def __init__(
+            self,
+            shards: dict[str, Shard],
+            embeddings_client: Any,
+            model: str,
+            k: int = 5,
+            timeout: float | None = 2.0,
+            timeouts: dict[str, float | None] | None = None,
+            key: Callable[[dict[str, str]], str] = source_key,
+        ) -> None:
+        """Constructor."""
+        if not shards:
+            raise ValueError("At least one shard is needed.")
+        self._shards = shards
+        self._embeddings_client = embeddings_client
+        self._model = model
+        self._k = k
+        self._timeouts = {name: (timeouts or {}).get(name, timeout) for name in shards}
+        self._key = key
+        # Shards whose index could not be created, with the reason.
+        self._unavailable: dict[str, str] = {}
+
+    async def search(self, message: str) -> str:
+        """
+        Search the message in all shards.
+
+        :param message: The customer question.
+        :return: The context for the question.
+        """
+        response = await self._embeddings_client.embeddings.create(input=message, model=self._model)
+        result = await self.search_embedding(response.data[0].embedding, self._k)
+        return "\n------\n".join(chunk for _, chunk, _ in result.hits)
+
+    async def search_embedding(self, embedding: list[float], k: int = 5) -> ShardedHits:
+        """
+        Search an embedded question in all shards and merge the hits.
+
+        :param embedding: The question embedding.
+        :param k: The number of hits returned.
+        :return: The score, chunk and shard of the best hits, best first, and the shards left out.
+        """
+        start = time.perf_counter()
+
+        async def search_shard(name: str) -> list[tuple[float, str, str]]:
+            async with asyncio.timeout(self._timeouts[name]):
+                hits = await self._shards[name].search_embedding(embedding, k)
+            return [(score, chunk, name) for score, chunk in hits]
+
+        names = [name for name in self._shards if name not in self._unavailable]
+        results = await asyncio.gather(*(search_shard(name) for name in names), return_exceptions=True)
+        merged = ShardedHits(missing=dict(self._unavailable))
+        hits = []
+        for name, result in zip(names, results):
+            if isinstance(result, TimeoutError):
+                merged.missing[name] = f"timed out after {self._timeouts[name]:g}s"
+            elif isinstance(result, Exception):
+                merged.missing[name] = f"{type(result).__name__}: {result}"
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                hits.extend(result)
+        if merged.missing:
+            logger.warning("Search left out shards %s", "; ".join(f"{n}: {e}" for n, e in merged.missing.items()))
+        merged.hits = heapq.nlargest(k, hits, key=lambda hit: hit[0])
+        merged.elapsed = time.perf_counter() - start
+        return merged
+
+    async def ensure_index_created(self, vector_index_dimensions: int | None = None) -> None:
+        """
+        Get or create the index of every SearchIndexManager shard, see SearchIndexManager.ensure_index_created.
+
+        A shard whose index fails is logged and left out of the searches until a later call succeeds.
+        """
+        names = [name for name, shard in self._shards.items() if hasattr(shard, "ensure_index_created")]
+        results = await asyncio.gather(*(
+            self._shards[name].ensure_index_created(vector_index_dimensions) for name in names
+        ), return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error("Could not create the index of shard %s: %s", name, result)
+                self._unavailable[name] = f"index unavailable, {type(result).__name__}: {result}"
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                self._unavailable.pop(name, None)
+
+    async def upload_documents(self, embeddings_file: str) -> None:
+        """
+        Split an embeddings file by shard and upload the parts to their shards concurrently.
+
+        Local shards are built with build_local_shards instead.
+
+        :param embeddings_file: The embeddings file to upload.
+        """
+        paths = split_embeddings_file(embeddings_file, list(self._shards), self._key)
+        await asyncio.gather(*(
+            shard.upload_documents(paths[name])
+            for name, shard in self._shards.items() if hasattr(shard, "upload_documents")
+        ))
+
+    async def close(self) -> None:
+        """Close the shards holding resources."""
+        await asyncio.gather(*(
+            shard.close() for shard in self._shards.values() if hasattr(shard, "close")
+        ))
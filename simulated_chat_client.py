@@ -0,0 +1,166 @@
+import json
+import uuid
+import hashlib
+import random
+import asyncio
+from typing import Any, AsyncIterable, Callable, MutableSequence
+
+from pydantic import BaseModel
+from agent_framework import (
+    BaseChatClient,
+    ChatMessage,
+    ChatOptions,
+    ChatResponse,
+    ChatResponseUpdate,
+    FunctionCallContent,
+    FunctionResultContent,
+    Role,
+    TextContent,
+    UsageContent,
+    UsageDetails,
+    use_chat_middleware,
+    use_function_invocation,
+)
+
+_WORDS = ("the", "city", "visit", "museum", "river", "walk", "food", "market", "view", "old", "town", "square")
+
+
+@use_function_invocation
+@use_chat_middleware
+class SimulatedChatClient(BaseChatClient):
+    """
+    Chat client answering offline, with the timing of a real model.
+
+    Each response waits ``ttft`` seconds, then streams ``reply_tokens`` tokens at
+    ``tokens_per_second``; both are varied by ``jitter``. With a ``response_format`` the
+    text is the JSON of ``structured(response_format)``. When the agent has one of the
+    ``tool_names`` tools, the first response calls it and the answer follows the result,
+    like a model would, so the function invocation layer of the framework runs as well.
+
+    Input tokens are counted as 4 characters of the tools and messages, and a prompt cache
+    is simulated like Azure OpenAI's: from 1024 tokens, the prefix shared with an earlier
+    request is reported as cached, in blocks of 128 tokens.
+
+    :param ttft: Seconds before the first token.
+    :param tokens_per_second: The streaming rate, None to send the whole reply at once.
+    :param reply_tokens: The number of tokens in a text reply.
+    :param jitter: Relative random variation of the latency and the rate, e.g. 0.2 for ±20%.
+    :param structured: Returns the fields of a structured response for a pydantic model.
+    :param tool_names: The tools called before answering, when the agent has them.
+    :param seed: Seed of the random variations.
+    """
+
+    def __init__(
+            self,
+            *,
+            ttft: float = 0.3,
+            tokens_per_second: float | None = 60.0,
+            reply_tokens: int = 80,
+            jitter: float = 0.2,
+            structured: Callable[[type[BaseModel]], dict[str, Any]] | None = None,
+            tool_names: set[str] | None = None,
+            seed: int | None = None,
+            **kwargs: Any,
+        ) -> None:
+        """Constructor."""
+        super().__init__(**kwargs)
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.jitter = jitter
+        self.structured = structured
+        self.tool_names = tool_names or set()
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._cached_prefixes: set[bytes] = set()
+
+    def _vary(self, value: float) -> float:
+        return value * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _tool_call(self, messages: MutableSequence[ChatMessage], chat_options: ChatOptions) -> FunctionCallContent | None:
+        """Return the tool call to make, if the conversation has not called a tool since the last user message."""
+        for message in reversed(messages):
+            if message.role == Role.USER:
+                break
+            if any(isinstance(content, FunctionResultContent) for content in message.contents):
+                return None
+        for tool in chat_options.tools or []:
+            if getattr(tool, "name", None) in self.tool_names:
+                arguments = {
+                    name: "Paris" for name, schema in tool.parameters().get("properties", {}).items()
+                    if schema.get("type") == "string"
+                }
+                return FunctionCallContent(call_id=uuid.uuid4().hex, name=tool.name, arguments=json.dumps(arguments))
+        return None
+
+    def _reply_tokens(self, chat_options: ChatOptions) -> list[str]:
+        if chat_options.response_format is not None:
+            fields = self.structured(chat_options.response_format) if self.structured else {}
+            text = chat_options.response_format(**fields).model_dump_json()
+            # JSON streams in pieces of a few characters, like model tokens.
+            return [text[i:i + 4] for i in range(0, len(text), 4)]
+        return [self._random.choice(_WORDS) + " " for _ in range(self.reply_tokens)]
+
+    def _usage(self, messages: MutableSequence[ChatMessage], chat_options: ChatOptions, output_tokens: int) -> UsageContent:
+        tools = [tool.to_json_schema_spec() for tool in chat_options.tools or [] if hasattr(tool, "to_json_schema_spec")]
+        prompt = json.dumps(tools) + "".join(f"{message.role.value}:{message.text}" for message in messages)
+        input_tokens = len(prompt) // 4
+        cached = 0
+        # One hash per 128 token block of the prompt, chained so a block hash covers the whole prefix.
+        digest = hashlib.sha256()
+        for block in range(0, input_tokens // 128):
+            digest.update(prompt[block * 512:(block + 1) * 512].encode("utf-8"))
+            key = digest.digest()
+            if key in self._cached_prefixes and (block + 1) * 128 >= 1024:
+                cached = (block + 1) * 128
+            self._cached_prefixes.add(key)
+        if len(self._cached_prefixes) > 100_000:
+            # Providers evict too; this keeps long load tests from measuring the simulated cache.
+            self._cached_prefixes.clear()
+        details = UsageDetails(
+            input_token_count=input_tokens, output_token_count=output_tokens,
+            total_token_count=input_tokens + output_tokens)
+        if cached:
+            details["prompt/cached_tokens"] = cached
+        return UsageContent(details)
+
+    async def _inner_get_response(
+            self,
+            *,
+            messages: MutableSequence[ChatMessage],
+            chat_options: ChatOptions,
+            **kwargs: Any,
+        ) -> ChatResponse:
+        contents = []
+        async for update in self._inner_get_streaming_response(
+                messages=messages, chat_options=chat_options, stream_delay=False, **kwargs):
+            contents.extend(update.contents)
+        return ChatResponse.from_chat_response_updates([ChatResponseUpdate(contents=contents, role=Role.ASSISTANT)])
+
+    async def _inner_get_streaming_response(
+            self,
+            *,
+            messages: MutableSequence[ChatMessage],
+            chat_options: ChatOptions,
+            stream_delay: bool = True,
+            **kwargs: Any,
+        ) -> AsyncIterable[ChatResponseUpdate]:
+        self.requests += 1
+        await asyncio.sleep(self._vary(self.ttft))
+
+        call = self._tool_call(messages, chat_options)
+        if call is not None:
+            yield ChatResponseUpdate(contents=[call, self._usage(messages, chat_options, 20)], role=Role.ASSISTANT)
+            return
+
+        tokens = self._reply_tokens(chat_options)
+        rate = self._vary(self.tokens_per_second) if self.tokens_per_second else None
+        if rate is None or not stream_delay:
+            if rate is not None:
+                await asyncio.sleep(len(tokens) / rate)
+            yield ChatResponseUpdate(contents=[TextContent(text="".join(tokens))], role=Role.ASSISTANT)
+        else:
+            for token in tokens:
+                await asyncio.sleep(1 / rate)
+                yield ChatResponseUpdate(contents=[TextContent(text=token)], role=Role.ASSISTANT)
+        yield ChatResponseUpdate(contents=[self._usage(messages, chat_options, len(tokens))], role=Role.ASSISTANT)
@@ -0,0 +1,285 @@
+import sys
+import time
+import asyncio
+import inspect
+from typing import Any, Callable, TextIO
+
+from agent_framework import (
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    FunctionApprovalRequestContent,
+    FunctionCallContent,
+    FunctionResultContent,
+    TextContent,
+    WorkflowStatusEvent,
+)
+
+
+def _format_text(content: TextContent) -> str:
+    return content.text or ""
+
+
+def _format_function_call(content: FunctionCallContent) -> str:
+    return (
+        f"\n🔧 Function Call: {content.name}\n"
+        f"   Call ID: {content.call_id}\n"
+        f"   Arguments: {content.arguments}\n"
+    )
+
+
+def _format_function_result(content: FunctionResultContent) -> str:
+    return f"\n🔧 Function Result: {content.result}\n"
+
+
+def _format_approval_request(content: FunctionApprovalRequestContent) -> str:
+    return (
+        f"\nFunction Approval Call: {content.function_call.name}\n"
+        f"Function Approval Arguments: {content.function_call.arguments}\n"
+    )
+
+
+TEXT_FORMATTERS: dict[type, Callable[[Any], str]] = {
+    TextContent: _format_text,
+}
+
+VERBOSE_FORMATTERS: dict[type, Callable[[Any], str]] = {
+    TextContent: _format_text,
+    FunctionCallContent: _format_function_call,
+    FunctionResultContent: _format_function_result,
+    FunctionApprovalRequestContent: _format_approval_request,
+}
+
+
+class StreamSink:
+    """
+    Coalescing renderer for streamed agent and workflow updates.
+
+    Fragments are buffered per executor and written in blocks once the pending
+    size reaches ``flush_size`` or ``flush_interval`` seconds have passed since
+    the first unflushed fragment. Contents are formatted through a lookup table
+    keyed by content type, so each fragment costs one dict lookup.
+
+    :param write: The callable receiving rendered text. It may be a coroutine function.
+    :param flush: Optional callable invoked after each block is written. It may be a coroutine function.
+    :param flush_interval: The maximum time in seconds a fragment may stay buffered.
+    :param flush_size: The number of buffered characters that triggers an immediate flush.
+    :param formatters: Mapping of content type to a function rendering that content as text.
+                       Content types missing from the table are skipped.
+    :param show_status: Whether to render WorkflowStatusEvent events.
+    """
+
+    DEFAULT_EXECUTOR = ""
+
+    def __init__(
+            self,
+            write: Callable[[str], Any],
+            flush: Callable[[], Any] | None = None,
+            flush_interval: float = 0.05,
+            flush_size: int = 4096,
+            formatters: dict[type, Callable[[Any], str]] | None = None,
+            show_status: bool = False,
+        ) -> None:
+        """Constructor."""
+        self._write = write
+        self._flush = flush
+        self._write_is_async = inspect.iscoroutinefunction(write)
+        self._flush_is_async = flush is not None and inspect.iscoroutinefunction(flush)
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._formatters: dict[type, Callable[[Any], str] | None] = dict(formatters or TEXT_FORMATTERS)
+        self._show_status = show_status
+        self._pending: dict[str, list[str]] = {}
+        self._pending_size = 0
+        self._first_pending_at: float | None = None
+        self._last_executor_id: str | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()
+        self._owned_stream: TextIO | None = None
+        self.updates = 0
+        self.writes = 0
+        self._event_handlers: dict[type, Callable[[Any], None] | None] = {
+            AgentRunUpdateEvent: self._on_agent_update_event,
+            WorkflowStatusEvent: self._on_status_event,
+        }
+
+    @classmethod
+    def to_stdout(cls, **kwargs: Any) -> "StreamSink":
+        """Create a sink writing to standard output."""
+        return cls.to_text_io(sys.stdout, **kwargs)
+
+    @classmethod
+    def to_text_io(cls, stream: TextIO, **kwargs: Any) -> "StreamSink":
+        """
+        Create a sink writing to an open text stream, e.g. a log file.
+
+        :param stream: The text stream to write to. The caller owns and closes it.
+        """
+        return cls(stream.write, stream.flush, **kwargs)
+
+    @classmethod
+    def to_file(cls, path: str, **kwargs: Any) -> "StreamSink":
+        """
+        Create a sink appending to a file. The file is closed by ``aclose``.
+
+        :param path: The path of the file to append to.
+        """
+        stream = open(path, "a", encoding="utf-8")
+        sink = cls.to_text_io(stream, **kwargs)
+        sink._owned_stream = stream
+        return sink
+
+    @classmethod
+    def to_async_writer(cls, writer: Any, encoding: str = "utf-8", **kwargs: Any) -> "StreamSink":
+        """
+        Create a sink writing to an asyncio.StreamWriter-like object, e.g. a socket.
+
+        :param writer: An object with ``write(bytes)`` and an awaitable ``drain()``.
+        :param encoding: The encoding applied to the rendered text.
+        """
+        async def write(text: str) -> None:
+            writer.write(text.encode(encoding))
+            await writer.drain()
+
+        return cls(write, **kwargs)
+
+    def _lookup(self, table: dict[type, Any], kind: type) -> Any:
+        """Resolve a handler for a type, caching the MRO walk for subclasses."""
+        try:
+            return table[kind]
+        except KeyError:
+            handler = None
+            for base in kind.__mro__[1:]:
+                if base in table:
+                    handler = table[base]
+                    break
+            table[kind] = handler
+            return handler
+
+    async def handle(self, event: Any) -> None:
+        """
+        Render a workflow event.
+
+        :param event: Any event produced by ``workflow.run_stream``. Events without a handler are ignored.
+        """
+        handler = self._lookup(self._event_handlers, type(event))
+        if handler is not None:
+            handler(event)
+            await self._maybe_flush()
+
+    async def handle_update(self, update: AgentRunResponseUpdate, executor_id: str | None = None) -> None:
+        """
+        Render an update produced by ``agent.run_stream``.
+
+        :param update: The streamed agent update.
+        :param executor_id: Optional label to group the update under.
+        """
+        self._append(executor_id or self.DEFAULT_EXECUTOR, update)
+        await self._maybe_flush()
+
+    async def consume(self, events: Any) -> None:
+        """
+        Render an entire asynchronous stream of workflow events, then flush.
+
+        :param events: The async iterable returned by ``workflow.run_stream``.
+        """
+        async for event in events:
+            await self.handle(event)
+        await self.flush()
+
+    def _on_agent_update_event(self, event: AgentRunUpdateEvent) -> None:
+        if event.data is not None:
+            self._append(event.executor_id, event.data)
+
+    def _on_status_event(self, event: WorkflowStatusEvent) -> None:
+        if self._show_status:
+            self._append_text(self.DEFAULT_EXECUTOR, f"\n=== Status ===\n{event}\n")
+
+    def _append(self, executor_id: str, update: AgentRunResponseUpdate) -> None:
+        self.updates += 1
+        for content in update.contents:
+            formatter = self._lookup(self._formatters, type(content))
+            if formatter is not None:
+                text = formatter(content)
+                if text:
+                    self._append_text(executor_id, text)
+
+    def _append_text(self, executor_id: str, text: str) -> None:
+        fragments = self._pending.get(executor_id)
+        if fragments is None:
+            fragments = self._pending[executor_id] = []
+        fragments.append(text)
+        self._pending_size += len(text)
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+            self._schedule_timer()
+
+    def _schedule_timer(self) -> None:
+        """Make sure buffered text is written even if the stream stalls."""
+        if self._timer is not None or self._flush_interval <= 0:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._timer = loop.call_later(self._flush_interval, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        if self._pending_size:
+            asyncio.ensure_future(self.flush())
+
+    async def _maybe_flush(self) -> None:
+        if not self._pending_size:
+            return
+        if (self._pending_size >= self._flush_size
+                or time.monotonic() - self._first_pending_at >= self._flush_interval):
+            await self.flush()
+
+    def _render_pending(self) -> str:
+        parts: list[str] = []
+        for executor_id, fragments in self._pending.items():
+            if not fragments:
+                continue
+            if executor_id != self._last_executor_id:
+                if self._last_executor_id is not None:
+                    parts.append("\n")
+                if executor_id:
+                    parts.append(f"{executor_id}: ")
+                self._last_executor_id = executor_id
+            parts.extend(fragments)
+        self._pending.clear()
+        self._pending_size = 0
+        self._first_pending_at = None
+        return "".join(parts)
+
+    async def flush(self) -> None:
+        """Write all buffered text to the target."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending_size:
+                await self._emit(self._render_pending())
+
+    async def _emit(self, text: str) -> None:
+        if self._write_is_async:
+            await self._write(text)
+        else:
+            self._write(text)
+        if self._flush is not None:
+            if self._flush_is_async:
+                await self._flush()
+            else:
+                self._flush()
+        self.writes += 1
+
+    async def aclose(self) -> None:
+        """Flush buffered text, terminate the last line and release an owned file."""
+        await self.flush()
+        if self._last_executor_id is not None:
+            async with self._lock:
+                await self._emit("\n")
+            self._last_executor_id = None
+        if self._owned_stream is not None:
+            self._owned_stream.close()
+            self._owned_stream = None
@@ -0,0 +1,133 @@
+import logging
+import weakref
+from typing import Any, Callable, Hashable, Mapping, TypeVar
+
+from pydantic import BaseModel, ValidationError
+from agent_framework import AgentExecutorResponse, AgentRunResponse, Executor, WorkflowBuilder
+
+logger = logging.getLogger(__name__)
+
+TModel = TypeVar("TModel", bound=BaseModel)
+
+# Responses whose text did not validate, so the next edge does not parse and report it again.
+_invalid: "weakref.WeakKeyDictionary[AgentRunResponse, type[BaseModel]]" = weakref.WeakKeyDictionary()
+
+
+def structured_value(message: Any, model: type[TModel]) -> TModel | None:
+    """
+    Return the structured output of an agent response, validating the text at most once.
+
+    The AgentExecutor already fills ``agent_run_response.value`` for agents created with
+    ``response_format``; otherwise the text is validated here and the result attached to
+    the response, so every edge and downstream executor sees the same typed value.
+
+    :param message: The message routed by the workflow.
+    :param model: The expected pydantic model.
+    :return: The typed value, or None if the message is not an agent response or does not validate.
+    """
+    if not isinstance(message, AgentExecutorResponse):
+        return None
+    response = message.agent_run_response
+    if isinstance(response.value, model):
+        return response.value
+    if _invalid.get(response) is model:
+        return None
+    try:
+        response.value = model.model_validate_json(response.text)
+    except ValidationError as e:
+        _invalid[response] = model
+        logger.warning(
+            "Response from %s is not a valid %s: %s",
+            message.executor_id, model.__name__, e)
+        return None
+    return response.value
+
+
+def when(model: type[TModel], predicate: Callable[[TModel], bool]) -> Callable[[Any], bool]:
+    """
+    Create an edge condition on the structured output of the source agent.
+
+    Messages that do not validate fail closed, the edge is not taken.
+
+    :param model: The expected pydantic model.
+    :param predicate: Called with the typed value.
+    :return: The condition for ``WorkflowBuilder.add_edge``.
+    """
+    def condition(message: Any) -> bool:
+        value = structured_value(message, model)
+        return value is not None and predicate(value)
+
+    return condition
+
+
+class FieldSwitch:
+    """
+    Selection function routing each message to exactly one target by a key of its structured value.
+
+    The cases are compiled into a dict, so routing costs one validation and one lookup
+    however many cases there are.
+
+    :param model: The expected pydantic model.
+    :param key: The field name, or a function computing the key from the typed value.
+    :param cases: Mapping of key to the executor id receiving the message.
+    :param default: The executor id for unknown keys and responses that do not validate,
+                    None to drop them.
+    """
+
+    def __init__(
+            self,
+            model: type[TModel],
+            key: str | Callable[[TModel], Hashable],
+            cases: Mapping[Hashable, str],
+            default: str | None = None,
+        ) -> None:
+        """Constructor."""
+        self._model = model
+        self._key = (lambda value: getattr(value, key)) if isinstance(key, str) else key
+        self._routes = {case: [target_id] for case, target_id in cases.items()}
+        self._default = [default] if default is not None else []
+
+    def __call__(self, message: Any, target_ids: list[str]) -> list[str]:
+        if not isinstance(message, AgentExecutorResponse):
+            # Not an agent response, e.g. an input forwarded by a resolver; nothing to route.
+            return []
+        value = structured_value(message, self._model)
+        if value is None:
+            return self._default
+        try:
+            return self._routes.get(self._key(value), self._default)
+        except TypeError:
+            # Unhashable keys, e.g. a list field, cannot match any case.
+            return self._default
+
+
+def add_field_switch(
+        builder: WorkflowBuilder,
+        source: Executor,
+        model: type[TModel],
+        key: str | Callable[[TModel], Hashable],
+        cases: Mapping[Hashable, Executor],
+        default: Executor | None = None,
+    ) -> WorkflowBuilder:
+    """
+    Add a switch on one field of the source agent's structured output.
+
+    Replaces ``add_switch_case_edge_group`` with one predicate per case: the value is
+    validated once and the target found with a dict lookup.
+
+    :param builder: The workflow builder.
+    :param source: The executor whose responses are routed.
+    :param model: The expected pydantic model.
+    :param key: The field name, or a function computing the key from the typed value.
+    :param cases: Mapping of key to target executor.
+    :param default: The target for unknown keys and responses that do not validate, None to drop them.
+    :return: The builder, for chaining.
+    """
+    targets = list({executor.id: executor for executor in [*cases.values(), *filter(None, [default])]}.values())
+    selection = FieldSwitch(
+        model,
+        key,
+        {case: executor.id for case, executor in cases.items()},
+        default.id if default is not None else None,
+    )
+    return builder.add_multi_selection_edge_group(source, targets, selection)
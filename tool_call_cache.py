@@ -0,0 +1,116 @@
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any
+
+from mcp import types
+from mcp.server.lowlevel import Server
+
+from mcp_metrics import Counter
+
+
+def call_key(name: str, arguments: dict[str, Any] | None) -> str:
+    """Hash a tool name and its arguments, independent of the order and spacing of the arguments."""
+    payload = json.dumps([name, arguments or {}], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """A tool call running for one or more identical requests."""
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class ToolCallCache:
+    """
+    Single-flight and TTL cache of the tool calls of an MCP server.
+
+    Calls with the same tool name and arguments share one run while it is in flight, and
+    its result answers them for ``ttl`` seconds afterwards; failed calls are not kept. The
+    run belongs to no caller: it is cancelled only once every caller waiting for it has
+    gone. Progress notifications, if any, go to the caller that started the run.
+
+    ``calls`` counts the calls by outcome: "hit" (answered from the cache), "merged"
+    (joined a run in flight) and "miss" (started a run).
+
+    :param ttl: Seconds a result is reused, 0 to only merge concurrent calls.
+    :param max_entries: The number of results kept, the least recently used are dropped first.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024) -> None:
+        """Constructor."""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.calls = Counter("mcp_tool_cache_calls_total", "Tool calls by cache outcome.", ("outcome",))
+        self._results: OrderedDict[str, tuple[float, types.ServerResult]] = OrderedDict()
+        self._flights: dict[str, _Flight] = {}
+
+    def _cached(self, key: str) -> types.ServerResult | None:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: types.ServerResult) -> None:
+        if self.ttl <= 0 or getattr(result.root, "isError", False):
+            return
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def _run(self, key: str, handler: Any, request: types.CallToolRequest) -> types.ServerResult:
+        try:
+            result = await handler(request)
+            self._store(key, result)
+            return result
+        finally:
+            flight = self._flights.get(key)
+            if flight is not None and flight.task is asyncio.current_task():
+                del self._flights[key]
+
+    def clear(self) -> None:
+        """Forget the cached results; calls in flight are still shared."""
+        self._results.clear()
+
+    def wrap(self, server: Server) -> Server:
+        """Serve the tool calls of an MCP server through the cache."""
+        handler = server.request_handlers.get(types.CallToolRequest)
+        if handler is None or getattr(server, "_tool_call_cache", None) is self:
+            return server
+
+        async def call_tool(request: types.CallToolRequest) -> types.ServerResult:
+            key = call_key(request.params.name, request.params.arguments)
+            result = self._cached(key)
+            if result is not None:
+                self.calls.inc("hit")
+                return result
+            flight = self._flights.get(key)
+            if flight is None:
+                self.calls.inc("miss")
+                flight = self._flights[key] = _Flight(asyncio.create_task(self._run(key, handler, request)))
+            else:
+                self.calls.inc("merged")
+            flight.waiters += 1
+            try:
+                return await asyncio.shield(flight.task)
+            finally:
+                flight.waiters -= 1
+                if not flight.waiters and not flight.task.done():
+                    # Every caller has gone; a new one starts a new run.
+                    flight.task.cancel()
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+
+        server.request_handlers[types.CallToolRequest] = call_tool
+        server._tool_call_cache = self
+        return server
@@ -0,0 +1,216 @@
+import json
+import logging
+from typing import Any, Callable, Sequence
+
+from mcp import types
+from mcp.server.lowlevel import Server
+from mcp.shared.exceptions import McpError
+from pydantic import BaseModel, ValidationError
+from agent_framework import (
+    AgentProtocol,
+    AgentRunResponse,
+    Workflow,
+    WorkflowOutputEvent,
+    WorkflowStatusEvent,
+)
+
+from stream_sink import VERBOSE_FORMATTERS, StreamSink
+
+logger = logging.getLogger(__name__)
+
+
+def _default_message(arguments: BaseModel) -> Any:
+    """Pass a single field input on as its value, any other input as JSON."""
+    values = arguments.model_dump(exclude_none=True)
+    if len(type(arguments).model_fields) == 1 and len(values) == 1:
+        return str(next(iter(values.values())))
+    return arguments.model_dump_json(exclude_none=True)
+
+
+def _output_text(output: Any) -> str:
+    """Render a workflow output as the text of the tool result."""
+    if isinstance(output, AgentRunResponse):
+        return output.text
+    if isinstance(output, BaseModel):
+        return output.model_dump_json()
+    if isinstance(output, str):
+        return output
+    return json.dumps(output, default=str)
+
+
+def _error(message: str) -> McpError:
+    return McpError(error=types.ErrorData(code=types.INTERNAL_ERROR, message=message))
+
+
+def _progress_sink(server: Server, flush_interval: float, flush_size: int) -> StreamSink | None:
+    """
+    Return a sink sending the text it receives as progress notifications of the current
+    request, or None when the client did not ask for progress.
+    """
+    context = server.request_context
+    token = context.meta.progressToken if context.meta else None
+    if token is None:
+        return None
+    sent = 0
+
+    async def notify(text: str) -> None:
+        nonlocal sent
+        # Progress must increase: it counts the characters sent so far.
+        sent += len(text)
+        await context.session.send_progress_notification(
+            progress_token=token, progress=sent, message=text, related_request_id=str(context.request_id))
+
+    return StreamSink(notify, flush_interval=flush_interval, flush_size=flush_size, formatters=VERBOSE_FORMATTERS)
+
+
+def agent_as_mcp_server(
+        agent: AgentProtocol,
+        *,
+        name: str | None = None,
+        description: str | None = None,
+        progress: bool = True,
+        flush_interval: float = 0.1,
+        flush_size: int = 512,
+        server_name: str = "Agent",
+        version: str | None = None,
+        instructions: str | None = None,
+    ) -> Server:
+    """
+    Serve an agent as an MCP tool, like ``agent.as_mcp_server()``, streaming its progress.
+
+    When the client sends a progress token with the call, the agent runs streamed and its
+    text and tool calls are sent as progress notifications of the call while it runs,
+    coalesced by a StreamSink into one notification per ``flush_interval`` seconds or
+    ``flush_size`` characters. The result is the whole response, as without progress.
+
+    :param agent: The agent.
+    :param name: The tool name, the agent name by default.
+    :param description: The tool description, the agent description by default.
+    :param progress: Whether to send progress notifications to the clients asking for them.
+    :param flush_interval: The longest time in seconds text waits before it is sent.
+    :param flush_size: The number of characters sent at once without waiting.
+    :param server_name: The MCP server name.
+    :param version: The MCP server version.
+    :param instructions: The MCP server instructions.
+    :return: The MCP server.
+    """
+    server: Server = Server(name=server_name, version=version, instructions=instructions)
+    agent_tool = agent.as_tool(name=name, description=description)
+    schema = agent_tool.input_model.model_json_schema()
+    tool = types.Tool(
+        name=agent_tool.name,
+        description=agent_tool.description,
+        inputSchema={"type": "object", "properties": schema.get("properties", {}), "required": schema.get("required", [])},
+    )
+
+    @server.list_tools()
+    async def _list_tools() -> list[types.Tool]:
+        return [tool]
+
+    @server.call_tool()
+    async def _call_tool(tool_name: str, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
+        if tool_name != tool.name:
+            raise _error(f"Tool {tool_name} not found")
+        try:
+            task = agent_tool.input_model.model_validate(arguments or {}).task
+        except ValidationError as e:
+            raise _error(f"Invalid arguments for {tool.name}: {e}")
+        sink = _progress_sink(server, flush_interval, flush_size) if progress else None
+        try:
+            if sink is None:
+                text = (await agent.run(task)).text
+            else:
+                updates = []
+                async for update in agent.run_stream(task):
+                    updates.append(update)
+                    await sink.handle_update(update)
+                await sink.flush()
+                text = AgentRunResponse.from_agent_run_response_updates(updates).text
+        except Exception as e:
+            logger.exception("Agent %s failed", tool.name)
+            raise _error(f"Error calling tool {tool.name}: {e}")
+        return [types.TextContent(type="text", text=text)]
+
+    return server
+
+
+def workflow_as_mcp_server(
+        build_workflow: Callable[[], Workflow],
+        *,
+        name: str,
+        description: str,
+        input_model: type[BaseModel],
+        to_message: Callable[[BaseModel], Any] = _default_message,
+        progress: bool = True,
+        flush_interval: float = 0.1,
+        flush_size: int = 512,
+        server_name: str = "Workflow",
+        version: str | None = None,
+        instructions: str | None = None,
+    ) -> Server:
+    """
+    Serve a workflow as an MCP tool.
+
+    The tool call validates its arguments against ``input_model``, runs the workflow with
+    them and returns the workflow outputs, one text content each. Unlike wrapping the
+    workflow in an agent, there is no model call besides the workflow's own.
+
+    A workflow instance runs one message at a time, so each call builds its own.
+
+    When the client sends a progress token with the call, the workflow runs streamed and the
+    text and tool calls of its agents are sent as coalesced progress notifications, see
+    ``agent_as_mcp_server``.
+
+    :param build_workflow: Returns a new workflow; its last executor must yield the output,
+                           e.g. an AgentExecutor with ``output_response=True``.
+    :param name: The tool name.
+    :param description: The tool description shown to the MCP client.
+    :param input_model: The pydantic model of the tool arguments, its JSON schema is the tool input schema.
+    :param to_message: Turns the arguments into the workflow input. A model with a single field
+                       passes its value as a string by default, other models their JSON.
+    :param progress: Whether to send progress notifications to the clients asking for them.
+    :param flush_interval: The longest time in seconds text waits before it is sent.
+    :param flush_size: The number of characters sent at once without waiting.
+    :param server_name: The MCP server name.
+    :param version: The MCP server version.
+    :param instructions: The MCP server instructions.
+    :return: The MCP server.
+    """
+    server: Server = Server(name=server_name, version=version, instructions=instructions)
+    schema = input_model.model_json_schema()
+    tool = types.Tool(name=name, description=description, inputSchema=schema)
+
+    @server.list_tools()
+    async def _list_tools() -> list[types.Tool]:
+        return [tool]
+
+    @server.call_tool()
+    async def _call_tool(tool_name: str, arguments: dict[str, Any]) -> Sequence[types.TextContent]:
+        if tool_name != name:
+            raise _error(f"Tool {tool_name} not found")
+        try:
+            message = to_message(input_model.model_validate(arguments or {}))
+        except ValidationError as e:
+            raise _error(f"Invalid arguments for {name}: {e}")
+        sink = _progress_sink(server, flush_interval, flush_size) if progress else None
+        try:
+            if sink is None:
+                result = await build_workflow().run(message)
+                outputs, state = result.get_outputs(), result.get_final_state()
+            else:
+                outputs, state = [], None
+                async for event in build_workflow().run_stream(message):
+                    if isinstance(event, WorkflowOutputEvent):
+                        outputs.append(event.data)
+                    elif isinstance(event, WorkflowStatusEvent):
+                        state = event.state
+                    await sink.handle(event)
+                await sink.flush()
+        except Exception as e:
+            logger.exception("Workflow %s failed", name)
+            raise _error(f"Error calling tool {name}: {e}")
+        if not outputs:
+            raise _error(f"Workflow {name} finished in state {state} without output")
+        return [types.TextContent(type="text", text=_output_text(output)) for output in outputs]
+
+    return server
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import functools
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Callable
+
+from agent_framework import (
+    AgentRunUpdateEvent,
+    ExecutorCompletedEvent,
+    ExecutorFailedEvent,
+    ExecutorInvokedEvent,
+    FunctionCallContent,
+    FunctionResultContent,
+    TextContent,
+    UsageContent,
+    Workflow,
+    WorkflowEvent,
+)
+
+
+def _patch(obj: Any, name: str, value: Any) -> Callable[[], None]:
+    """Set an attribute of an object, return the function restoring it."""
+    had_own = name in vars(obj)
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    return (lambda: setattr(obj, name, original)) if had_own else (lambda: delattr(obj, name))
+
+
+@dataclass
+class ExecutorSpan:
+    """One invocation of an executor."""
+    executor_id: str
+    start: float
+    end: float | None = None
+    waited: float = 0.0
+    first_token: float | None = None
+    chunks: int = 0
+    output_tokens: int = 0
+    failed: bool = False
+
+    @property
+    def ttft(self) -> float | None:
+        """Seconds from the invocation to the first streamed text."""
+        return None if self.first_token is None else self.first_token - self.start
+
+
+@dataclass
+class ToolSpan:
+    """A tool call, from the streamed call to the streamed result."""
+    executor_id: str
+    name: str
+    call_id: str
+    start: float
+    end: float | None = None
+
+
+@dataclass
+class EdgeSpan:
+    """One evaluation of an edge condition or a switch selection."""
+    label: str
+    start: float
+    duration: float
+
+
+@dataclass
+class _EdgeStats:
+    evaluations: int = 0
+    total: float = 0.0
+    samples: list[EdgeSpan] = field(default_factory=list)
+
+
+class WorkflowProfiler:
+    """
+    Timeline of a workflow run, built from its event stream.
+
+    ``watch`` hooks into a run of ``run_stream`` and records, per executor invocation, the
+    start and end, the idle time since the previous executor finished, the time to the first
+    streamed text, the streamed chunks and output tokens, and the tool calls. Edge conditions
+    and switch selections are timed by wrapping them for the duration of the run.
+
+    Disabled, ``watch`` returns the event stream untouched and nothing is instrumented.
+    The result is exported as a Chrome trace (chrome://tracing, ui.perfetto.dev) and a
+    summary table.
+
+    :param enabled: Whether to record, by default when the WORKFLOW_PROFILE environment variable is set.
+    """
+
+    def __init__(self, enabled: bool | None = None) -> None:
+        """Constructor."""
+        self.enabled = bool(os.getenv("WORKFLOW_PROFILE")) if enabled is None else enabled
+        self.executors: list[ExecutorSpan] = []
+        self.tools: list[ToolSpan] = []
+        self.edges: dict[str, _EdgeStats] = defaultdict(_EdgeStats)
+        self._origin = time.perf_counter()
+        self._last_end = self._origin
+        self._open: dict[str, ExecutorSpan] = {}
+        self._calls: dict[str, dict[str, ToolSpan]] = defaultdict(dict)
+        self._handlers: dict[type, Callable[[Any, float], None]] = {
+            ExecutorInvokedEvent: self._on_invoked,
+            ExecutorCompletedEvent: self._on_completed,
+            ExecutorFailedEvent: self._on_failed,
+            AgentRunUpdateEvent: self._on_update,
+        }
+
+    def watch(self, workflow: Workflow, events: AsyncIterable[WorkflowEvent]) -> AsyncIterable[WorkflowEvent]:
+        """
+        Record the events of a run as they pass through.
+
+        :param workflow: The workflow producing the events, its edges are timed during the run.
+        :param events: The events, typically ``workflow.run_stream(...)``.
+        :return: The same events.
+        """
+        if not self.enabled:
+            return events
+        return self._record(workflow, events)
+
+    async def _record(self, workflow: Workflow, events: AsyncIterable[WorkflowEvent]) -> AsyncIterable[WorkflowEvent]:
+        restore = self._instrument(workflow)
+        self._last_end = time.perf_counter()
+        try:
+            async for event in events:
+                yield event
+        finally:
+            for undo in reversed(restore):
+                undo()
+
+    def _instrument(self, workflow: Workflow) -> list[Callable[[], None]]:
+        """Hook the event emission, edge conditions and switch selections, return the functions undoing it."""
+        # Events are recorded when emitted rather than when yielded by run_stream, which
+        # holds back the events of the start executor until it finished.
+        context = workflow._runner.context
+        emit = context.add_event
+
+        async def add_event(event: WorkflowEvent) -> None:
+            handler = self._handlers.get(type(event))
+            if handler is not None:
+                handler(event, time.perf_counter())
+            await emit(event)
+
+        restore = [_patch(context, "add_event", add_event)]
+        for group in workflow.edge_groups:
+            for edge in group.edges:
+                condition = edge._condition
+                if condition is not None:
+                    label = f"{edge.source_id} -> {edge.target_id} [{edge.condition_name}]"
+                    restore.append(_patch(edge, "_condition", self._timed(label, condition)))
+        # The fan-out runners keep their own reference to the selection function.
+        for runner in workflow._runner._edge_runners:
+            selection = getattr(runner, "_selection_func", None)
+            if selection is not None:
+                name = getattr(selection, "__name__", type(selection).__name__)
+                label = f"{runner._edge_group.source_executor_ids[0]} -> switch [{name}]"
+                restore.append(_patch(runner, "_selection_func", self._timed(label, selection)))
+        return restore
+
+    def _timed(self, label: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        stats = self.edges[label]
+
+        @functools.wraps(fn)
+        def timed(*args: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                duration = time.perf_counter() - start
+                stats.evaluations += 1
+                stats.total += duration
+                stats.samples.append(EdgeSpan(label, start, duration))
+        return timed
+
+    def _on_invoked(self, event: ExecutorInvokedEvent, now: float) -> None:
+        span = ExecutorSpan(event.executor_id, now, waited=max(0.0, now - self._last_end))
+        self._open[event.executor_id] = span
+        self.executors.append(span)
+
+    def _on_completed(self, event: ExecutorCompletedEvent, now: float) -> None:
+        span = self._open.pop(event.executor_id, None)
+        if span is not None:
+            span.end = self._last_end = now
+
+    def _on_failed(self, event: ExecutorFailedEvent, now: float) -> None:
+        span = self._open.get(event.executor_id)
+        if span is not None:
+            span.failed = True
+        self._on_completed(event, now)
+
+    def _on_update(self, event: AgentRunUpdateEvent, now: float) -> None:
+        span = self._open.get(event.executor_id)
+        if span is None or event.data is None:
+            return
+        calls = self._calls[event.executor_id]
+        for content in event.data.contents or []:
+            if isinstance(content, TextContent):
+                if content.text:
+                    span.chunks += 1
+                    if span.first_token is None:
+                        span.first_token = now
+            elif isinstance(content, FunctionCallContent):
+                # Arguments stream in fragments, the tool runs after the last one.
+                if content.call_id and content.call_id not in calls:
+                    calls[content.call_id] = ToolSpan(event.executor_id, content.name, content.call_id, now)
+                for call in calls.values():
+                    call.start = now
+            elif isinstance(content, FunctionResultContent):
+                call = calls.pop(content.call_id, None)
+                if call is not None:
+                    call.end = now
+                    self.tools.append(call)
+            elif isinstance(content, UsageContent):
+                span.output_tokens += content.details.output_token_count or 0
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Return the timeline in the Chrome trace event format."""
+        def us(seconds: float) -> float:
+            return round((seconds - self._origin) * 1e6, 1)
+
+        threads = {executor_id: tid for tid, executor_id in enumerate(
+            dict.fromkeys(span.executor_id for span in self.executors), start=1)}
+        threads["edges"] = len(threads) + 1
+        trace = [
+            {"ph": "M", "name": "thread_name", "pid": 1, "tid": tid, "args": {"name": name}}
+            for name, tid in threads.items()
+        ]
+        for span in self.executors:
+            end = span.end if span.end is not None else span.start
+            trace.append({
+                "ph": "X", "cat": "executor", "name": span.executor_id, "pid": 1, "tid": threads[span.executor_id],
+                "ts": us(span.start), "dur": us(end) - us(span.start),
+                "args": {"waited_ms": span.waited * 1000, "chunks": span.chunks,
+                         "output_tokens": span.output_tokens, "failed": span.failed},
+            })
+            if span.first_token is not None:
+                trace.append({
+                    "ph": "X", "cat": "ttft", "name": "time to first token", "pid": 1,
+                    "tid": threads[span.executor_id], "ts": us(span.start), "dur": us(span.first_token) - us(span.start),
+                })
+        for call in self.tools:
+            trace.append({
+                "ph": "X", "cat": "tool", "name": call.name, "pid": 1, "tid": threads[call.executor_id],
+                "ts": us(call.start), "dur": us(call.end) - us(call.start), "args": {"call_id": call.call_id},
+            })
+        for stats in self.edges.values():
+            for sample in stats.samples:
+                trace.append({
+                    "ph": "X", "cat": "edge", "name": sample.label, "pid": 1, "tid": threads["edges"],
+                    "ts": us(sample.start), "dur": round(sample.duration * 1e6, 1),
+                })
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the timeline to a JSON file for chrome://tracing or ui.perfetto.dev."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self) -> str:
+        """Return a table of the time spent per executor, tool and edge, in milliseconds (ttft is a mean)."""
+        tool_time: dict[str, float] = defaultdict(float)
+        for call in self.tools:
+            tool_time[call.executor_id] += call.end - call.start
+
+        lines = [f"{'executor':28} {'runs':>5} {'total':>9} {'waited':>9} {'ttft':>9} {'tools':>9} {'chunks':>7} {'tokens':>7}"]
+        for executor_id in dict.fromkeys(span.executor_id for span in self.executors):
+            spans = [span for span in self.executors if span.executor_id == executor_id]
+            ttfts = [span.ttft for span in spans if span.ttft is not None]
+            lines.append(
+                f"{executor_id[:28]:28} {len(spans):5} "
+                f"{sum((span.end or span.start) - span.start for span in spans) * 1000:9.1f} "
+                f"{sum(span.waited for span in spans) * 1000:9.1f} "
+                f"{(sum(ttfts) / len(ttfts) * 1000 if ttfts else float('nan')):9.1f} "
+                f"{tool_time[executor_id] * 1000:9.1f} "
+                f"{sum(span.chunks for span in spans):7} {sum(span.output_tokens for span in spans):7}")
+
+        if self.tools:
+            lines.append("")
+            lines.append(f"{'tool':28} {'calls':>5} {'total':>9}")
+            by_name: dict[str, list[ToolSpan]] = defaultdict(list)
+            for call in self.tools:
+                by_name[call.name].append(call)
+            for name, calls in by_name.items():
+                lines.append(f"{name[:28]:28} {len(calls):5} {sum(c.end - c.start for c in calls) * 1000:9.1f}")
+
+        if self.edges:
+            lines.append("")
+            lines.append(f"{'edge':60} {'evals':>5} {'total':>9}")
+            for label, stats in self.edges.items():
+                lines.append(f"{label[:60]:60} {stats.evaluations:5} {stats.total * 1000:9.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,121 @@
+import shutil
+import hashlib
+import logging
+import argparse
+import importlib
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from agent_framework import Workflow, WorkflowViz
+
+logger = logging.getLogger(__name__)
+
+# One thread, diagrams are rendered one after the other and never on the event loop.
+_executor: ThreadPoolExecutor | None = None
+
+
+def diagram_sources(workflow: Workflow) -> tuple[str, str, str]:
+    """
+    Return the DOT source, the Mermaid source and the hash identifying the diagram.
+
+    The diagram is content addressed: the hash covers the executors, the edges and their
+    conditions, and the switch cases, so an unchanged topology is never rendered again.
+
+    :param workflow: The workflow to draw.
+    :return: DOT, Mermaid and the SHA-256 of both with the graph signature of the workflow.
+    """
+    viz = WorkflowViz(workflow)
+    dot, mermaid = viz.to_digraph(), viz.to_mermaid()
+    digest = hashlib.sha256(
+        "\0".join([workflow.graph_signature_hash, dot, mermaid]).encode("utf-8")).hexdigest()
+    return dot, mermaid, digest
+
+
+def _write(path: Path, content: str | bytes) -> None:
+    """Replace a file atomically, readers never see a partial diagram."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    if isinstance(content, bytes):
+        tmp.write_bytes(content)
+    else:
+        tmp.write_text(content, encoding="utf-8")
+    tmp.replace(path)
+
+
+def _render(dot: str, mermaid: str, digest: str, path: Path) -> Path:
+    stamp = path.with_name(f".{path.name}.sha256")
+    fallback = path.with_suffix(".dot")
+    # The DOT fallback only counts as up to date while graphviz is still missing.
+    for artifact in (path, fallback) if shutil.which("dot") is None else (path,):
+        if artifact.exists() and stamp.exists() and stamp.read_text().strip() == digest:
+            return artifact
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        import graphviz
+        rendered = graphviz.Source(dot).pipe(format=path.suffix.lstrip(".") or "svg")
+    except (ImportError, OSError, RuntimeError) as e:
+        # Covers the missing package and graphviz.ExecutableNotFound (a RuntimeError).
+        logger.warning("Cannot render %s (%s), writing the DOT and Mermaid sources instead.", path, e)
+        _write(fallback, dot)
+        _write(path.with_suffix(".mmd"), mermaid)
+        artifact = fallback
+    else:
+        _write(path, rendered)
+        artifact = path
+    _write(stamp, digest)
+    return artifact
+
+
+def render_workflow(workflow: Workflow, path: str | Path) -> Path:
+    """
+    Render the diagram of a workflow unless the file is already up to date.
+
+    :param workflow: The workflow to draw.
+    :param path: The output file, the suffix selects the format (svg, png, pdf).
+    :return: The rendered file, or the DOT file next to it if graphviz is not available.
+    """
+    return _render(*diagram_sources(workflow), Path(path))
+
+
+def render_in_background(workflow: Workflow, path: str | Path) -> Future:
+    """
+    Render the diagram of a workflow on a background thread.
+
+    The sources are computed right away, so the workflow can run while the diagram is
+    rendered. Failures are logged, never raised to the caller.
+
+    :param workflow: The workflow to draw.
+    :param path: The output file, the suffix selects the format (svg, png, pdf).
+    :return: Future of the rendered file.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow-viz")
+    future = _executor.submit(_render, *diagram_sources(workflow), Path(path))
+    future.add_done_callback(
+        lambda f: f.exception() and logger.warning("Rendering %s failed: %s", path, f.exception()))
+    return future
+
+
+def main() -> None:
+    """
+    Render the diagram of a workflow script on demand, e.g.::
+
+        python workflow_viz.py agents_in_workflows_switch --output "docs/workflow_architecture 3.svg"
+    """
+    parser = argparse.ArgumentParser(description="Render the diagram of a workflow script.")
+    parser.add_argument("module", help="Module with a build_workflow(chat_client) function, e.g. agents_in_workflows.")
+    parser.add_argument("--output", help="Output file, docs/<module>.svg by default.")
+    parser.add_argument("--mermaid", action="store_true", help="Print the Mermaid source instead.")
+    args = parser.parse_args()
+
+    from settings import get_chat_client
+    workflow = importlib.import_module(args.module).build_workflow(get_chat_client())
+    if args.mermaid:
+        print(WorkflowViz(workflow).to_mermaid())
+        return
+    print(render_workflow(workflow, args.output or f"docs/{args.module}.svg"))
+
+
+if __name__ == "__main__":
+    main()